@@ -0,0 +1,233 @@
+"""
+Backtesting vectorizado de las reglas de señal
+Calcula puntuación, predicción, niveles SL/TP y filtros de todas las velas a
+la vez y simula las salidas con lógica de primer toque
+"""
+import numpy as np
+
+from indicators_np import NumpyIndicators
+
+# Parámetros de CryptoPredictor._rule_based_prediction y generate_signal
+DEFAULT_PARAMS = {
+    'w_rsi_low': 1.0,          # 30 < RSI < 50
+    'w_rsi_oversold': 2.0,     # RSI < 30
+    'w_trend': 2.0,            # close > ema_21 > ema_50
+    'w_macd': 1.0,             # macd > macd_signal
+    'w_bb_lower': 1.5,         # close < bb_lower
+    'w_volume': 0.5,           # volume_ratio > 1.2
+    'max_score': 7.0,
+    'prediction_threshold': 0.6,
+    'sl_atr': 2.0,
+    'tp_atr': 4.0,
+    'min_confidence': 0.70,
+    'min_risk_reward': 2.0,
+}
+
+
+def signal_arrays(cols, params=None):
+    """
+    Señales de todas las velas a la vez
+    
+    Args:
+        cols: Diccionario de columnas (NumpyIndicators.compute)
+        params: Parámetros a sobrescribir sobre DEFAULT_PARAMS
+    
+    Returns:
+        Diccionario de arrays: score, confidence, prediction, stop_loss,
+        take_profit, risk_reward, is_valid
+    """
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    
+    close = cols['close']
+    rsi = cols['rsi']
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        score = (
+            p['w_rsi_low'] * ((rsi > 30) & (rsi < 50)) +
+            p['w_rsi_oversold'] * (rsi < 30) +
+            p['w_trend'] * ((close > cols['ema_21']) & (cols['ema_21'] > cols['ema_50'])) +
+            p['w_macd'] * (cols['macd'] > cols['macd_signal']) +
+            p['w_bb_lower'] * (close < cols['bb_lower']) +
+            p['w_volume'] * (cols['volume_ratio'] > 1.2)
+        )
+        
+        confidence = np.minimum(score / p['max_score'], 0.95)
+        prediction = (confidence >= p['prediction_threshold']).astype(np.int8)
+        
+        atr = cols['atr']
+        stop_loss = close - p['sl_atr'] * atr
+        take_profit = close + p['tp_atr'] * atr
+        risk_reward = (take_profit - close) / (close - stop_loss)
+        
+        is_valid = (
+            (prediction == 1) &
+            (confidence >= p['min_confidence']) &
+            (risk_reward >= p['min_risk_reward'])
+        )
+    
+    return {
+        'score': score,
+        'confidence': confidence,
+        'prediction': prediction,
+        'stop_loss': stop_loss,
+        'take_profit': take_profit,
+        'risk_reward': risk_reward,
+        'is_valid': is_valid,
+    }
+
+
+def first_touch(high, low, close, entries, stop_loss, take_profit, max_hold, chunk=4096):
+    """
+    Simular la salida de cada entrada: primer toque de SL o TP
+    
+    Si en la misma vela se tocan ambos se asume el SL (caso conservador). Si
+    no se toca ninguno en max_hold velas se sale al cierre de la última.
+    
+    Args:
+        high, low, close: Arrays de precios
+        entries: Índices de las velas de entrada (se entra al cierre)
+        stop_loss, take_profit: Niveles por entrada
+        max_hold: Velas máximas en posición
+        chunk: Entradas procesadas por bloque (limita memoria)
+    
+    Returns:
+        Tupla (exit_idx, exit_price, outcome) con outcome 1=TP, -1=SL, 0=tiempo
+    """
+    n = len(close)
+    k = len(entries)
+    exit_idx = np.empty(k, dtype=np.int64)
+    exit_price = np.empty(k)
+    outcome = np.zeros(k, dtype=np.int8)
+    
+    # Ventanas de las velas siguientes; se rellena al final para no salirse
+    pad_high = np.concatenate([high, np.full(max_hold, -np.inf)])
+    pad_low = np.concatenate([low, np.full(max_hold, np.inf)])
+    windows_high = np.lib.stride_tricks.sliding_window_view(pad_high[1:], max_hold)
+    windows_low = np.lib.stride_tricks.sliding_window_view(pad_low[1:], max_hold)
+    
+    for start in range(0, k, chunk):
+        idx = entries[start:start + chunk]
+        sl = stop_loss[start:start + chunk, None]
+        tp = take_profit[start:start + chunk, None]
+        
+        hit_sl = windows_low[idx] <= sl
+        hit_tp = windows_high[idx] >= tp
+        any_sl = hit_sl.any(axis=1)
+        any_tp = hit_tp.any(axis=1)
+        first_sl = np.where(any_sl, hit_sl.argmax(axis=1), max_hold)
+        first_tp = np.where(any_tp, hit_tp.argmax(axis=1), max_hold)
+        
+        is_sl = any_sl & (first_sl <= first_tp)
+        is_tp = any_tp & (first_tp < first_sl)
+        offset = np.minimum(np.minimum(first_sl, first_tp), max_hold - 1)
+        
+        out = slice(start, start + len(idx))
+        exit_idx[out] = np.minimum(idx + 1 + offset, n - 1)
+        outcome[out] = np.where(is_tp, 1, np.where(is_sl, -1, 0))
+        exit_price[out] = np.where(
+            is_tp, tp[:, 0], np.where(is_sl, sl[:, 0], close[exit_idx[out]])
+        )
+    
+    return exit_idx, exit_price, outcome
+
+
+def backtest(ohlcv, params=None, max_hold=48, fee=0.0, allow_overlap=False, cols=None):
+    """
+    Backtest de las reglas sobre un histórico
+    
+    Args:
+        ohlcv: Array (n, 6) con timestamp en ms y OHLCV
+        params: Parámetros a sobrescribir sobre DEFAULT_PARAMS
+        max_hold: Velas máximas en posición
+        fee: Comisión por lado (fracción)
+        allow_overlap: Permitir varias posiciones abiertas a la vez
+        cols: Columnas de indicadores ya calculadas (opcional)
+    
+    Returns:
+        Diccionario con 'summary' (métricas) y 'trades' (arrays por operación)
+    """
+    if cols is None:
+        cols = NumpyIndicators().compute(ohlcv)
+    signals = signal_arrays(cols, params)
+    
+    high, low, close = cols['high'], cols['low'], cols['close']
+    
+    # Solo entradas con al menos una vela posterior
+    entries = np.flatnonzero(signals['is_valid'][:-1])
+    exit_idx, exit_price, outcome = first_touch(
+        high, low, close, entries,
+        signals['stop_loss'][entries], signals['take_profit'][entries], max_hold
+    )
+    
+    if not allow_overlap and len(entries):
+        # Una posición a la vez: saltar a la primera entrada tras cada salida
+        next_entry = np.searchsorted(entries, exit_idx, side='right')
+        taken = []
+        i = 0
+        while i < len(entries):
+            taken.append(i)
+            i = next_entry[i]
+        taken = np.array(taken, dtype=np.int64)
+        entries, exit_idx, exit_price, outcome = (
+            entries[taken], exit_idx[taken], exit_price[taken], outcome[taken]
+        )
+    
+    entry_price = close[entries]
+    returns = exit_price / entry_price * (1 - fee) ** 2 - 1
+    
+    trades = {
+        'entry_idx': entries,
+        'exit_idx': exit_idx,
+        'entry_price': entry_price,
+        'exit_price': exit_price,
+        'outcome': outcome,
+        'return': returns,
+    }
+    return {'summary': summarize(returns, outcome), 'trades': trades}
+
+
+def summarize(returns, outcome):
+    """Métricas de un conjunto de operaciones"""
+    n_trades = len(returns)
+    if n_trades == 0:
+        return {
+            'trades': 0, 'hit_rate': 0.0, 'take_profits': 0, 'stop_losses': 0,
+            'timeouts': 0, 'pnl': 0.0, 'total_return': 0.0, 'avg_return': 0.0,
+            'max_drawdown': 0.0,
+        }
+    
+    equity = np.cumprod(1 + returns)
+    peak = np.maximum.accumulate(np.concatenate([[1.0], equity]))[1:]
+    drawdown = 1 - equity / peak
+    
+    return {
+        'trades': int(n_trades),
+        'hit_rate': float((outcome == 1).mean()),
+        'take_profits': int((outcome == 1).sum()),
+        'stop_losses': int((outcome == -1).sum()),
+        'timeouts': int((outcome == 0).sum()),
+        'pnl': float(returns.sum()),
+        'total_return': float(equity[-1] - 1),
+        'avg_return': float(returns.mean()),
+        'max_drawdown': float(drawdown.max()),
+    }
+
+
+def backtest_many(histories, params=None, **kwargs):
+    """
+    Backtest de varios símbolos
+    
+    Args:
+        histories: Diccionario {symbol: ohlcv}
+        params: Parámetros a sobrescribir sobre DEFAULT_PARAMS
+        **kwargs: Argumentos de backtest()
+    
+    Returns:
+        Diccionario {symbol: resultado de backtest()}
+    """
+    engine = NumpyIndicators()
+    results = {}
+    for symbol, ohlcv in histories.items():
+        cols = engine.compute(ohlcv)
+        results[symbol] = backtest(ohlcv, params, cols=cols, **kwargs)
+    return results
@@ -0,0 +1,375 @@
+"""
+Benchmarks del pipeline de predicción
+Mide cada etapa con velas sintéticas deterministas y un exchange falso (sin
+red) y guarda los resultados en JSON para comparar versiones
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+from candle_store import CandleStore
+from fake_exchange import synthetic_exchange, synthetic_ohlcv
+from indicator_engine import StreamingIndicators
+from indicators_np import NumpyIndicators
+from predictor_core import CryptoPredictor
+from signal_cache import SignalCache
+
+try:
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier
+    SKLEARN_AVAILABLE = True
+except:
+    SKLEARN_AVAILABLE = False
+
+BENCHMARK_FORMAT_VERSION = 1
+
+QUICK_ROWS = (500, 5_000)
+QUICK_SYMBOLS = (1, 10)
+FULL_ROWS = (500, 5_000, 50_000, 1_000_000)
+FULL_SYMBOLS = (1, 10, 100, 500)
+
+# Features del modelo de prueba (las que calcula create_features)
+BENCHMARK_FEATURES = [
+    'rsi', 'macd', 'macd_signal', 'bb_width', 'atr', 'volume_ratio', 'return_1',
+    'return_5', 'volatility_20', 'price_to_ema50', 'rsi_normalized', 'bb_position',
+]
+
+# El motor incremental procesa vela a vela en Python: no pasar de aquí
+STREAMING_MAX_ROWS = 50_000
+
+
+def measure(func, setup=None, min_runs=3, max_runs=50, min_time=0.5, max_time=5.0):
+    """
+    Medir una función varias veces
+    
+    Se repite hasta sumar min_time segundos (al menos min_runs veces, salvo
+    que se supere max_time).
+    
+    Args:
+        func: Función a medir; recibe lo que devuelva setup
+        setup: Preparación de cada repetición, fuera de la medida (opcional)
+        min_runs: Repeticiones mínimas
+        max_runs: Repeticiones máximas
+        min_time: Segundos medidos mínimos
+        max_time: Segundos medidos a partir de los cuales se para
+    
+    Returns:
+        Diccionario con runs y median_ms / min_ms / max_ms
+    """
+    samples = []
+    elapsed = 0.0
+    while len(samples) < max_runs:
+        args = setup() if setup is not None else None
+        start = time.perf_counter()
+        func(args) if setup is not None else func()
+        duration = time.perf_counter() - start
+        
+        samples.append(duration * 1000)
+        elapsed += duration
+        if elapsed >= max_time or (len(samples) >= min_runs and elapsed >= min_time):
+            break
+    
+    return {
+        'runs': len(samples),
+        'median_ms': float(np.median(samples)),
+        'min_ms': float(np.min(samples)),
+        'max_ms': float(np.max(samples)),
+    }
+
+
+def train_benchmark_model(directory, rows=5_000, seed=0):
+    """
+    Entrenar un modelo pequeño sobre velas sintéticas y guardarlo como model.pkl
+    
+    Args:
+        directory: Directorio donde guardar model.pkl
+        rows: Velas de entrenamiento
+        seed: Semilla de las velas y del modelo
+    
+    Returns:
+        Ruta del modelo, o None si no están sklearn / joblib
+    """
+    if not SKLEARN_AVAILABLE:
+        return None
+    
+    predictor = CryptoPredictor(model_path=os.path.join(directory, 'none.pkl'))
+    df = predictor._ohlcv_to_frame(synthetic_ohlcv(rows, seed))
+    df = predictor.create_features(predictor.calculate_indicators(df))
+    
+    # Objetivo: el cierre siguiente sube
+    target = (df['close'].shift(-1) > df['close']).astype(int)
+    data = df[BENCHMARK_FEATURES].assign(target=target).iloc[:-1].dropna()
+    
+    model = RandomForestClassifier(n_estimators=50, max_depth=6, random_state=seed, n_jobs=1)
+    model.fit(data[BENCHMARK_FEATURES], data['target'])
+    
+    path = os.path.join(directory, 'model.pkl')
+    joblib.dump({'model': model, 'feature_names': BENCHMARK_FEATURES}, path)
+    return path
+
+
+def _key(case, **params):
+    return case + '[' + ','.join(f'{name}={value}' for name, value in params.items()) + ']'
+
+
+def _result(case, params, timing, units=None, unit=None):
+    result = {'case': case, 'params': params}
+    result.update(timing)
+    if units:
+        result['unit'] = unit
+        result['per_unit_us'] = timing['median_ms'] * 1000 / units
+    return result
+
+
+def stage_benchmarks(rows, model_path=None, seed=0):
+    """
+    Coste de cada etapa del pipeline sobre una serie de `rows` velas
+    
+    Returns:
+        Diccionario {clave: resultado}
+    """
+    predictor = CryptoPredictor(model_path=model_path or os.path.join(tempfile.gettempdir(), 'none.pkl'))
+    ohlcv = synthetic_ohlcv(rows, seed)
+    
+    df = predictor._ohlcv_to_frame(ohlcv)
+    indicators = predictor.calculate_indicators(df)
+    features = predictor.create_features(indicators)
+    
+    cases = {
+        'dataframe': lambda: predictor._ohlcv_to_frame(ohlcv),
+        'calculate_indicators': lambda: predictor.calculate_indicators(df),
+        'create_features': lambda: predictor.create_features(indicators),
+        'rule_based_prediction': lambda: predictor._rule_based_prediction(features),
+        'numpy_indicators': lambda: NumpyIndicators().compute(ohlcv),
+    }
+    if rows <= STREAMING_MAX_ROWS:
+        cases['streaming_indicators'] = lambda: StreamingIndicators().update_many(ohlcv)
+    if model_path is not None and predictor.model is not None:
+        cases['ml_prediction'] = lambda: predictor._ml_prediction(features)
+    
+    results = {}
+    for case, func in cases.items():
+        timing = measure(func)
+        results[_key(case, rows=rows)] = _result(case, {'rows': rows}, timing, rows, 'row')
+    return results
+
+
+def pipeline_benchmarks(n_symbols, model_path=None, history=1_000, seed=0):
+    """
+    generate_signal / scan / screen completos contra un exchange falso
+    
+    'cold' parte de un histórico vacío (descarga y cálculo completos);
+    'warm' repite con el histórico y los indicadores ya cargados. La caché
+    de señales está desactivada para medir el cálculo.
+    
+    Returns:
+        Diccionario {clave: resultado}
+    """
+    symbols = [f'SYN{i}/USDT' for i in range(n_symbols)]
+    exchange = synthetic_exchange(symbols, history, seed=seed)
+    model_path = model_path or os.path.join(tempfile.gettempdir(), 'none.pkl')
+    
+    workdir = tempfile.TemporaryDirectory(prefix='bench_')
+    runs = iter(range(1_000_000))
+    
+    def new_predictor():
+        store = CandleStore(os.path.join(workdir.name, str(next(runs))))
+        predictor = CryptoPredictor(
+            model_path=model_path, exchange=exchange, candle_store=store, signal_cache=SignalCache()
+        )
+        predictor.signal_cache.enabled = False
+        predictor.warm_up()
+        return predictor
+    
+    if n_symbols == 1:
+        cases = {
+            'generate_signal_cold': (new_predictor, lambda p: p.generate_signal(symbols[0])),
+            'generate_signal_warm': (None, lambda p: p.generate_signal(symbols[0])),
+        }
+    else:
+        cases = {
+            'scan_cold': (new_predictor, lambda p: list(p.scan(symbols))),
+            'scan_warm': (None, lambda p: list(p.scan(symbols))),
+            'screen_warm': (None, lambda p: p.screen(symbols, refresh=False)),
+        }
+    
+    results = {}
+    try:
+        warm = new_predictor()
+        for case, (setup, func) in cases.items():
+            if setup is None:
+                # Primera pasada fuera de la medida: histórico e indicadores listos
+                func(warm)
+                timing = measure(lambda: func(warm))
+            else:
+                timing = measure(func, setup=setup, min_runs=1, max_runs=10, min_time=1.0)
+            params = {'symbols': n_symbols, 'history': history}
+            results[_key(case, symbols=n_symbols)] = _result(case, params, timing, n_symbols, 'symbol')
+    finally:
+        workdir.cleanup()
+    return results
+
+
+def environment():
+    """Versiones y máquina en que se ejecutó el benchmark"""
+    info = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+    if SKLEARN_AVAILABLE:
+        import sklearn
+        info['sklearn'] = sklearn.__version__
+    try:
+        info['commit'] = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        info['commit'] = None
+    return info
+
+
+def run_benchmarks(rows=QUICK_ROWS, symbols=QUICK_SYMBOLS, cases=None, seed=0, log=print):
+    """
+    Ejecutar el conjunto de benchmarks
+    
+    Args:
+        rows: Tamaños de serie para las etapas
+        symbols: Número de símbolos para el pipeline completo
+        cases: Subcadenas de los casos a ejecutar (por defecto, todos)
+        seed: Semilla de las velas sintéticas
+        log: Función para informar del avance (None para silencio)
+    
+    Returns:
+        Diccionario con format_version, created, environment y results
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='bench_model_') as model_dir:
+        model_path = train_benchmark_model(model_dir, seed=seed)
+        
+        for n in rows:
+            if log:
+                log(f"Etapas con {n} velas...")
+            results.update(stage_benchmarks(n, model_path, seed))
+        for n in symbols:
+            if log:
+                log(f"Pipeline con {n} símbolos...")
+            results.update(pipeline_benchmarks(n, model_path, seed=seed))
+    
+    if cases:
+        results = {key: r for key, r in results.items() if any(c in key for c in cases)}
+    
+    return {
+        'format_version': BENCHMARK_FORMAT_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=0.10):
+    """
+    Comparar dos ejecuciones por la mediana de cada caso común
+    
+    Args:
+        baseline: Resultados de referencia (dict de run_benchmarks o JSON)
+        current: Resultados nuevos
+        threshold: Cambio relativo a partir del que se marca el caso
+    
+    Returns:
+        Lista de diccionarios {key, baseline_ms, current_ms, ratio, status}
+        con status 'regresión', 'mejora' o 'igual'
+    """
+    for run in (baseline, current):
+        if run.get('format_version') != BENCHMARK_FORMAT_VERSION:
+            raise ValueError(f"Versión de benchmark no soportada: {run.get('format_version')}")
+    
+    rows = []
+    for key, result in current['results'].items():
+        old = baseline['results'].get(key)
+        if old is None:
+            continue
+        ratio = result['median_ms'] / old['median_ms'] if old['median_ms'] else float('inf')
+        if ratio > 1 + threshold:
+            status = 'regresión'
+        elif ratio < 1 - threshold:
+            status = 'mejora'
+        else:
+            status = 'igual'
+        rows.append({
+            'key': key,
+            'baseline_ms': old['median_ms'],
+            'current_ms': result['median_ms'],
+            'ratio': ratio,
+            'status': status,
+        })
+    return rows
+
+
+def format_results(run):
+    """Tabla de texto con los resultados de una ejecución"""
+    lines = [f"{'caso':<44} {'mediana ms':>12} {'mín ms':>10} {'µs/unidad':>16} {'runs':>5}"]
+    for key, r in run['results'].items():
+        per_unit = f"{r['per_unit_us']:.2f}/{r['unit']}" if 'per_unit_us' in r else ''
+        lines.append(f"{key:<44} {r['median_ms']:>12.3f} {r['min_ms']:>10.3f} {per_unit:>16} {r['runs']:>5}")
+    return '\n'.join(lines)
+
+
+def _int_list(text):
+    return tuple(int(value) for value in text.split(',') if value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks del pipeline de predicción')
+    parser.add_argument('--full', action='store_true',
+                        help='De 500 a 1M velas y de 1 a 500 símbolos (por defecto, conjunto rápido)')
+    parser.add_argument('--rows', type=_int_list, help='Tamaños de serie, p. ej. 500,50000')
+    parser.add_argument('--symbols', type=_int_list, help='Número de símbolos, p. ej. 1,100')
+    parser.add_argument('--cases', help='Solo los casos que contengan estos textos (separados por comas)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Guardar los resultados en este JSON')
+    parser.add_argument('--compare', help='JSON de referencia con el que comparar')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Cambio relativo que se marca')
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help='Salir con código 1 si hay regresiones')
+    args = parser.parse_args(argv)
+    
+    rows = args.rows or (FULL_ROWS if args.full else QUICK_ROWS)
+    symbols = args.symbols or (FULL_SYMBOLS if args.full else QUICK_SYMBOLS)
+    cases = args.cases.split(',') if args.cases else None
+    
+    run = run_benchmarks(rows, symbols, cases, args.seed, log=lambda m: print(m, file=sys.stderr))
+    print(format_results(run))
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(run, f, indent=2)
+        print(f"\nResultados guardados en {args.output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(baseline, run, args.threshold)
+        print(f"\nComparación con {args.compare} ({baseline['environment'].get('commit')}):")
+        for r in rows:
+            print(f"{r['key']:<44} {r['baseline_ms']:>10.3f} -> {r['current_ms']:>10.3f} ms "
+                  f"x{r['ratio']:.2f} {r['status']}")
+        if args.fail_on_regression and any(r['status'] == 'regresión' for r in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
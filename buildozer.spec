@@ -13,13 +13,19 @@ package.domain = com.cryptopredictor
 source.dir = .
 
 # Archivos/carpetas a incluir
-source.include_exts = py,png,jpg,kv,atlas,pkl,json
+source.include_exts = py,png,jpg,kv,atlas,pkl,json,npy
+
+# Herramientas de escritorio que la app no importa (tamaño y arranque del APK)
+source.exclude_patterns = benchmark.py,sweep.py,train_pipeline.py,walk_forward.py,signal_server.py,fake_exchange.py,shared_block.py
+
+# Pruebas (solo en escritorio)
+source.exclude_dirs = tests
 
 # Versión
 version = 1.0
 
 # Requerimientos de Python
-requirements = python3,kivy,numpy,pandas,ccxt,joblib,scikit-learn,requests,certifi
+requirements = python3,kivy,numpy,pandas,ccxt,joblib,scikit-learn,requests,certifi,sqlite3
 
 # Presplash de la aplicación
 #presplash.filename = %(source.dir)s/data/presplash.png
@@ -0,0 +1,343 @@
+"""
+Almacén local de velas OHLCV
+Guarda el histórico en disco y solo descarga las velas nuevas
+"""
+import os
+import threading
+import time
+import numpy as np
+
+from columnar_store import ColumnarHistory, merge_rows
+
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+_TIMEFRAME_UNITS_MS = {
+    's': 1000,
+    'm': 60 * 1000,
+    'h': 60 * 60 * 1000,
+    'd': 24 * 60 * 60 * 1000,
+    'w': 7 * 24 * 60 * 60 * 1000,
+    'M': 30 * 24 * 60 * 60 * 1000,
+}
+
+
+def timeframe_to_ms(timeframe):
+    """
+    Convertir un timeframe de ccxt ('15m', '1h', '1d'...) a milisegundos
+    
+    Args:
+        timeframe: Timeframe
+    
+    Returns:
+        Duración de una vela en milisegundos
+    """
+    amount, unit = timeframe[:-1], timeframe[-1]
+    if unit not in _TIMEFRAME_UNITS_MS or not amount.isdigit():
+        raise ValueError(f"Timeframe no soportado: {timeframe}")
+    return int(amount) * _TIMEFRAME_UNITS_MS[unit]
+
+
+def default_data_dir():
+    """Directorio de datos por defecto (sobrescribible con CRYPTO_PREDICTOR_DATA)"""
+    return os.environ.get(
+        'CRYPTO_PREDICTOR_DATA',
+        os.path.join(os.path.expanduser('~'), '.crypto_predictor')
+    )
+
+
+class CandleStore:
+    """Histórico persistente de velas por (exchange, símbolo, timeframe)"""
+    
+    def __init__(self, base_dir=None, max_candles=5000, page_limit=1000):
+        """
+        Inicializar almacén
+        
+        Args:
+            base_dir: Directorio donde guardar el histórico
+            max_candles: Máximo de velas conservadas por clave (o `limit` si es
+                mayor); None conserva todo el histórico
+            page_limit: Máximo de velas que devuelve el exchange por petición
+        """
+        if base_dir is None:
+            base_dir = os.path.join(default_data_dir(), 'candles')
+        
+        self.base_dir = base_dir
+        self.max_candles = max_candles
+        self.page_limit = page_limit
+        
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+    
+    def _lock(self, key):
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+    
+    def _path(self, exchange_id, symbol, timeframe):
+        name = f"{exchange_id}_{symbol.replace('/', '-')}_{timeframe}"
+        return os.path.join(self.base_dir, name)
+    
+    def history(self, exchange_id, symbol, timeframe):
+        """
+        Histórico columnar de una clave
+        
+        Si existe un histórico en el formato anterior (.npy) se migra.
+        
+        Returns:
+            ColumnarHistory
+        """
+        path = self._path(exchange_id, symbol, timeframe)
+        history = ColumnarHistory(path)
+        
+        legacy_path = path + '.npy'
+        if os.path.exists(legacy_path) and not history.exists():
+            try:
+                history.write(np.load(legacy_path))
+            except (OSError, ValueError):
+                pass
+            os.remove(legacy_path)
+        
+        return history
+    
+    def load(self, exchange_id, symbol, timeframe, start=None, end=None, tail=None):
+        """
+        Leer el histórico guardado
+        
+        Args:
+            exchange_id: Identificador del exchange
+            symbol: Par de trading
+            timeframe: Timeframe
+            start: Primer timestamp en ms incluido (opcional)
+            end: Último timestamp en ms excluido (opcional)
+            tail: Solo las últimas `tail` velas del rango
+        
+        Returns:
+            Array (n, 6) con timestamp en ms y OHLCV, ordenado por tiempo
+        """
+        try:
+            return self.history(exchange_id, symbol, timeframe).read(start, end, tail)
+        except (OSError, ValueError):
+            # Archivos corruptos: se descartan y se vuelve a descargar
+            return np.empty((0, 6))
+    
+    def columns(self, exchange_id, symbol, timeframe, start=None, end=None, tail=None):
+        """
+        Columnas del histórico como vistas mmap, sin copiar
+        
+        Se pueden pasar directamente a NumpyIndicators.compute o backtest().
+        
+        Returns:
+            Diccionario {columna: array} con timestamp (int64) y OHLCV
+        """
+        return self.history(exchange_id, symbol, timeframe).columns(start, end, tail)
+    
+    def save(self, exchange_id, symbol, timeframe, rows):
+        """Reemplazar el histórico guardado"""
+        self.history(exchange_id, symbol, timeframe).write(rows)
+    
+    @staticmethod
+    def merge(stored, new):
+        """
+        Unir velas nuevas al histórico
+        
+        Las velas con el mismo timestamp se reemplazan por la versión nueva,
+        así la última vela (aún abierta) se actualiza en cada descarga.
+        """
+        return merge_rows(stored, new)
+    
+    def _write(self, history, new, replace, keep):
+        """Añadir (o reemplazar) velas y recortar el histórico si ha crecido demasiado"""
+        try:
+            if replace:
+                history.write(new)
+            else:
+                history.append(new)
+        except (OSError, ValueError):
+            # Histórico corrupto: se reemplaza por lo descargado
+            history.write(new)
+        
+        # Recortar solo al doblar el máximo para no reescribir en cada vela
+        if keep is not None and len(history) > 2 * keep:
+            history.trim(keep)
+    
+    def append(self, exchange_id, symbol, timeframe, rows):
+        """
+        Añadir velas al histórico (reemplaza las de igual timestamp)
+        
+        Args:
+            exchange_id: Identificador del exchange
+            symbol: Par de trading
+            timeframe: Timeframe
+            rows: Secuencia de velas [timestamp_ms, o, h, l, c, v]
+        """
+        new = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+        if len(new) == 0:
+            return
+        
+        with self._lock((exchange_id, symbol, timeframe)):
+            history = self.history(exchange_id, symbol, timeframe)
+            self._write(history, new, False, self.max_candles)
+    
+    @staticmethod
+    def _listing_path(history):
+        return os.path.join(history.path, 'listing_start')
+    
+    def _listing_start(self, history):
+        """Primera vela que tiene el exchange, si una descarga lo comprobó (None si no)"""
+        try:
+            with open(self._listing_path(history)) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+    
+    def _plan(self, exchange, history, timeframe, limit):
+        """
+        Decidir qué descargar
+        
+        Con al menos `limit` velas guardadas se pide solo desde la última; con
+        menos se rellena la ventana desde su inicio, salvo que el histórico ya
+        empiece en la primera vela del exchange (listado reciente). Si el
+        hueco hasta ahora es mayor que la ventana se descarga entera.
+        
+        Returns:
+            Tupla (since, replace, now_ms): since=None pide las últimas `limit`
+            velas; replace indica que lo descargado sustituye al histórico
+        """
+        try:
+            timestamps = history.columns()['timestamp']
+        except (OSError, ValueError):
+            timestamps = ()
+        stored = len(timestamps)
+        first, last = (int(timestamps[0]), int(timestamps[-1])) if stored else (None, None)
+        
+        if hasattr(exchange, 'milliseconds'):
+            now_ms = exchange.milliseconds()
+        else:
+            now_ms = int(time.time() * 1000)
+        
+        step = timeframe_to_ms(timeframe)
+        window_start = self._window_start(now_ms, timeframe, limit)
+        missing = limit if last is None else (now_ms - last) // step
+        
+        if missing < limit:
+            listing = self._listing_start(history)
+            if stored < limit and first > window_start and (listing is None or first > listing):
+                # Histórico corto (ventana menor o velas sueltas del websocket):
+                # rellenar desde el inicio de la ventana sin perder lo guardado
+                return window_start, False, now_ms
+            # Desde la última vela guardada (se refresca si estaba abierta)
+            return last, False, now_ms
+        if limit <= self.page_limit:
+            # Sin histórico o con un hueco mayor que la ventana
+            return None, True, now_ms
+        # Ventana mayor que una página: descargar por tramos
+        return window_start, True, now_ms
+    
+    def _next_since(self, page, page_size, since, timeframe, now_ms):
+        """Inicio de la siguiente página, o None si ya no hay más"""
+        if len(page) < page_size:
+            return None
+        
+        step = timeframe_to_ms(timeframe)
+        last = int(page[-1][0])
+        if last + step > now_ms or last < since:
+            return None
+        return last + step
+    
+    def _download(self, exchange, symbol, timeframe, since, limit, now_ms, cancel=None):
+        """Descargar desde `since` en páginas de page_limit velas hasta llegar a now_ms"""
+        page_size = min(limit, self.page_limit)
+        rows = []
+        while since is not None:
+            if cancel is not None:
+                cancel.check()
+            page = exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=page_size)
+            rows.extend(page)
+            since = self._next_since(page, page_size, since, timeframe, now_ms)
+        return rows
+    
+    async def _adownload(self, exchange, symbol, timeframe, since, limit, now_ms):
+        """_download con un cliente asíncrono"""
+        page_size = min(limit, self.page_limit)
+        rows = []
+        while since is not None:
+            page = await exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=page_size)
+            rows.extend(page)
+            since = self._next_since(page, page_size, since, timeframe, now_ms)
+        return rows
+    
+    @staticmethod
+    def _window_start(now_ms, timeframe, limit):
+        """Timestamp de la primera vela de las últimas `limit` hasta now_ms"""
+        step = timeframe_to_ms(timeframe)
+        return (now_ms // step - limit + 1) * step
+    
+    def _commit(self, exchange_id, symbol, timeframe, history, ohlcv, since, replace, now_ms, limit):
+        """Guardar lo descargado y devolver las últimas `limit` velas"""
+        new = np.asarray(ohlcv, dtype=np.float64).reshape(-1, 6)
+        if len(new):
+            keep = None if self.max_candles is None else max(self.max_candles, limit)
+            self._write(history, new, replace, keep)
+            
+            # Se pidió la ventana entera y el exchange empieza después de su
+            # inicio: no tiene velas más antiguas (listado reciente)
+            window_start = self._window_start(now_ms, timeframe, limit)
+            if (since is None or since <= window_start) and len(new) < limit and new[0, 0] > window_start:
+                with open(self._listing_path(history), 'w') as f:
+                    f.write(str(int(new[0, 0])))
+        
+        return self.load(exchange_id, symbol, timeframe, tail=limit)
+    
+    def fetch(self, exchange, symbol, timeframe, limit=500, cancel=None):
+        """
+        Obtener las últimas velas descargando solo lo que falta
+        
+        Args:
+            exchange: Cliente ccxt (o compatible) con fetch_ohlcv
+            symbol: Par de trading
+            timeframe: Timeframe
+            limit: Número de velas a devolver
+            cancel: CancelToken comprobado antes de cada página (opcional);
+                al cancelar se descartan las páginas ya descargadas
+        
+        Returns:
+            Array (n, 6) con las últimas `limit` velas
+        """
+        exchange_id = getattr(exchange, 'id', 'exchange')
+        
+        with self._lock((exchange_id, symbol, timeframe)):
+            history = self.history(exchange_id, symbol, timeframe)
+            since, replace, now_ms = self._plan(exchange, history, timeframe, limit)
+            
+            if since is None:
+                ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+            else:
+                ohlcv = self._download(exchange, symbol, timeframe, since, limit, now_ms, cancel)
+            
+            return self._commit(exchange_id, symbol, timeframe, history, ohlcv, since, replace, now_ms, limit)
+    
+    async def afetch(self, exchange, symbol, timeframe, limit=500):
+        """
+        fetch() con un cliente asíncrono (ccxt.async_support o compatible)
+        
+        La descarga no bloquea el event loop; solo se toma el lock de la clave
+        para guardar. Las lecturas y escrituras en disco son de unas pocas
+        velas y se hacen en el propio loop.
+        
+        Returns:
+            Array (n, 6) con las últimas `limit` velas
+        """
+        exchange_id = getattr(exchange, 'id', 'exchange')
+        key = (exchange_id, symbol, timeframe)
+        
+        history = self.history(exchange_id, symbol, timeframe)
+        since, replace, now_ms = self._plan(exchange, history, timeframe, limit)
+        
+        if since is None:
+            ohlcv = await exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+        else:
+            ohlcv = await self._adownload(exchange, symbol, timeframe, since, limit, now_ms)
+        
+        with self._lock(key):
+            return self._commit(exchange_id, symbol, timeframe, history, ohlcv, since, replace, now_ms, limit)
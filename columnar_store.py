@@ -0,0 +1,230 @@
+"""
+Histórico OHLCV en formato columnar
+Una columna por archivo binario de ancho fijo (int64 / float64) que se
+lee con mmap sin copiar y se escribe solo añadiendo al final
+"""
+import json
+import os
+import numpy as np
+
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+
+COLUMNAR_FORMAT_VERSION = 1
+
+# Columnas y tipos en disco (mismas que download_data: índice + OHLCV)
+COLUMN_DTYPES = {
+    'timestamp': np.int64,
+    'open': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'close': np.float64,
+    'volume': np.float64,
+}
+
+
+def merge_rows(stored, new):
+    """
+    Unir velas nuevas a un histórico (arrays (n, 6))
+    
+    Las velas con el mismo timestamp se reemplazan por la versión nueva,
+    así la última vela (aún abierta) se actualiza en cada descarga.
+    """
+    if len(new) == 0:
+        return stored
+    rows = np.concatenate([stored, new]) if len(stored) else new
+    
+    # Ordenar y quedarse con la última aparición de cada timestamp
+    order = np.argsort(rows[:, 0], kind='stable')
+    rows = rows[order]
+    keep = np.append(rows[1:, 0] != rows[:-1, 0], True)
+    return rows[keep]
+
+
+class ColumnarHistory:
+    """
+    Histórico de un (exchange, símbolo, timeframe) en un directorio
+    
+    meta.json guarda el número de filas confirmadas y la generación de los
+    archivos: las filas se escriben antes que meta.json, así un lector nunca
+    ve filas a medio escribir. Reescribir crea una generación nueva y la
+    activa al cambiar meta.json.
+    """
+    
+    def __init__(self, path):
+        """
+        Args:
+            path: Directorio del histórico
+        """
+        self.path = path
+    
+    def _meta_path(self):
+        return os.path.join(self.path, 'meta.json')
+    
+    def _column_path(self, name, generation):
+        return os.path.join(self.path, f'{name}.{generation}.bin')
+    
+    def _read_meta(self):
+        try:
+            with open(self._meta_path()) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {'rows': 0, 'generation': 0}
+        
+        if meta.get('format_version') != COLUMNAR_FORMAT_VERSION:
+            raise ValueError(f"Versión de formato columnar no soportada: {meta.get('format_version')}")
+        return meta
+    
+    def _write_meta(self, rows, generation):
+        meta = {
+            'format_version': COLUMNAR_FORMAT_VERSION,
+            'rows': int(rows),
+            'generation': generation,
+            'columns': {name: np.dtype(dtype).str for name, dtype in COLUMN_DTYPES.items()},
+        }
+        tmp_path = self._meta_path() + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path())
+    
+    def exists(self):
+        return os.path.exists(self._meta_path())
+    
+    def __len__(self):
+        return self._read_meta()['rows']
+    
+    def columns(self, start=None, end=None, tail=None):
+        """
+        Columnas como vistas mmap de solo lectura (sin copiar)
+        
+        Args:
+            start: Primer timestamp en ms incluido (opcional)
+            end: Último timestamp en ms excluido (opcional)
+            tail: Quedarse solo con las últimas `tail` filas del rango
+        
+        Returns:
+            Diccionario {columna: array}
+        """
+        meta = self._read_meta()
+        rows = meta['rows']
+        if rows == 0:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMN_DTYPES.items()}
+        
+        generation = meta['generation']
+        timestamps = np.memmap(
+            self._column_path('timestamp', generation), dtype=np.int64, mode='r', shape=(rows,)
+        )
+        
+        # Búsqueda binaria sobre el mmap: solo se leen las páginas que toca
+        lo = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+        hi = rows if end is None else int(np.searchsorted(timestamps, end, side='left'))
+        if tail is not None:
+            lo = max(lo, hi - tail)
+        
+        cols = {'timestamp': timestamps[lo:hi]}
+        for name, dtype in COLUMN_DTYPES.items():
+            if name != 'timestamp':
+                column = np.memmap(
+                    self._column_path(name, generation), dtype=dtype, mode='r', shape=(rows,)
+                )
+                cols[name] = column[lo:hi]
+        return cols
+    
+    def read(self, start=None, end=None, tail=None):
+        """
+        Leer un rango como array (n, 6) float64 (copia)
+        
+        Returns:
+            Array (n, 6) con timestamp en ms y OHLCV
+        """
+        cols = self.columns(start, end, tail)
+        out = np.empty((len(cols['timestamp']), 6))
+        for i, name in enumerate(COLUMN_DTYPES):
+            out[:, i] = cols[name]
+        return out
+    
+    def to_frame(self, start=None, end=None, tail=None):
+        """
+        Leer un rango como DataFrame (mismo formato que download_data)
+        
+        Returns:
+            DataFrame con índice timestamp y columnas OHLCV
+        """
+        cols = self.columns(start, end, tail)
+        index = pd.DatetimeIndex(pd.to_datetime(cols.pop('timestamp'), unit='ms'), name='timestamp')
+        return pd.DataFrame(cols, index=index)
+    
+    def last_timestamp(self):
+        """Timestamp de la última vela guardada (None si está vacío)"""
+        timestamps = self.columns(tail=1)['timestamp']
+        return int(timestamps[-1]) if len(timestamps) else None
+    
+    def write(self, rows):
+        """
+        Reemplazar todo el histórico
+        
+        Args:
+            rows: Array (n, 6) ordenado por tiempo
+        """
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+        os.makedirs(self.path, exist_ok=True)
+        
+        old_generation = self._read_meta()['generation'] if self.exists() else None
+        generation = 0 if old_generation is None else old_generation + 1
+        
+        for i, (name, dtype) in enumerate(COLUMN_DTYPES.items()):
+            with open(self._column_path(name, generation), 'wb') as f:
+                rows[:, i].astype(dtype).tofile(f)
+        self._write_meta(len(rows), generation)
+        
+        if old_generation is not None:
+            for name in COLUMN_DTYPES:
+                try:
+                    os.remove(self._column_path(name, old_generation))
+                except OSError:
+                    pass
+    
+    def append(self, rows):
+        """
+        Añadir velas al final
+        
+        Una vela con el mismo timestamp que la última se sobrescribe en su
+        sitio (la vela abierta se actualiza); las anteriores a la última se
+        integran reescribiendo el histórico.
+        
+        Args:
+            rows: Array (n, 6) ordenado por tiempo
+        """
+        rows = merge_rows(np.empty((0, 6)), np.asarray(rows, dtype=np.float64).reshape(-1, 6))
+        if len(rows) == 0:
+            return
+        
+        if not self.exists():
+            self.write(rows)
+            return
+        
+        meta = self._read_meta()
+        stored = meta['rows']
+        last = self.last_timestamp()
+        
+        if last is not None and rows[0, 0] < last:
+            # Velas intercaladas: fusión completa
+            self.write(merge_rows(self.read(), rows))
+            return
+        
+        # Desde qué fila se escribe: la última si se reemplaza
+        position = stored - 1 if last is not None and rows[0, 0] == last else stored
+        
+        generation = meta['generation']
+        for i, (name, dtype) in enumerate(COLUMN_DTYPES.items()):
+            with open(self._column_path(name, generation), 'r+b') as f:
+                f.seek(position * np.dtype(dtype).itemsize)
+                rows[:, i].astype(dtype).tofile(f)
+                f.truncate()
+        self._write_meta(position + len(rows), generation)
+    
+    def trim(self, max_rows):
+        """Conservar solo las últimas max_rows filas (reescribe)"""
+        if len(self) > max_rows:
+            self.write(self.read(tail=max_rows))
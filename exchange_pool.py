@@ -0,0 +1,188 @@
+"""
+Registro de clientes de exchange compartidos
+Un cliente por exchange con conexiones keep-alive, límite de peticiones
+global entre hilos y caché de mercados con caducidad
+"""
+import threading
+import time
+
+from lazy_imports import is_available, lazy_import
+
+# ccxt tarda en importarse; se carga al crear el primer cliente
+CCXT_AVAILABLE = is_available('ccxt')
+ccxt = lazy_import('ccxt')
+
+
+class RateLimiter:
+    """Límite de peticiones compartido entre hilos (GCRA / token bucket)"""
+    
+    def __init__(self, interval, burst=1):
+        """
+        Args:
+            interval: Segundos entre peticiones en régimen sostenido
+            burst: Peticiones que se permiten seguidas sin esperar
+        """
+        self.interval = interval
+        self.burst = burst
+        self._tat = 0.0
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Reservar un hueco y esperar (fuera del lock) hasta que llegue"""
+        if self.interval <= 0:
+            return
+        
+        with self._lock:
+            now = time.monotonic()
+            tat = max(self._tat, now)
+            delay = tat - now - (self.burst - 1) * self.interval
+            self._tat = tat + self.interval
+        
+        if delay > 0:
+            time.sleep(delay)
+
+
+class PooledExchange:
+    """
+    Cliente ccxt compartido
+    
+    Las peticiones pasan por el limitador común y load_markets se cachea
+    durante markets_ttl segundos. El resto de atributos se delegan al cliente.
+    """
+    
+    def __init__(self, client, limiter, markets_ttl=3600):
+        self.client = client
+        self.limiter = limiter
+        self.markets_ttl = markets_ttl
+        
+        self._markets_loaded_at = None
+        self._markets_lock = threading.Lock()
+    
+    @property
+    def id(self):
+        return getattr(self.client, 'id', 'exchange')
+    
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+    
+    def fetch_ohlcv(self, symbol, timeframe='1h', since=None, limit=None, params=None):
+        self.limiter.acquire()
+        return self.client.fetch_ohlcv(symbol, timeframe, since=since, limit=limit, params=params or {})
+    
+    def load_markets(self, reload=False):
+        """Mercados del exchange, recargados solo si caducó la caché"""
+        with self._markets_lock:
+            expired = (
+                self._markets_loaded_at is None or
+                time.monotonic() - self._markets_loaded_at > self.markets_ttl
+            )
+            if reload or expired:
+                self.limiter.acquire()
+                self.client.load_markets(True)
+                self._markets_loaded_at = time.monotonic()
+            
+            return self.client.markets
+
+
+class ExchangePool:
+    """Registro de clientes compartidos, uno por exchange"""
+    
+    def __init__(self, markets_ttl=3600, pool_size=16, burst=5):
+        """
+        Args:
+            markets_ttl: Segundos que se reutilizan los mercados cargados
+            pool_size: Conexiones HTTP keep-alive por cliente
+            burst: Peticiones seguidas permitidas antes de aplicar el límite
+        """
+        self.markets_ttl = markets_ttl
+        self.pool_size = pool_size
+        self.burst = burst
+        
+        self._clients = {}
+        self._lock = threading.Lock()
+    
+    def get(self, exchange_id='binance', factory=None):
+        """
+        Obtener el cliente compartido de un exchange
+        
+        Args:
+            exchange_id: Identificador ccxt del exchange
+            factory: Función sin argumentos que crea el cliente (opcional)
+        
+        Returns:
+            PooledExchange
+        """
+        with self._lock:
+            pooled = self._clients.get(exchange_id)
+            if pooled is None:
+                client = factory() if factory else self._create_client(exchange_id)
+                
+                # El límite lo aplica el pool para que sea común a todos los hilos
+                interval = getattr(client, 'rateLimit', 0) / 1000
+                limiter = RateLimiter(interval, burst=self.burst)
+                
+                pooled = PooledExchange(client, limiter, self.markets_ttl)
+                self._clients[exchange_id] = pooled
+            
+            return pooled
+    
+    def _create_client(self, exchange_id):
+        if not CCXT_AVAILABLE:
+            raise Exception("CCXT no disponible")
+        
+        client = getattr(ccxt, exchange_id)({'enableRateLimit': False})
+        
+        # Sesión keep-alive con tantas conexiones como descargas simultáneas
+        session = getattr(client, 'session', None)
+        if session is not None:
+            try:
+                from requests.adapters import HTTPAdapter
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+            except ImportError:
+                pass
+        
+        return client
+    
+    def close(self):
+        """Cerrar las sesiones HTTP de todos los clientes"""
+        with self._lock:
+            for pooled in self._clients.values():
+                session = getattr(pooled.client, 'session', None)
+                if session is not None:
+                    session.close()
+            self._clients.clear()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Pool de clientes compartido por todo el proceso"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ExchangePool()
+        return _default_pool
+
+
+def create_async_client(exchange_id='binance'):
+    """
+    Crear un cliente de ccxt.async_support
+    
+    Su sesión HTTP queda ligada al event loop en que se usa: hace falta uno
+    por loop y cerrarlo con `await client.close()`. El límite de peticiones
+    lo aplica el propio ccxt (enableRateLimit) sin bloquear el loop.
+    
+    Args:
+        exchange_id: Identificador ccxt del exchange
+    
+    Returns:
+        Cliente asíncrono
+    """
+    if not CCXT_AVAILABLE:
+        raise Exception("CCXT no disponible")
+    
+    import ccxt.async_support as ccxt_async
+    return getattr(ccxt_async, exchange_id)({'enableRateLimit': True})
@@ -0,0 +1,155 @@
+"""
+Exchange falso para pruebas sin conexión
+Sirve velas OHLCV predefinidas con la misma interfaz que ccxt
+"""
+import asyncio
+import numpy as np
+
+from candle_store import timeframe_to_ms
+
+# 2020-09-14 00:00 UTC (lunes): alineado con velas diarias y semanales
+SYNTHETIC_START_MS = 1_600_041_600_000
+
+
+def synthetic_ohlcv(n, seed=0, timeframe='1h', start=SYNTHETIC_START_MS, price=100.0,
+                    volatility=0.01):
+    """
+    Velas sintéticas deterministas (paseo aleatorio con volumen)
+    
+    La misma semilla produce siempre las mismas velas. El volumen crece con
+    el tamaño del movimiento, como en un mercado real.
+    
+    Args:
+        n: Número de velas
+        seed: Semilla del generador
+        timeframe: Timeframe de las velas
+        start: Timestamp en ms de la primera vela
+        price: Precio inicial
+        volatility: Desviación típica del retorno logarítmico por vela
+    
+    Returns:
+        Array (n, 6) con timestamp en ms y OHLCV
+    """
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.0, volatility, n)
+    
+    close = price * np.exp(np.cumsum(returns))
+    open_ = np.empty(n)
+    open_[0] = price
+    open_[1:] = close[:-1]
+    
+    wick = np.abs(rng.normal(0.0, volatility / 3, (2, n)))
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    volume = rng.lognormal(3.0, 0.5, n) * (1 + np.abs(returns) / volatility)
+    
+    ohlcv = np.empty((n, 6))
+    ohlcv[:, 0] = start + np.arange(n, dtype=np.int64) * timeframe_to_ms(timeframe)
+    ohlcv[:, 1] = open_
+    ohlcv[:, 2] = high
+    ohlcv[:, 3] = low
+    ohlcv[:, 4] = close
+    ohlcv[:, 5] = volume
+    return ohlcv
+
+
+class FakeExchange:
+    """Sustituto de un cliente ccxt que sirve velas en memoria"""
+    
+    def __init__(self, ohlcv, exchange_id='fake', now_ms=None):
+        """
+        Inicializar exchange falso
+        
+        Args:
+            ohlcv: Dict {(symbol, timeframe): [[ts, o, h, l, c, v], ...]}
+            exchange_id: Identificador usado como clave en el almacén
+            now_ms: Hora actual simulada (por defecto, la última vela)
+        """
+        self.id = exchange_id
+        self.ohlcv = {key: [list(row) for row in rows] for key, rows in ohlcv.items()}
+        self.now_ms = now_ms
+        self.calls = []
+    
+    def milliseconds(self):
+        if self.now_ms is not None:
+            return self.now_ms
+        return max(int(rows[-1][0]) for rows in self.ohlcv.values() if rows)
+    
+    def parse_timeframe(self, timeframe):
+        return timeframe_to_ms(timeframe) // 1000
+    
+    def add_candle(self, symbol, timeframe, row):
+        """Añadir (o reemplazar si coincide el timestamp) una vela"""
+        rows = self.ohlcv.setdefault((symbol, timeframe), [])
+        if rows and rows[-1][0] == row[0]:
+            rows[-1] = list(row)
+        else:
+            rows.append(list(row))
+    
+    def fetch_ohlcv(self, symbol, timeframe='1h', since=None, limit=None, params=None):
+        self.calls.append((symbol, timeframe, since, limit))
+        
+        rows = self.ohlcv.get((symbol, timeframe), [])
+        if since is not None:
+            rows = [row for row in rows if row[0] >= since]
+            if limit is not None:
+                rows = rows[:limit]
+        elif limit is not None:
+            rows = rows[-limit:]
+        
+        return [list(row) for row in rows]
+
+
+class FakeAsyncExchange(FakeExchange):
+    """Versión asíncrona (interfaz de ccxt.async_support) con latencia simulada"""
+    
+    def __init__(self, ohlcv, exchange_id='fake', now_ms=None, latency=0.0):
+        """
+        Inicializar exchange falso
+        
+        Args:
+            ohlcv: Dict {(symbol, timeframe): [[ts, o, h, l, c, v], ...]}
+            exchange_id: Identificador usado como clave en el almacén
+            now_ms: Hora actual simulada (por defecto, la última vela)
+            latency: Segundos que tarda cada petición
+        """
+        super().__init__(ohlcv, exchange_id, now_ms)
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.closed = False
+    
+    async def fetch_ohlcv(self, symbol, timeframe='1h', since=None, limit=None, params=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return FakeExchange.fetch_ohlcv(self, symbol, timeframe, since, limit, params)
+        finally:
+            self.in_flight -= 1
+    
+    async def close(self):
+        self.closed = True
+
+
+def synthetic_exchange(symbols, n=1000, timeframe='1h', seed=0, exchange_id='fake'):
+    """
+    FakeExchange con velas sintéticas para varios símbolos
+    
+    Args:
+        symbols: Lista de pares de trading
+        n: Velas por símbolo
+        timeframe: Timeframe de las velas
+        seed: Semilla base (cada símbolo usa seed + su posición)
+        exchange_id: Identificador usado como clave en el almacén
+    
+    Returns:
+        FakeExchange cuya hora actual es la última vela
+    """
+    ohlcv = {
+        (symbol, timeframe): synthetic_ohlcv(n, seed + i, timeframe).tolist()
+        for i, symbol in enumerate(symbols)
+    }
+    now_ms = SYNTHETIC_START_MS + (n - 1) * timeframe_to_ms(timeframe)
+    return FakeExchange(ohlcv, exchange_id, now_ms=now_ms)
@@ -0,0 +1,383 @@
+"""
+Motor de indicadores incremental
+Actualiza cada indicador en O(1) por vela en lugar de recalcular toda la serie
+"""
+import math
+import numpy as np
+
+INDICATOR_COLUMNS = [
+    'rsi', 'ema_9', 'ema_21', 'ema_50', 'macd', 'macd_signal',
+    'bb_middle', 'bb_upper', 'bb_lower', 'bb_width', 'atr',
+    'volume_sma', 'volume_ratio', 'return_1', 'return_5', 'volatility_20',
+]
+
+NAN = float('nan')
+
+
+class _Ema:
+    """EMA equivalente a pandas ewm(span=n, adjust=True)"""
+    
+    __slots__ = ('decay', 'num', 'den')
+    
+    def __init__(self, span):
+        self.decay = 1 - 2 / (span + 1)
+        self.num = 0.0
+        self.den = 0.0
+    
+    def update(self, x):
+        self.num = x + self.decay * self.num
+        self.den = 1 + self.decay * self.den
+        return self.num / self.den
+    
+    def snapshot(self):
+        return self.num, self.den
+    
+    def restore(self, snapshot):
+        self.num, self.den = snapshot
+
+
+class _Window:
+    """
+    Ventana deslizante (ring buffer) con media y varianza por Welford
+    
+    Quitar valores acumula error de redondeo (sobre todo tras un cambio
+    grande de nivel), así que cada `size` actualizaciones la media y la
+    varianza se recalculan exactas desde el buffer: O(1) amortizado.
+    """
+    
+    __slots__ = ('size', 'values', 'pos', 'count', 'nans', 'mean', 'm2', 'since_resync')
+    
+    def __init__(self, size):
+        self.size = size
+        self.values = [NAN] * size
+        self.pos = 0
+        self.count = 0
+        self.nans = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.since_resync = 0
+    
+    def update(self, x):
+        old = self.values[self.pos]
+        self.values[self.pos] = x
+        self.pos = (self.pos + 1) % self.size
+        
+        if self.count == self.size:
+            self._remove(old)
+        else:
+            self.count += 1
+        self._add(x)
+        
+        self.since_resync += 1
+        if self.since_resync >= self.size:
+            self._resync()
+    
+    def _resync(self):
+        """Recalcular media y m2 desde el buffer (dos pasadas)"""
+        # Los huecos sin llenar también son NaN
+        values = [v for v in self.values if not math.isnan(v)]
+        if values:
+            mean = math.fsum(values) / len(values)
+            self.mean = mean
+            self.m2 = math.fsum((v - mean) ** 2 for v in values)
+        else:
+            self.mean = 0.0
+            self.m2 = 0.0
+        self.since_resync = 0
+    
+    def _add(self, x):
+        if math.isnan(x):
+            self.nans += 1
+            return
+        n = self.count - self.nans
+        delta = x - self.mean
+        self.mean += delta / n
+        self.m2 += delta * (x - self.mean)
+    
+    def _remove(self, x):
+        if math.isnan(x):
+            self.nans -= 1
+            return
+        n = self.count - self.nans
+        if n <= 1:
+            self.mean = 0.0
+            self.m2 = 0.0
+            return
+        mean_without = (n * self.mean - x) / (n - 1)
+        self.m2 -= (x - self.mean) * (x - mean_without)
+        self.mean = mean_without
+    
+    @property
+    def full(self):
+        return self.count == self.size and self.nans == 0
+    
+    def get_mean(self):
+        return self.mean if self.full else NAN
+    
+    def get_std(self):
+        if not self.full:
+            return NAN
+        return math.sqrt(max(self.m2, 0.0) / (self.size - 1))
+    
+    def snapshot(self):
+        # update() solo escribe en values[pos]: basta con guardar esa posición
+        return (
+            self.pos, self.values[self.pos], self.count, self.nans,
+            self.mean, self.m2, self.since_resync,
+        )
+    
+    def restore(self, snapshot):
+        pos, old, self.count, self.nans, self.mean, self.m2, self.since_resync = snapshot
+        self.values[pos] = old
+        self.pos = pos
+
+
+class StreamingIndicators:
+    """
+    Indicadores técnicos de CryptoPredictor.calculate_indicators en modo streaming
+    
+    Cada llamada a update() procesa una vela y devuelve la fila de indicadores
+    resultante. Si la vela tiene el mismo timestamp que la anterior (vela aún
+    abierta) se reemplaza en lugar de añadirse.
+    """
+    
+    def __init__(self):
+        self.last_timestamp = None
+        self.count = 0
+        
+        self._state = self._new_state()
+        self._undo = None
+        self._row = None
+    
+    @staticmethod
+    def _new_state():
+        return {
+            'ema_9': _Ema(9), 'ema_21': _Ema(21), 'ema_50': _Ema(50),
+            'ema_12': _Ema(12), 'ema_26': _Ema(26), 'macd_signal': _Ema(9),
+            'gain': _Window(14), 'loss': _Window(14), 'tr': _Window(14),
+            'close': _Window(20), 'volume': _Window(20), 'returns': _Window(20),
+            'closes': [],
+        }
+    
+    def _snapshot(self):
+        """Lo que la próxima vela va a modificar, para poder deshacerla (O(1))"""
+        return tuple(
+            tuple(value) if key == 'closes' else value.snapshot()
+            for key, value in self._state.items()
+        )
+    
+    def _restore(self, undo):
+        for (key, value), snapshot in zip(self._state.items(), undo):
+            if key == 'closes':
+                value[:] = snapshot
+            else:
+                value.restore(snapshot)
+    
+    def update(self, candle):
+        """
+        Procesar una vela
+        
+        Args:
+            candle: Secuencia [timestamp_ms, open, high, low, close, volume]
+        
+        Returns:
+            Diccionario con OHLCV e indicadores de la vela
+        """
+        timestamp = int(candle[0])
+        
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            raise ValueError("Las velas deben llegar en orden temporal")
+        
+        if timestamp == self.last_timestamp:
+            # Vela abierta: deshacer la versión anterior
+            self._restore(self._undo)
+            self.count -= 1
+        self._undo = self._snapshot()
+        
+        self._row = self._apply(timestamp, candle)
+        self.last_timestamp = timestamp
+        self.count += 1
+        return self._row
+    
+    def update_many(self, candles):
+        """Procesar varias velas en orden y devolver la última fila"""
+        row = self._row
+        for candle in candles:
+            row = self.update(candle)
+        return row
+    
+    @property
+    def row(self):
+        """Última fila calculada"""
+        return self._row
+    
+    def _apply(self, timestamp, candle):
+        s = self._state
+        _, open_, high, low, close, volume = (float(v) for v in candle[:6])
+        
+        closes = s['closes']
+        prev_close = closes[-1] if closes else NAN
+        close_5 = closes[-5] if len(closes) >= 5 else NAN
+        
+        # RSI (medias simples de 14 periodos, como la versión pandas)
+        delta = close - prev_close
+        s['gain'].update(delta if delta > 0 else 0.0)
+        s['loss'].update(-delta if delta < 0 else 0.0)
+        gain = s['gain'].get_mean()
+        loss = s['loss'].get_mean()
+        if math.isnan(gain) or (gain == 0 and loss == 0):
+            rsi = NAN
+        elif loss == 0:
+            rsi = 100.0
+        else:
+            rsi = 100 - (100 / (1 + gain / loss))
+        
+        # EMAs y MACD
+        ema_9 = s['ema_9'].update(close)
+        ema_21 = s['ema_21'].update(close)
+        ema_50 = s['ema_50'].update(close)
+        macd = s['ema_12'].update(close) - s['ema_26'].update(close)
+        macd_signal = s['macd_signal'].update(macd)
+        
+        # Bollinger Bands
+        s['close'].update(close)
+        bb_middle = s['close'].get_mean()
+        bb_std = s['close'].get_std()
+        bb_upper = bb_middle + 2 * bb_std
+        bb_lower = bb_middle - 2 * bb_std
+        bb_width = (bb_upper - bb_lower) / bb_middle
+        
+        # ATR
+        if math.isnan(prev_close):
+            true_range = high - low
+        else:
+            true_range = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        s['tr'].update(true_range)
+        atr = s['tr'].get_mean()
+        
+        # Volume
+        s['volume'].update(volume)
+        volume_sma = s['volume'].get_mean()
+        volume_ratio = volume / volume_sma if volume_sma else NAN
+        
+        # Returns y volatilidad
+        return_1 = close / prev_close - 1
+        return_5 = close / close_5 - 1
+        s['returns'].update(return_1)
+        volatility_20 = s['returns'].get_std()
+        
+        closes.append(close)
+        if len(closes) > 5:
+            del closes[0]
+        
+        return {
+            'timestamp': timestamp,
+            'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume,
+            'rsi': rsi,
+            'ema_9': ema_9, 'ema_21': ema_21, 'ema_50': ema_50,
+            'macd': macd, 'macd_signal': macd_signal,
+            'bb_middle': bb_middle, 'bb_upper': bb_upper,
+            'bb_lower': bb_lower, 'bb_width': bb_width,
+            'atr': atr,
+            'volume_sma': volume_sma, 'volume_ratio': volume_ratio,
+            'return_1': return_1, 'return_5': return_5,
+            'volatility_20': volatility_20,
+        }
+
+
+def pandas_indicators(ohlcv):
+    """
+    Implementación de referencia en pandas (rolling / ewm) de los indicadores
+    
+    Es la versión original de calculate_indicators, antes de pasar a NumPy;
+    solo se usa para comprobar las demás implementaciones.
+    
+    Args:
+        ohlcv: Array (n, 6) de velas
+    
+    Returns:
+        DataFrame con OHLCV e indicadores
+    """
+    import pandas as pd
+    
+    ohlcv = np.asarray(ohlcv, dtype=np.float64)
+    df = pd.DataFrame(ohlcv[:, 1:], columns=['open', 'high', 'low', 'close', 'volume'])
+    
+    # RSI
+    delta = df['close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    rs = gain / loss
+    df['rsi'] = 100 - (100 / (1 + rs))
+    
+    # EMAs y MACD
+    df['ema_9'] = df['close'].ewm(span=9).mean()
+    df['ema_21'] = df['close'].ewm(span=21).mean()
+    df['ema_50'] = df['close'].ewm(span=50).mean()
+    df['macd'] = df['close'].ewm(span=12).mean() - df['close'].ewm(span=26).mean()
+    df['macd_signal'] = df['macd'].ewm(span=9).mean()
+    
+    # Bollinger Bands
+    df['bb_middle'] = df['close'].rolling(20).mean()
+    bb_std = df['close'].rolling(20).std()
+    df['bb_upper'] = df['bb_middle'] + (2 * bb_std)
+    df['bb_lower'] = df['bb_middle'] - (2 * bb_std)
+    df['bb_width'] = (df['bb_upper'] - df['bb_lower']) / df['bb_middle']
+    
+    # ATR
+    high_low = df['high'] - df['low']
+    high_close = np.abs(df['high'] - df['close'].shift())
+    low_close = np.abs(df['low'] - df['close'].shift())
+    true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
+    df['atr'] = true_range.rolling(14).mean()
+    
+    # Volume
+    df['volume_sma'] = df['volume'].rolling(20).mean()
+    df['volume_ratio'] = df['volume'] / df['volume_sma']
+    
+    # Returns y volatilidad
+    df['return_1'] = df['close'].pct_change(1)
+    df['return_5'] = df['close'].pct_change(5)
+    df['volatility_20'] = df['close'].pct_change().rolling(20).std()
+    
+    return df
+
+
+def _max_errors(got, expected, rtol, atol, prefix=''):
+    errors = {}
+    for col in INDICATOR_COLUMNS:
+        ref = expected[col].to_numpy(dtype=np.float64)
+        if not np.allclose(got[col], ref, rtol=rtol, atol=atol, equal_nan=True):
+            errors[prefix + col] = float(np.nanmax(np.abs(got[col] - ref)))
+    return errors
+
+
+def parity_report(ohlcv, predictor=None, rtol=1e-6, atol=1e-9):
+    """
+    Comparar el motor incremental con la referencia en pandas
+    
+    Args:
+        ohlcv: Array (n, 6) de velas
+        predictor: CryptoPredictor cuyo calculate_indicators (NumPy) se
+            compara también con la referencia (opcional)
+        rtol: Tolerancia relativa
+        atol: Tolerancia absoluta
+    
+    Returns:
+        Diccionario {columna: error máximo} solo con las columnas fuera de
+        tolerancia; las de calculate_indicators llevan el prefijo
+        'calculate_indicators.'
+    """
+    ohlcv = np.asarray(ohlcv, dtype=np.float64)
+    expected = pandas_indicators(ohlcv)
+    
+    engine = StreamingIndicators()
+    rows = [engine.update(candle) for candle in ohlcv]
+    streaming = {col: np.array([row[col] for row in rows]) for col in INDICATOR_COLUMNS}
+    errors = _max_errors(streaming, expected, rtol, atol)
+    
+    if predictor is not None:
+        frame = predictor.calculate_indicators(expected[['open', 'high', 'low', 'close', 'volume']])
+        computed = {col: frame[col].to_numpy(dtype=np.float64) for col in INDICATOR_COLUMNS}
+        errors.update(_max_errors(computed, expected, rtol, atol, 'calculate_indicators.'))
+    return errors
@@ -0,0 +1,357 @@
+"""
+Indicadores técnicos en NumPy puro
+Mismas columnas que calculate_indicators + create_features, sin pandas y
+reutilizando buffers preasignados entre llamadas
+"""
+import math
+import warnings
+import numpy as np
+
+INDICATOR_COLUMNS = [
+    'rsi', 'ema_9', 'ema_21', 'ema_50', 'macd', 'macd_signal',
+    'bb_middle', 'bb_upper', 'bb_lower', 'bb_width', 'atr',
+    'volume_sma', 'volume_ratio', 'return_1', 'return_5', 'volatility_20',
+]
+
+FEATURE_COLUMNS = ['price_to_ema50', 'rsi_normalized', 'bb_position']
+
+# Features de los modelos ML en el orden en que se entrenan (sin columnas que
+# dependan del nivel de precio). Cambiar la lista o el cálculo de alguna obliga
+# a subir la versión y reentrenar
+MODEL_FEATURES = [
+    'rsi_normalized', 'bb_width', 'bb_position', 'price_to_ema50',
+    'volume_ratio', 'return_1', 'return_5', 'volatility_20',
+]
+FEATURE_SCHEMA_VERSION = 1
+
+# Máximo crecimiento de d^-k dentro de un bloque del EMA (e^40)
+_EWM_MAX_EXPONENT = 40.0
+
+# Filas por bloque de las sumas acumuladas de rolling_stats
+_ROLLING_BLOCK = 4096
+
+
+def ewm_mean(x, span, out):
+    """
+    EMA equivalente a pandas ewm(span=span, adjust=True).mean()
+    
+    Se evalúa en forma cerrada por bloques: dentro de cada bloque
+    y_k = d^k * (acumulado * d + cumsum(x_i * d^-i)), con bloques lo bastante
+    cortos para que d^-k no desborde.
+    
+    Args:
+        x: Array float64 sin NaN (1-D, o 2-D con una serie por columna)
+        span: Periodo del EMA
+        out: Array de salida (misma forma que x)
+    
+    Returns:
+        out
+    """
+    n = len(x)
+    decay = 1 - 2 / (span + 1)
+    log_decay = math.log(decay)
+    block = max(1, int(_EWM_MAX_EXPONENT / -log_decay))
+    
+    # Potencias en el eje del tiempo, que es siempre el primero
+    shape = (-1,) + (1,) * (x.ndim - 1)
+    powers = (decay ** np.arange(min(block, n) + 1)).reshape(shape)
+    inv_powers = 1 / powers
+    
+    carry = 0.0
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        k = stop - start
+        np.multiply(x[start:stop], inv_powers[:k], out=out[start:stop])
+        np.cumsum(out[start:stop], axis=0, out=out[start:stop])
+        out[start:stop] += carry * decay
+        out[start:stop] *= powers[:k]
+        carry = out[stop - 1]
+    
+    # Denominador: sum_{i<=t} d^(t-i) = (1 - d^(t+1)) / (1 - d)
+    t = np.arange(1, n + 1, dtype=np.float64).reshape(shape)
+    out /= (1 - decay ** t) / (1 - decay)
+    return out
+
+
+def _work(work, name, shape):
+    """Buffer de trabajo reutilizable (se amplía si no cabe)"""
+    if work is None:
+        return np.empty(shape)
+    # Un buffer por forma de las columnas: series sueltas y apiladas no se pisan
+    key = (name,) + tuple(shape[1:])
+    buf = work.get(key)
+    if buf is None or len(buf) < shape[0]:
+        buf = work[key] = np.empty(shape)
+    return buf[:shape[0]]
+
+
+def rolling_stats(x, windows, means=None, stds=None, sums=None, work=None, block=_ROLLING_BLOCK):
+    """
+    Suma, media y desviación típica (ddof=1) móviles de varias ventanas en
+    una sola pasada
+    
+    Las sumas por ventana salen de sumas acumuladas de x centrado en la
+    media de cada bloque, reiniciadas en cada bloque de `block` filas: el
+    error de redondeo depende del tamaño del bloque y no de la longitud del
+    histórico (sin deriva), y el centrado evita la cancelación de
+    sum(x^2) - sum(x)^2 / n con precios altos.
+    
+    Args:
+        x: Array float64 en el eje del tiempo (1-D, o N-D con una serie por
+            columna); una ventana con NaN da NaN, como pandas rolling
+        windows: Tamaños de ventana (o un solo entero)
+        means: Arrays de salida de la media, uno por ventana (None para no calcularla)
+        stds: Arrays de salida de la desviación típica, uno por ventana
+        sums: Arrays de salida de la suma, uno por ventana
+        work: Diccionario donde reutilizar los buffers de trabajo (opcional)
+        block: Filas por bloque
+    
+    Returns:
+        Tupla (means, stds, sums) con los arrays de salida
+    """
+    if isinstance(windows, int):
+        windows = (windows,)
+        means, stds, sums = ([out] if out is not None else None for out in (means, stds, sums))
+    n = len(x)
+    max_window = max(windows)
+    outputs = [
+        (w, means[i] if means else None, stds[i] if stds else None, sums[i] if sums else None)
+        for i, w in enumerate(windows)
+    ]
+    
+    # Filas sin ventana completa
+    for w, *outs in outputs:
+        for out in outs:
+            if out is not None:
+                out[:w - 1] = np.nan
+    
+    rest = x.shape[1:]
+    rows = min(block, n) + max_window
+    prefix = _work(work, 'rolling_prefix', (rows,) + rest)
+    prefix_sq = _work(work, 'rolling_prefix_sq', (rows,) + rest)
+    nans = None
+    
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        # Se incluyen las max_window - 1 filas anteriores al bloque
+        first = max(0, start - max_window + 1)
+        segment = x[first:stop]
+        m = stop - first
+        
+        invalid = np.isnan(segment)
+        has_nan = invalid.any()
+        if has_nan:
+            with warnings.catch_warnings():
+                # Columnas enteras de NaN: centro 0
+                warnings.simplefilter('ignore', RuntimeWarning)
+                center = np.nan_to_num(np.nanmean(segment, axis=0))
+        else:
+            center = segment.mean(axis=0)
+        
+        # prefix[k] = sum(x[first:first + k] - center), prefix[0] = 0
+        p, q = prefix[:m + 1], prefix_sq[:m + 1]
+        p[0] = 0.0
+        q[0] = 0.0
+        np.subtract(segment, center, out=p[1:])
+        if has_nan:
+            p[1:][invalid] = 0.0
+        np.multiply(p[1:], p[1:], out=q[1:])
+        np.cumsum(p[1:], axis=0, out=p[1:])
+        np.cumsum(q[1:], axis=0, out=q[1:])
+        
+        if has_nan:
+            nans = _work(work, 'rolling_nans', (rows,) + rest)[:m + 1]
+            nans[0] = 0.0
+            np.cumsum(invalid, axis=0, out=nans[1:])
+        
+        for w, mean_out, std_out, sum_out in outputs:
+            lo = max(start, w - 1)
+            if lo >= stop:
+                continue
+            # Ventana que termina en la fila t: prefix[t - first + 1] - prefix[t - first + 1 - w]
+            hi_slice = slice(lo - first + 1, stop - first + 1)
+            lo_slice = slice(lo - first + 1 - w, stop - first + 1 - w)
+            window_sum = _work(work, 'rolling_sum', (stop - lo,) + rest)
+            np.subtract(p[hi_slice], p[lo_slice], out=window_sum)
+            
+            if std_out is not None:
+                var = std_out[lo:stop]
+                np.subtract(q[hi_slice], q[lo_slice], out=var)
+                # sum((x - c)^2) - sum(x - c)^2 / w
+                square = _work(work, 'rolling_square', window_sum.shape)
+                np.multiply(window_sum, window_sum, out=square)
+                square /= w
+                var -= square
+                var /= w - 1
+                np.maximum(var, 0.0, out=var)
+                np.sqrt(var, out=var)
+            if mean_out is not None:
+                np.divide(window_sum, w, out=mean_out[lo:stop])
+                mean_out[lo:stop] += center
+            if sum_out is not None:
+                np.add(window_sum, w * center, out=sum_out[lo:stop])
+            
+            if has_nan:
+                incomplete = nans[hi_slice] != nans[lo_slice]
+                for out in (mean_out, std_out, sum_out):
+                    if out is not None:
+                        out[lo:stop][incomplete] = np.nan
+    
+    return means, stds, sums
+
+
+def rolling_mean(x, window, out, work=None):
+    """Media móvil en el eje del tiempo (NaN hasta completar la ventana)"""
+    rolling_stats(x, window, means=out, work=work)
+    return out
+
+
+def rolling_std(x, window, out, work=None):
+    """Desviación típica móvil con ddof=1 (NaN hasta completar la ventana)"""
+    rolling_stats(x, window, stds=out, work=work)
+    return out
+
+
+class NumpyIndicators:
+    """
+    Cálculo de indicadores sobre arrays contiguos float64
+    
+    Los arrays devueltos son vistas de buffers internos que se reutilizan en
+    la siguiente llamada; una instancia no debe compartirse entre hilos.
+    """
+    
+    def __init__(self):
+        self._size = 0
+        self._buffers = {}
+    
+    def _buffer(self, name, shape):
+        buf = self._buffers.get(name)
+        if buf is None or len(buf) < shape[0] or buf.shape[1:] != shape[1:]:
+            buf = np.empty((max(shape[0], self._size),) + shape[1:])
+            self._buffers[name] = buf
+        return buf[:shape[0]]
+    
+    def compute(self, ohlcv):
+        """
+        Calcular indicadores y features
+        
+        Args:
+            ohlcv: Array (n, 6) con timestamp en ms y OHLCV, o diccionario de
+                columnas (p. ej. CandleStore.columns, que se usan sin copiar).
+                Las columnas pueden ser matrices (tiempo x símbolo): cada
+                indicador se calcula por columnas en una sola pasada
+        
+        Returns:
+            Diccionario {columna: array} con OHLCV, indicadores y features
+        """
+        if isinstance(ohlcv, dict):
+            open_, high, low, close, volume = (
+                np.ascontiguousarray(ohlcv[name], dtype=np.float64)
+                for name in ('open', 'high', 'low', 'close', 'volume')
+            )
+        else:
+            ohlcv = np.ascontiguousarray(ohlcv, dtype=np.float64)
+            open_ = ohlcv[:, 1]
+            high = np.ascontiguousarray(ohlcv[:, 2])
+            low = np.ascontiguousarray(ohlcv[:, 3])
+            close = np.ascontiguousarray(ohlcv[:, 4])
+            volume = np.ascontiguousarray(ohlcv[:, 5])
+        
+        n = len(close)
+        self._size = max(self._size, n)
+        b = lambda name: self._buffer(name, close.shape)
+        # Varias series apiladas en el segundo eje para una sola pasada de rolling_stats
+        stacked = lambda name, k: self._buffer(name, (n, k) + close.shape[1:])
+        work = self._buffers
+        
+        cols = {
+            'open': open_, 'high': high, 'low': low,
+            'close': close, 'volume': volume,
+        }
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Medias de 14 velas en una pasada: ganancias, pérdidas (RSI) y true range (ATR)
+            series_14 = stacked('series_14', 3)
+            gain, loss, true_range = series_14[:, 0], series_14[:, 1], series_14[:, 2]
+            
+            delta = b('delta')
+            delta[0] = 0.0
+            np.subtract(close[1:], close[:-1], out=delta[1:])
+            np.maximum(delta, 0, out=gain)
+            np.maximum(np.negative(delta, out=b('tmp')), 0, out=loss)
+            
+            np.subtract(high, low, out=true_range)
+            tmp = b('tmp')
+            np.abs(np.subtract(high[1:], close[:-1], out=tmp[1:]), out=tmp[1:])
+            np.maximum(true_range[1:], tmp[1:], out=true_range[1:])
+            np.abs(np.subtract(low[1:], close[:-1], out=tmp[1:]), out=tmp[1:])
+            np.maximum(true_range[1:], tmp[1:], out=true_range[1:])
+            
+            means_14 = stacked('means_14', 3)
+            rolling_stats(series_14, 14, means=means_14, work=work)
+            avg_gain, avg_loss, atr = means_14[:, 0], means_14[:, 1], means_14[:, 2]
+            
+            # RSI
+            rsi = np.divide(avg_gain, avg_loss, out=b('rsi'))
+            rsi += 1
+            np.divide(100, rsi, out=rsi)
+            np.subtract(100, rsi, out=rsi)
+            cols['rsi'] = rsi
+            
+            # EMAs
+            cols['ema_9'] = ewm_mean(close, 9, b('ema_9'))
+            cols['ema_21'] = ewm_mean(close, 21, b('ema_21'))
+            cols['ema_50'] = ewm_mean(close, 50, b('ema_50'))
+            
+            # MACD
+            macd = ewm_mean(close, 12, b('macd'))
+            macd -= ewm_mean(close, 26, b('tmp'))
+            cols['macd'] = macd
+            cols['macd_signal'] = ewm_mean(macd, 9, b('macd_signal'))
+            
+            # Bollinger Bands (media y desviación en la misma pasada)
+            bb_middle, bb_std = b('bb_middle'), b('tmp')
+            rolling_stats(close, 20, means=bb_middle, stds=bb_std, work=work)
+            bb_std *= 2
+            bb_upper = np.add(bb_middle, bb_std, out=b('bb_upper'))
+            bb_lower = np.subtract(bb_middle, bb_std, out=b('bb_lower'))
+            bb_width = np.subtract(bb_upper, bb_lower, out=b('bb_width'))
+            bb_width /= bb_middle
+            cols.update(bb_middle=bb_middle, bb_upper=bb_upper, bb_lower=bb_lower, bb_width=bb_width)
+            
+            # ATR
+            cols['atr'] = atr
+            
+            # Volume
+            volume_sma = rolling_mean(volume, 20, b('volume_sma'), work)
+            cols['volume_sma'] = volume_sma
+            cols['volume_ratio'] = np.divide(volume, volume_sma, out=b('volume_ratio'))
+            
+            # Returns
+            return_1 = b('return_1')
+            return_1[0] = np.nan
+            np.divide(close[1:], close[:-1], out=return_1[1:])
+            return_1[1:] -= 1
+            cols['return_1'] = return_1
+            
+            return_5 = b('return_5')
+            return_5[:5] = np.nan
+            np.divide(close[5:], close[:-5], out=return_5[5:])
+            return_5[5:] -= 1
+            cols['return_5'] = return_5
+            
+            # Volatility
+            cols['volatility_20'] = rolling_std(return_1, 20, b('volatility_20'), work)
+            
+            # Features
+            cols['price_to_ema50'] = np.divide(close, cols['ema_50'], out=b('price_to_ema50'))
+            
+            rsi_normalized = np.subtract(rsi, 50, out=b('rsi_normalized'))
+            rsi_normalized /= 50
+            cols['rsi_normalized'] = rsi_normalized
+            
+            bb_position = np.subtract(close, bb_lower, out=b('bb_position'))
+            bb_position /= np.subtract(bb_upper, bb_lower, out=b('tmp'))
+            cols['bb_position'] = bb_position
+        
+        return cols
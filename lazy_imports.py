@@ -0,0 +1,205 @@
+"""
+Importación diferida de dependencias pesadas y medición del arranque
+pandas, ccxt, joblib y sklearn se importan en el primer uso o en segundo
+plano, de modo que la interfaz se pinta antes de cargarlos
+"""
+import importlib
+import importlib.util
+import sys
+import threading
+import time
+
+# Referencia de tiempo para las marcas de arranque
+_T0 = time.perf_counter()
+
+_lock = threading.RLock()
+_import_times = {}
+_marks = {}
+
+# Módulos que la app puede cargar en segundo plano tras pintar la interfaz
+PREFETCH_MODULES = ('pandas', 'joblib', 'ccxt')
+
+
+def is_available(name):
+    """True si el módulo está instalado (sin importarlo)"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def load(name):
+    """
+    Importar un módulo registrando cuánto tarda
+    
+    Args:
+        name: Nombre del módulo ('pandas', 'ccxt.async_support', ...)
+    
+    Returns:
+        El módulo importado
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    
+    # Dos hilos no deben importar a la vez el mismo módulo a medias
+    with _lock:
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        _import_times[name] = time.perf_counter() - start
+    
+    return module
+
+
+class LazyModule:
+    """
+    Módulo que se importa al acceder al primer atributo
+    
+    pd = LazyModule('pandas') se usa igual que el módulo (pd.DataFrame, ...)
+    pero pandas no se carga hasta la primera llamada.
+    """
+    
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+    
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = load(self._name)
+            self.__dict__['_module'] = module
+        return module
+    
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+    
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+    
+    def __dir__(self):
+        return dir(self._load())
+    
+    @property
+    def loaded(self):
+        return self.__dict__['_module'] is not None or self._name in sys.modules
+    
+    def __repr__(self):
+        state = 'cargado' if self.loaded else 'diferido'
+        return f"<LazyModule '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    """Devolver un LazyModule para name (o el módulo si ya está importado)"""
+    return sys.modules.get(name) or LazyModule(name)
+
+
+def prefetch(names=PREFETCH_MODULES, callback=None):
+    """
+    Importar módulos en un hilo de fondo
+    
+    Los que no estén instalados se ignoran.
+    
+    Args:
+        names: Nombres de los módulos
+        callback: Función llamada sin argumentos al terminar (opcional)
+    
+    Returns:
+        Hilo lanzado
+    """
+    def run():
+        for name in names:
+            if name in sys.modules or not is_available(name):
+                continue
+            try:
+                load(name)
+            except Exception as e:
+                print(f"Error precargando {name}: {e}")
+        mark('prefetch_done')
+        if callback is not None:
+            callback()
+    
+    thread = threading.Thread(target=run, name='prefetch', daemon=True)
+    thread.start()
+    return thread
+
+
+def mark(name):
+    """Registrar una marca de arranque (solo cuenta la primera vez)"""
+    with _lock:
+        _marks.setdefault(name, time.perf_counter() - _T0)
+
+
+def import_report():
+    """
+    Tiempos de arranque
+    
+    Returns:
+        Diccionario con 'marks' {marca: segundos desde que se importó este
+        módulo} e 'imports' {módulo: segundos de importación}, ordenados
+    """
+    with _lock:
+        marks = sorted(_marks.items(), key=lambda item: item[1])
+        imports = sorted(_import_times.items(), key=lambda item: -item[1])
+    return {'marks': dict(marks), 'imports': dict(imports)}
+
+
+def format_report(report=None):
+    """Texto legible del informe de arranque"""
+    report = report or import_report()
+    lines = ["Arranque (s desde el inicio):"]
+    for name, seconds in report['marks'].items():
+        lines.append(f"  {name:<24} {seconds:8.3f}")
+    lines.append("Importaciones diferidas (s):")
+    for name, seconds in report['imports'].items():
+        lines.append(f"  {name:<24} {seconds:8.3f}")
+    return '\n'.join(lines)
+
+
+def importtime(module, top=15):
+    """
+    Medir la importación de un módulo con python -X importtime
+    
+    Se ejecuta en un proceso nuevo para que no influyan los módulos ya
+    cargados.
+    
+    Args:
+        module: Módulo a importar
+        top: Número de entradas a devolver
+    
+    Returns:
+        Lista [(módulo, microsegundos acumulados)] de mayor a menor
+    """
+    import subprocess
+    
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        try:
+            _, cumulative, name = line.split('|')
+            entries.append((name.strip(), int(cumulative)))
+        except ValueError:
+            continue
+    
+    entries.sort(key=lambda entry: -entry[1])
+    return entries[:top]
+
+
+if __name__ == '__main__':
+    # Uso: python lazy_imports.py [módulo ...]
+    for module in sys.argv[1:] or ['predictor_core']:
+        entries = importtime(module)
+        print(f"import {module}: {entries[0][1] / 1000:.1f} ms" if entries else module)
+        for name, micros in entries[1:]:
+            print(f"  {name:<40} {micros / 1000:8.1f} ms")
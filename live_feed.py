@@ -0,0 +1,270 @@
+"""
+Feed de velas en tiempo real y señales continuas
+Fuentes: WebSocket vía ccxt.pro o reproducción local de un histórico
+"""
+import asyncio
+import threading
+import time
+from abc import ABC, abstractmethod
+
+try:
+    import ccxt.pro as ccxtpro
+    CCXTPRO_AVAILABLE = True
+except:
+    CCXTPRO_AVAILABLE = False
+
+
+class CandleFeed(ABC):
+    """
+    Interfaz de un feed de velas
+    
+    Los listeners reciben (symbol, timeframe, candle, closed) con
+    candle = [timestamp_ms, open, high, low, close, volume]. Las
+    subclases implementan start() y stop().
+    """
+    
+    def __init__(self):
+        self.subscriptions = []
+        self._listeners = []
+    
+    def subscribe(self, symbol, timeframe='1h'):
+        """Añadir un par (symbol, timeframe) al feed"""
+        if (symbol, timeframe) not in self.subscriptions:
+            self.subscriptions.append((symbol, timeframe))
+    
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+    
+    def _emit(self, symbol, timeframe, candle, closed):
+        for callback in list(self._listeners):
+            callback(symbol, timeframe, candle, closed)
+    
+    @abstractmethod
+    def start(self):
+        """Empezar a emitir velas (no bloquea)"""
+    
+    @abstractmethod
+    def stop(self):
+        """Dejar de emitir velas"""
+
+
+class CcxtProFeed(CandleFeed):
+    """Velas por WebSocket (watch_ohlcv de ccxt.pro) en un hilo con su propio event loop"""
+    
+    def __init__(self, exchange_id='binance', reconnect_delay=1.0, max_reconnect_delay=30.0):
+        super().__init__()
+        self.exchange_id = exchange_id
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        
+        self._loop = None
+        self._thread = None
+        self._running = False
+    
+    def start(self):
+        if not CCXTPRO_AVAILABLE:
+            raise Exception("ccxt.pro no disponible")
+        if self._running:
+            return
+        
+        self._running = True
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._main())
+    
+    async def _main(self):
+        exchange = getattr(ccxtpro, self.exchange_id)({'enableRateLimit': True})
+        try:
+            await asyncio.gather(*[
+                self._watch(exchange, symbol, timeframe)
+                for symbol, timeframe in self.subscriptions
+            ])
+        finally:
+            await exchange.close()
+    
+    async def _watch(self, exchange, symbol, timeframe):
+        last = None
+        delay = self.reconnect_delay
+        
+        while self._running:
+            try:
+                candles = await exchange.watch_ohlcv(symbol, timeframe)
+                delay = self.reconnect_delay
+            except Exception:
+                # Reconexión con espera exponencial
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+                continue
+            
+            for candle in sorted(candles, key=lambda c: c[0]):
+                if last is not None and candle[0] < last[0]:
+                    continue
+                if last is not None and candle[0] > last[0]:
+                    # Empezó una vela nueva: la anterior quedó cerrada
+                    self._emit(symbol, timeframe, last, True)
+                last = list(candle)
+            
+            if last is not None:
+                self._emit(symbol, timeframe, last, False)
+    
+    def stop(self):
+        self._running = False
+        if self._loop is not None:
+            for task in asyncio.all_tasks(self._loop):
+                self._loop.call_soon_threadsafe(task.cancel)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+class ReplayFeed(CandleFeed):
+    """
+    Reproducción local de velas (sustituto del WebSocket para pruebas)
+    
+    Cada vela se emite opcionalmente en partial_steps actualizaciones
+    parciales y después como cerrada.
+    """
+    
+    def __init__(self, candles, interval=0.0, partial_steps=0):
+        """
+        Args:
+            candles: Diccionario {(symbol, timeframe): [[ts, o, h, l, c, v], ...]}
+            interval: Segundos entre emisiones
+            partial_steps: Actualizaciones parciales por vela
+        """
+        super().__init__()
+        self.candles = candles
+        self.interval = interval
+        self.partial_steps = partial_steps
+        
+        self._thread = None
+        self._running = False
+    
+    def run(self):
+        """Reproducir todo de forma síncrona en el hilo actual"""
+        self._running = True
+        keys = [key for key in self.subscriptions if key in self.candles]
+        n = max((len(self.candles[key]) for key in keys), default=0)
+        
+        for i in range(n):
+            for symbol, timeframe in keys:
+                rows = self.candles[(symbol, timeframe)]
+                if i >= len(rows):
+                    continue
+                ts, open_, high, low, close, volume = rows[i]
+                
+                for step in range(1, self.partial_steps + 1):
+                    if not self._running:
+                        return
+                    frac = step / (self.partial_steps + 1)
+                    partial_close = open_ + (close - open_) * frac
+                    partial = [
+                        ts, open_, max(open_, partial_close), min(open_, partial_close),
+                        partial_close, volume * frac,
+                    ]
+                    self._emit(symbol, timeframe, partial, False)
+                
+                if not self._running:
+                    return
+                self._emit(symbol, timeframe, list(rows[i]), True)
+            
+            if self.interval:
+                time.sleep(self.interval)
+    
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+class SignalStream:
+    """Señales continuas: aplica cada vela del feed al predictor y avisa a los suscriptores"""
+    
+    def __init__(self, predictor, feed, emit_partial=True, persist=True):
+        """
+        Args:
+            predictor: CryptoPredictor
+            feed: CandleFeed
+            emit_partial: Generar señales también con la vela aún abierta
+            persist: Guardar las velas cerradas en el histórico local
+        """
+        self.predictor = predictor
+        self.feed = feed
+        self.emit_partial = emit_partial
+        self.persist = persist
+        
+        self.errors = 0
+        self.last_error = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+        
+        feed.add_listener(self._on_candle)
+    
+    def subscribe(self, callback):
+        """
+        Registrar un suscriptor (recibe cada señal nueva)
+        
+        Returns:
+            Función para cancelar la suscripción
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+        return lambda: self._unsubscribe(callback)
+    
+    def _unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+    
+    def watch(self, symbols, timeframe='1h', warm_up=True):
+        """
+        Seguir una lista de símbolos
+        
+        Args:
+            symbols: Lista de pares
+            timeframe: Timeframe
+            warm_up: Calentar los indicadores con una descarga inicial
+        """
+        if warm_up:
+            for signal in self.predictor.scan(symbols, timeframe):
+                self._publish(signal)
+        
+        for symbol in symbols:
+            self.feed.subscribe(symbol, timeframe)
+    
+    def start(self):
+        self.feed.start()
+    
+    def stop(self):
+        self.feed.stop()
+    
+    def _on_candle(self, symbol, timeframe, candle, closed):
+        if not closed and not self.emit_partial:
+            return
+        
+        try:
+            if closed and self.persist:
+                self.predictor.store_candles(symbol, timeframe, [candle])
+            
+            signal = self.predictor.signal_from_candle(symbol, timeframe, candle)
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            signal = {'symbol': symbol, 'timeframe': timeframe, 'error': str(e)}
+        
+        if signal is not None:
+            signal['candle_closed'] = closed
+            self._publish(signal)
+    
+    def _publish(self, signal):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(signal)
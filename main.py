@@ -14,12 +14,16 @@ from kivy.uix.progressbar import ProgressBar
 from kivy.clock import Clock
 from kivy.core.window import Window
 from kivy.properties import StringProperty, NumericProperty, BooleanProperty
+import os
 import threading
 import json
 from datetime import datetime
 
-# Importar módulos del predictor
-from predictor_core import CryptoPredictor
+# El predictor (pandas, ccxt, modelo) se importa en segundo plano al arrancar
+from lazy_imports import format_report, mark, prefetch
+from progress import CancelToken, OperationCancelled
+
+mark('app_import')
 
 # Establecer color de fondo
 Window.clearcolor = (0.1, 0.1, 0.15, 1)
@@ -31,6 +35,7 @@ class HomeScreen(Screen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.predictor = None
+        self.analysis = None
         self.build_ui()
     
     def build_ui(self):
@@ -64,6 +69,7 @@ class HomeScreen(Screen):
             values=['BTC/USDT', 'ETH/USDT', 'BNB/USDT', 'SOL/USDT', 'ADA/USDT', 'MATIC/USDT'],
             size_hint=(0.7, 1)
         )
+        self.symbol_spinner.bind(text=self.on_selection_change)
         symbols_layout.add_widget(self.symbol_spinner)
         layout.add_widget(symbols_layout)
         
@@ -76,6 +82,7 @@ class HomeScreen(Screen):
             values=['15m', '1h', '4h', '1d'],
             size_hint=(0.7, 1)
         )
+        self.timeframe_spinner.bind(text=self.on_selection_change)
         timeframe_layout.add_widget(self.timeframe_spinner)
         layout.add_widget(timeframe_layout)
         
@@ -110,8 +117,8 @@ class HomeScreen(Screen):
         
         self.add_widget(layout)
         
-        # Inicializar predictor
-        Clock.schedule_once(lambda dt: self.init_predictor(), 0.5)
+        # Inicializar predictor tras pintar el primer frame
+        Clock.schedule_once(lambda dt: self.init_predictor(), 0)
     
     def init_predictor(self):
         """Inicializar el predictor en segundo plano"""
@@ -119,14 +126,26 @@ class HomeScreen(Screen):
         
         def load():
             try:
-                self.predictor = CryptoPredictor()
+                from predictor_core import CryptoPredictor
+                from signal_journal import SignalJournal
+                mark('predictor_import')
+                
+                # Las señales generadas quedan en el diario (signals.db)
+                self.predictor = CryptoPredictor(journal=SignalJournal())
+                self.predictor.warm_up()
+                mark('predictor_ready')
                 Clock.schedule_once(lambda dt: self.on_predictor_loaded(), 0)
+                
+                # Lo que el análisis aún no ha cargado (pandas, ccxt, joblib)
+                prefetch()
             except Exception as e:
                 Clock.schedule_once(lambda dt: self.on_predictor_error(str(e)), 0)
         
-        threading.Thread(target=load).start()
+        threading.Thread(target=load, daemon=True).start()
     
     def on_predictor_loaded(self):
+        # Compartir el mismo predictor (y modelo) con el resto de pantallas
+        self.manager.predictor = self.predictor
         self.status_label.text = 'Sistema: [color=00ff00]✓ Listo[/color]'
         self.analyze_btn.disabled = False
     
@@ -147,21 +166,46 @@ class HomeScreen(Screen):
         self.progress.value = 0
         self.results_label.text = f'Analizando {symbol}...'
         
+        token = self.analysis = CancelToken()
+        
+        def on_progress(fraction, stage):
+            Clock.schedule_once(lambda dt: self.on_analyze_progress(token, fraction), 0)
+        
         def analyze():
             try:
-                # Simular progreso
-                for i in range(20, 60, 10):
-                    Clock.schedule_once(lambda dt, v=i: setattr(self.progress, 'value', v), 0)
-                
-                signal = self.predictor.generate_signal(symbol, timeframe)
-                
-                Clock.schedule_once(lambda dt: setattr(self.progress, 'value', 80), 0)
-                Clock.schedule_once(lambda dt: self.display_signal(signal), 0)
-                
+                signal = self.predictor.generate_signal(
+                    symbol, timeframe, progress=on_progress, cancel=token
+                )
+                Clock.schedule_once(lambda dt: self.on_analyze_done(token, signal), 0)
+            except OperationCancelled:
+                pass
             except Exception as e:
-                Clock.schedule_once(lambda dt: self.on_analyze_error(str(e)), 0)
+                Clock.schedule_once(lambda dt: self.on_analyze_error(str(e), token), 0)
         
-        threading.Thread(target=analyze).start()
+        threading.Thread(target=analyze, daemon=True).start()
+    
+    def cancel_analysis(self):
+        """Cancelar el análisis en curso (deja de descargar y calcular)"""
+        if self.analysis is None:
+            return
+        self.analysis.cancel()
+        self.analysis = None
+        self.progress.value = 0
+        self.results_label.text = 'Análisis cancelado'
+        self.analyze_btn.disabled = False
+    
+    def on_selection_change(self, instance, value):
+        # El resultado del análisis en curso ya no interesa
+        self.cancel_analysis()
+    
+    def on_analyze_progress(self, token, fraction):
+        if token is self.analysis:
+            self.progress.value = fraction * 100
+    
+    def on_analyze_done(self, token, signal):
+        if token is self.analysis:
+            self.analysis = None
+            self.display_signal(signal)
     
     def display_signal(self, signal):
         """Mostrar los resultados del análisis"""
@@ -210,7 +254,11 @@ class HomeScreen(Screen):
         self.results_label.text = result
         self.analyze_btn.disabled = False
     
-    def on_analyze_error(self, error):
+    def on_analyze_error(self, error, token=None):
+        if token is not None:
+            if token is not self.analysis:
+                return
+            self.analysis = None
         self.results_label.text = f'[color=ff0000]Error: {error}[/color]'
         self.analyze_btn.disabled = False
         self.progress.value = 0
@@ -222,6 +270,7 @@ class SignalsScreen(Screen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.predictor = None
+        self.scan_token = None
         self.build_ui()
     
     def build_ui(self):
@@ -260,18 +309,46 @@ class SignalsScreen(Screen):
             self.predictor = self.manager.predictor
             self.update_all_signals(None)
     
+    def on_leave(self):
+        """Al salir de la pantalla se abandona el escaneo en curso"""
+        self.cancel_scan()
+    
+    def cancel_scan(self):
+        if self.scan_token is not None:
+            self.scan_token.cancel()
+            self.scan_token = None
+    
     def update_all_signals(self, instance):
         """Actualizar todas las señales"""
         if not self.predictor:
             return
         
+        self.cancel_scan()
+        token = self.scan_token = CancelToken()
+        
         self.signals_layout.clear_widgets()
         
         symbols = ['BTC/USDT', 'ETH/USDT', 'BNB/USDT', 'SOL/USDT']
         
+        labels = {}
         for symbol in symbols:
-            card = self.create_signal_card(symbol)
+            card, labels[symbol] = self.create_signal_card(symbol)
             self.signals_layout.add_widget(card)
+        
+        # Un único escaneo en segundo plano para todos los símbolos
+        def scan():
+            try:
+                for signal in self.predictor.scan(symbols, '1h', cancel=token):
+                    label = labels[signal['symbol']]
+                    text = self.format_signal_card(signal)
+                    Clock.schedule_once(lambda dt, l=label, t=text: setattr(l, 'text', t), 0)
+            except OperationCancelled:
+                pass
+            except Exception as e:
+                for symbol, label in labels.items():
+                    Clock.schedule_once(lambda dt, l=label, s=symbol: setattr(l, 'text', f'[color=ff0000]{s}\nError[/color]'), 0)
+        
+        threading.Thread(target=scan, daemon=True).start()
     
     def create_signal_card(self, symbol):
         """Crear tarjeta de señal"""
@@ -299,22 +376,15 @@ class SignalsScreen(Screen):
         )
         card.add_widget(label)
         
-        # Cargar señal en segundo plano
-        def load_signal():
-            try:
-                signal = self.predictor.generate_signal(symbol, '1h')
-                text = self.format_signal_card(signal)
-                Clock.schedule_once(lambda dt: setattr(label, 'text', text), 0)
-            except Exception as e:
-                Clock.schedule_once(lambda dt: setattr(label, 'text', f'[color=ff0000]{symbol}\nError[/color]'), 0)
-        
-        threading.Thread(target=load_signal).start()
-        
-        return card
+        return card, label
     
     def format_signal_card(self, signal):
         """Formatear señal para la tarjeta"""
         symbol = signal['symbol']
+        
+        if 'error' in signal:
+            return f'[color=ff0000]{symbol}\nError[/color]'
+        
         action = signal['signal']
         price = signal['current_price']
         conf = signal['confidence']
@@ -357,7 +427,8 @@ class SettingsScreen(Screen):
                  'Confianza mínima: 70%\n'
                  'Risk/Reward mínimo: 2:1\n\n'
                  '[size=10sp][color=888888]Para re-entrenar el modelo,\n'
-                 'usa la versión de escritorio.[/color][/size]',
+                 'usa la versión de escritorio:\n'
+                 'python train_pipeline.py[/color][/size]',
             markup=True,
             size_hint=(1, 0.9)
         )
@@ -366,21 +437,24 @@ class SettingsScreen(Screen):
         self.add_widget(layout)
 
 
+# Pantallas secundarias: se construyen la primera vez que se abren
+LAZY_SCREENS = {
+    'signals': SignalsScreen,
+    'settings': SettingsScreen,
+}
+
+
 class CryptoPredictorApp(App):
     """Aplicación principal"""
     
     def build(self):
         # Screen manager
         sm = ScreenManager()
+        self.sm = sm
         
-        # Agregar pantallas
+        # Solo la pantalla inicial; el resto al navegar
         home = HomeScreen(name='home')
-        signals = SignalsScreen(name='signals')
-        settings = SettingsScreen(name='settings')
-        
         sm.add_widget(home)
-        sm.add_widget(signals)
-        sm.add_widget(settings)
         
         # Layout principal con navegación
         main_layout = BoxLayout(orientation='vertical')
@@ -390,31 +464,47 @@ class CryptoPredictorApp(App):
         nav_bar = BoxLayout(size_hint=(1, 0.08), spacing=2)
         
         btn_home = Button(text='Inicio', background_color=(0.2, 0.6, 0.8, 1))
-        btn_home.bind(on_press=lambda x: setattr(sm, 'current', 'home'))
+        btn_home.bind(on_press=lambda x: self.show_screen('home'))
         nav_bar.add_widget(btn_home)
         
         btn_signals = Button(text='Señales', background_color=(0.2, 0.6, 0.8, 1))
-        btn_signals.bind(on_press=lambda x: setattr(sm, 'current', 'signals'))
+        btn_signals.bind(on_press=lambda x: self.show_screen('signals'))
         nav_bar.add_widget(btn_signals)
         
         btn_settings = Button(text='Config', background_color=(0.2, 0.6, 0.8, 1))
-        btn_settings.bind(on_press=lambda x: setattr(sm, 'current', 'settings'))
+        btn_settings.bind(on_press=lambda x: self.show_screen('settings'))
         nav_bar.add_widget(btn_settings)
         
         main_layout.add_widget(nav_bar)
         
-        # Compartir predictor entre pantallas
+        # Compartir predictor entre pantallas (lo crea HomeScreen al iniciar)
         sm.predictor = None
-        Clock.schedule_once(lambda dt: self.init_shared_predictor(sm), 1)
         
         return main_layout
     
-    def init_shared_predictor(self, sm):
-        """Inicializar predictor compartido"""
-        try:
-            sm.predictor = CryptoPredictor()
-        except:
-            pass
+    def show_screen(self, name):
+        """Cambiar de pantalla, construyéndola si aún no existe"""
+        if not self.sm.has_screen(name):
+            self.sm.add_widget(LAZY_SCREENS[name](name=name))
+            mark(f'screen_{name}')
+        self.sm.current = name
+    
+    def on_start(self):
+        # El primer frame se dibuja justo después de on_start
+        Clock.schedule_once(lambda dt: self.on_first_frame(), 0)
+    
+    def on_first_frame(self):
+        mark('first_frame')
+        
+        # CRYPTO_IMPORT_REPORT=1: tiempos de arranque por consola
+        if os.environ.get('CRYPTO_IMPORT_REPORT'):
+            Clock.schedule_once(lambda dt: print(format_report()), 10)
+    
+    def on_stop(self):
+        # Escribir las señales pendientes del diario
+        predictor = getattr(self.sm, 'predictor', None)
+        if predictor is not None and predictor.journal is not None:
+            predictor.journal.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,142 @@
+"""
+Instrumentación de latencia del predictor
+Spans por etapa con percentiles por símbolo, contadores y traza JSON-lines
+"""
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+
+
+class LatencyHistogram:
+    """Últimas muestras de latencia (ms) con percentiles"""
+    
+    def __init__(self, max_samples=2048):
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+    
+    def add(self, ms):
+        self.samples.append(ms)
+        self.count += 1
+        self.total += ms
+    
+    def summary(self):
+        if not self.samples:
+            return {'count': 0}
+        
+        p50, p95, p99 = np.percentile(np.fromiter(self.samples, dtype=np.float64), [50, 95, 99])
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count,
+            'p50_ms': float(p50),
+            'p95_ms': float(p95),
+            'p99_ms': float(p99),
+            'max_ms': max(self.samples),
+        }
+
+
+class Metrics:
+    """Latencias por etapa (global y por símbolo) y contadores"""
+    
+    def __init__(self, trace_path=None, max_samples=2048):
+        """
+        Args:
+            trace_path: Archivo JSON-lines donde escribir cada span (opcional)
+            max_samples: Muestras conservadas por histograma
+        """
+        self.max_samples = max_samples
+        self.enabled = True
+        
+        self._stages = {}
+        self._symbols = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        
+        self._trace = None
+        self._trace_owned = False
+        if trace_path:
+            self.set_trace_sink(trace_path)
+    
+    def set_trace_sink(self, sink):
+        """
+        Activar la traza JSON-lines
+        
+        Args:
+            sink: Ruta de archivo (se abre en modo append) u objeto con write(); None la desactiva
+        """
+        with self._lock:
+            if self._trace is not None and self._trace_owned:
+                self._trace.close()
+            
+            self._trace_owned = isinstance(sink, str)
+            if self._trace_owned:
+                sink = open(sink, 'a', buffering=1, encoding='utf-8')
+            self._trace = sink
+    
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = LatencyHistogram(self.max_samples)
+        return histogram
+    
+    def record(self, stage, ms, symbol=None, timeframe=None):
+        """Registrar una duración ya medida"""
+        if not self.enabled:
+            return
+        
+        with self._lock:
+            self._histogram(self._stages, stage).add(ms)
+            if symbol is not None:
+                by_stage = self._symbols.setdefault(symbol, {})
+                self._histogram(by_stage, stage).add(ms)
+            
+            if self._trace is not None:
+                event = {
+                    'ts': time.time(), 'stage': stage, 'ms': round(ms, 3),
+                    'symbol': symbol, 'timeframe': timeframe,
+                }
+                self._trace.write(json.dumps(event) + '\n')
+    
+    @contextmanager
+    def span(self, stage, symbol=None, timeframe=None):
+        """Medir la duración del bloque como una etapa"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000, symbol, timeframe)
+    
+    def incr(self, counter, n=1, symbol=None):
+        """Incrementar un contador (global y, si se indica, por símbolo)"""
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + n
+            if symbol is not None:
+                key = f'{counter}:{symbol}'
+                self._counters[key] = self._counters.get(key, 0) + n
+    
+    def stats(self):
+        """
+        Resumen actual
+        
+        Returns:
+            Diccionario con 'stages', 'symbols' y 'counters'
+        """
+        with self._lock:
+            return {
+                'stages': {stage: h.summary() for stage, h in self._stages.items()},
+                'symbols': {
+                    symbol: {stage: h.summary() for stage, h in stages.items()}
+                    for symbol, stages in self._symbols.items()
+                },
+                'counters': dict(self._counters),
+            }
+    
+    def reset(self):
+        """Borrar histogramas y contadores"""
+        with self._lock:
+            self._stages.clear()
+            self._symbols.clear()
+            self._counters.clear()
@@ -0,0 +1,361 @@
+"""
+Carga de modelos compartida y formato compacto de inferencia
+Un único modelo por ruta en todo el proceso, cargado en el primer uso
+"""
+import json
+import os
+import threading
+import warnings
+import numpy as np
+
+from lazy_imports import is_available, lazy_import
+
+# joblib solo hace falta para el formato pickle; se carga al leerlo
+JOBLIB_AVAILABLE = is_available('joblib')
+joblib = lazy_import('joblib')
+
+COMPACT_FORMAT_VERSION = 1
+
+_TREE_MODELS = ('DecisionTreeClassifier', 'RandomForestClassifier', 'ExtraTreesClassifier')
+
+
+def compact_dir_for(model_path):
+    """Directorio del formato compacto asociado a un model.pkl"""
+    return os.path.splitext(model_path)[0] + '_compact'
+
+
+class CompactScaler:
+    """Preprocesador afín (StandardScaler / MinMaxScaler): X * scale + offset"""
+    
+    def __init__(self, scale, offset):
+        self.scale = scale
+        self.offset = offset
+    
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float64) * self.scale + self.offset
+
+
+class CompactLinearModel:
+    """Regresión logística binaria a partir de coeficientes"""
+    
+    def __init__(self, coef, intercept, classes):
+        self.coef = coef
+        self.intercept = intercept
+        self.classes_ = classes
+    
+    def predict_proba(self, X):
+        z = np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+        p = 1 / (1 + np.exp(-z))
+        return np.column_stack([1 - p, p])
+
+
+class CalibratedModel:
+    """
+    Modelo binario con calibración sigmoide (Platt) de la probabilidad
+    
+    p_calibrada = 1 / (1 + exp(-(a * p + b))) con p la probabilidad de la
+    clase 1 del modelo base. Solo necesita NumPy para predecir.
+    """
+    
+    def __init__(self, model, a, b):
+        self.model = model
+        self.a = float(a)
+        self.b = float(b)
+    
+    @property
+    def classes_(self):
+        return self.model.classes_
+    
+    def predict_proba(self, X):
+        p = self.model.predict_proba(X)[:, 1]
+        q = 1 / (1 + np.exp(-(self.a * p + self.b)))
+        return np.column_stack([1 - q, q])
+
+
+class CompactForest:
+    """Árboles de decisión aplanados en arrays (uno o varios árboles)"""
+    
+    def __init__(self, left, right, feature, threshold, value, roots, classes):
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+    
+    def predict_proba(self, X):
+        # sklearn compara las features en float32
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[None, :]
+        
+        node = np.repeat(np.asarray(self.roots)[:, None], len(X), axis=1)
+        while True:
+            left = self.left[node]
+            inner = left != -1
+            if not inner.any():
+                break
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(inner, np.where(go_left, left, self.right[node]), node)
+        
+        return self.value[node].mean(axis=0)
+
+
+def export_compact(model, feature_names, out_dir, preprocessor=None, feature_schema=None):
+    """
+    Exportar un modelo sklearn al formato compacto de solo inferencia
+    
+    Los parámetros se guardan como .npy (cargables con mmap) junto a un
+    meta.json. Soporta LogisticRegression binaria y árboles/bosques de
+    clasificación, con o sin CalibratedModel; StandardScaler y MinMaxScaler
+    como preprocesador.
+    
+    Args:
+        model: Modelo entrenado
+        feature_names: Lista de features en el orden del modelo
+        out_dir: Directorio de salida
+        preprocessor: Preprocesador entrenado (opcional)
+        feature_schema: Versión del esquema de features (opcional)
+    """
+    arrays = {}
+    
+    if isinstance(model, CalibratedModel):
+        arrays['calibration'] = np.array([model.a, model.b])
+        model = model.model
+    
+    model_type = type(model).__name__
+    
+    if model_type == 'LogisticRegression':
+        if len(model.classes_) != 2:
+            raise ValueError("Solo se soporta LogisticRegression binaria")
+        kind = 'linear'
+        arrays['coef'] = np.asarray(model.coef_[0], dtype=np.float64)
+        arrays['intercept'] = np.asarray(model.intercept_, dtype=np.float64)
+    elif model_type in _TREE_MODELS:
+        kind = 'forest'
+        trees = getattr(model, 'estimators_', [model])
+        offset = 0
+        parts = {name: [] for name in ('left', 'right', 'feature', 'threshold', 'value', 'roots')}
+        for tree in trees:
+            t = tree.tree_
+            value = t.value[:, 0, :]
+            value = value / value.sum(axis=1, keepdims=True)
+            parts['left'].append(np.where(t.children_left == -1, -1, t.children_left + offset))
+            parts['right'].append(np.where(t.children_right == -1, -1, t.children_right + offset))
+            parts['feature'].append(t.feature)
+            parts['threshold'].append(t.threshold)
+            parts['value'].append(value)
+            parts['roots'].append([offset])
+            offset += t.node_count
+        for name, chunks in parts.items():
+            arrays[name] = np.concatenate(chunks)
+        for name in ('left', 'right', 'feature', 'roots'):
+            arrays[name] = arrays[name].astype(np.int64)
+    else:
+        raise ValueError(f"Modelo no soportado para exportación compacta: {model_type}")
+    
+    arrays['classes'] = np.asarray(model.classes_)
+    
+    preprocessor_type = None
+    if preprocessor is not None:
+        preprocessor_type = type(preprocessor).__name__
+        if preprocessor_type == 'StandardScaler':
+            n = len(feature_names)
+            mean = preprocessor.mean_ if preprocessor.mean_ is not None else np.zeros(n)
+            scale = preprocessor.scale_ if preprocessor.scale_ is not None else np.ones(n)
+            arrays['pre_scale'] = 1 / scale
+            arrays['pre_offset'] = -mean / scale
+        elif preprocessor_type == 'MinMaxScaler':
+            arrays['pre_scale'] = preprocessor.scale_
+            arrays['pre_offset'] = preprocessor.min_
+        else:
+            raise ValueError(f"Preprocesador no soportado: {preprocessor_type}")
+    
+    os.makedirs(out_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(out_dir, f'{name}.npy'), np.ascontiguousarray(array))
+    
+    meta = {
+        'format_version': COMPACT_FORMAT_VERSION,
+        'kind': kind,
+        'model_type': model_type,
+        'preprocessor_type': preprocessor_type,
+        'feature_names': list(feature_names),
+        'feature_schema': feature_schema,
+        'calibrated': 'calibration' in arrays,
+    }
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+def load_compact(model_dir, mmap_mode='r'):
+    """
+    Cargar un modelo exportado con export_compact
+    
+    Returns:
+        Tupla (model, preprocessor, feature_names, feature_schema)
+    """
+    with open(os.path.join(model_dir, 'meta.json')) as f:
+        meta = json.load(f)
+    
+    if meta.get('format_version') != COMPACT_FORMAT_VERSION:
+        raise ValueError(f"Versión de formato compacto no soportada: {meta.get('format_version')}")
+    
+    def load(name):
+        return np.load(os.path.join(model_dir, f'{name}.npy'), mmap_mode=mmap_mode)
+    
+    classes = load('classes')
+    if meta['kind'] == 'linear':
+        model = CompactLinearModel(load('coef'), load('intercept')[0], classes)
+    else:
+        model = CompactForest(
+            load('left'), load('right'), load('feature'),
+            load('threshold'), load('value'), load('roots'), classes
+        )
+    
+    if meta.get('calibrated'):
+        a, b = load('calibration')
+        model = CalibratedModel(model, a, b)
+    
+    preprocessor = None
+    if meta.get('preprocessor_type'):
+        preprocessor = CompactScaler(load('pre_scale'), load('pre_offset'))
+    
+    return model, preprocessor, meta['feature_names'], meta.get('feature_schema')
+
+
+class ModelHandle:
+    """Modelo cargado bajo demanda y compartido por todos los predictores"""
+    
+    def __init__(self, model_path, mmap_mode='r'):
+        self.model_path = model_path
+        self.mmap_mode = mmap_mode
+        
+        self.model = None
+        self.preprocessor = None
+        self.feature_names = None
+        self.feature_schema = None
+        self.source = None
+        self.version = None
+        self.load_error = None
+        
+        self._loaded = False
+        self._lock = threading.Lock()
+    
+    def load(self):
+        """Cargar el modelo si aún no se ha hecho (seguro entre hilos)"""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+                    self._loaded = True
+        return self
+    
+    def _load(self):
+        """
+        Cargar el artefacto más reciente (compacto o model.pkl)
+        
+        Si model.pkl se reentrenó sin reexportar, el compacto está
+        desactualizado y se usa el pickle. Si el más reciente falla se prueba
+        el otro; los errores quedan en load_error (None si no hubo).
+        """
+        compact_dir = compact_dir_for(self.model_path)
+        candidates = []
+        for source, path, loader in (
+            ('compact', os.path.join(compact_dir, 'meta.json'), self._load_compact),
+            ('joblib', self.model_path, self._load_joblib),
+        ):
+            if os.path.exists(path):
+                candidates.append((os.stat(path).st_mtime_ns, source, path, loader))
+        
+        # Más reciente primero; a igual fecha, el compacto (carga en milisegundos)
+        candidates.sort(key=lambda c: (c[0], c[1] == 'compact'), reverse=True)
+        
+        errors = []
+        for _, source, path, loader in candidates:
+            try:
+                loader(compact_dir)
+            except Exception as e:
+                errors.append(f'{source}: {type(e).__name__}: {e}')
+                continue
+            self.source = source
+            self.version = self._file_version(path)
+            break
+        self.load_error = '; '.join(errors) or None
+    
+    def _load_compact(self, compact_dir):
+        self.model, self.preprocessor, self.feature_names, self.feature_schema = load_compact(
+            compact_dir, self.mmap_mode
+        )
+    
+    def _load_joblib(self, compact_dir):
+        if not JOBLIB_AVAILABLE:
+            raise ImportError("joblib no está instalado")
+        
+        with warnings.catch_warnings():
+            # mmap no aplica a pickles comprimidos; joblib avisa y carga normal
+            warnings.simplefilter('ignore')
+            model_data = joblib.load(self.model_path, mmap_mode=self.mmap_mode)
+            
+            preprocessor = None
+            preprocessor_path = self.model_path.replace('model.pkl', 'preprocessor.pkl')
+            if preprocessor_path != self.model_path and os.path.exists(preprocessor_path):
+                preprocessor = joblib.load(preprocessor_path, mmap_mode=self.mmap_mode)
+        
+        self.model = model_data.get('model')
+        self.feature_names = model_data.get('feature_names', [])
+        self.feature_schema = model_data.get('feature_schema')
+        self.preprocessor = preprocessor
+    
+    def _file_version(self, path):
+        """Versión del modelo a partir del archivo (cambia al reentrenar)"""
+        st = os.stat(path)
+        return f'{self.source}:{st.st_mtime_ns}:{st.st_size}'
+
+
+_handles = {}
+_handles_lock = threading.Lock()
+
+
+def get_model_handle(model_path):
+    """
+    Handle compartido del modelo de una ruta (no lo carga todavía)
+    
+    Args:
+        model_path: Ruta a model.pkl
+    
+    Returns:
+        ModelHandle
+    """
+    key = os.path.abspath(model_path)
+    with _handles_lock:
+        handle = _handles.get(key)
+        if handle is None:
+            handle = _handles[key] = ModelHandle(key)
+        return handle
+
+
+# Exportar model.pkl (+ preprocessor.pkl) al formato compacto
+if __name__ == "__main__":
+    import sys
+    
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'model.pkl'
+    )
+    out_dir = compact_dir_for(path)
+    handle = ModelHandle(path, mmap_mode=None)
+    try:
+        # Siempre desde el pickle: el compacto existente puede estar desactualizado
+        handle._load_joblib(out_dir)
+    except Exception as e:
+        print(f"No se pudo cargar el modelo: {path} ({e})")
+        sys.exit(1)
+    
+    if handle.model is None:
+        print(f"No se pudo cargar el modelo: {path}")
+        sys.exit(1)
+    
+    export_compact(
+        handle.model, handle.feature_names, out_dir, handle.preprocessor, handle.feature_schema
+    )
+    print(f"Modelo compacto guardado en {out_dir}")
@@ -0,0 +1,183 @@
+"""
+Análisis multi-timeframe a partir de un único timeframe base
+Las velas de timeframes superiores se agregan localmente desde las del
+timeframe más fino, sin descargas adicionales
+"""
+import threading
+import numpy as np
+
+from candle_store import timeframe_to_ms
+
+# Las velas semanales de los exchanges empiezan en lunes (el epoch fue jueves)
+_WEEK_OFFSET_MS = 4 * 24 * 60 * 60 * 1000
+
+
+def bucket_start(timestamps, timeframe):
+    """
+    Inicio de la vela del timeframe que contiene cada timestamp
+    
+    Args:
+        timestamps: Array de timestamps en ms
+        timeframe: Timeframe destino
+    
+    Returns:
+        Array int64 con el inicio de cada vela
+    """
+    if timeframe.endswith('M'):
+        raise ValueError("Timeframes mensuales no soportados en el remuestreo")
+    
+    step = timeframe_to_ms(timeframe)
+    offset = _WEEK_OFFSET_MS if timeframe.endswith('w') else 0
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    return (timestamps - offset) // step * step + offset
+
+
+def check_resample(base_timeframe, timeframe):
+    """Validar que timeframe se pueda construir a partir de base_timeframe"""
+    base_step = timeframe_to_ms(base_timeframe)
+    step = timeframe_to_ms(timeframe)
+    if step < base_step or step % base_step:
+        raise ValueError(f"{timeframe} no es múltiplo de {base_timeframe}")
+    return step // base_step
+
+
+def resample_ohlcv(ohlcv, base_timeframe, timeframe, drop_partial=True):
+    """
+    Agregar velas del timeframe base a un timeframe superior
+    
+    La primera vela agregada se descarta si le faltan velas base al
+    principio; la última puede estar abierta, igual que la del exchange.
+    
+    Args:
+        ohlcv: Array (n, 6) del timeframe base, ordenado por tiempo
+        base_timeframe: Timeframe de ohlcv
+        timeframe: Timeframe destino
+        drop_partial: Descartar la primera vela si está incompleta
+    
+    Returns:
+        Array (k, 6) con timestamp en ms y OHLCV
+    """
+    check_resample(base_timeframe, timeframe)
+    ohlcv = np.asarray(ohlcv, dtype=np.float64).reshape(-1, 6)
+    if len(ohlcv) == 0 or base_timeframe == timeframe:
+        return ohlcv.copy()
+    
+    buckets = bucket_start(ohlcv[:, 0], timeframe)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(ohlcv)] - 1
+    
+    bars = np.empty((len(starts), 6))
+    bars[:, 0] = buckets[starts]
+    bars[:, 1] = ohlcv[starts, 1]
+    bars[:, 2] = np.maximum.reduceat(ohlcv[:, 2], starts)
+    bars[:, 3] = np.minimum.reduceat(ohlcv[:, 3], starts)
+    bars[:, 4] = ohlcv[ends, 4]
+    bars[:, 5] = np.add.reduceat(ohlcv[:, 5], starts)
+    
+    if drop_partial and ohlcv[0, 0] != bars[0, 0]:
+        bars = bars[1:]
+    return bars
+
+
+class TimeframeAggregator:
+    """
+    Velas agregadas de un timeframe superior, actualizadas de forma incremental
+    
+    En cada actualización solo se reagregan las velas base desde el inicio
+    de la última vela agregada (que puede seguir abierta).
+    """
+    
+    def __init__(self, base_timeframe, timeframe, max_bars=5000):
+        """
+        Args:
+            base_timeframe: Timeframe de las velas de entrada
+            timeframe: Timeframe destino
+            max_bars: Máximo de velas agregadas conservadas
+        """
+        check_resample(base_timeframe, timeframe)
+        self.base_timeframe = base_timeframe
+        self.timeframe = timeframe
+        self.max_bars = max_bars
+        
+        self.bars = np.empty((0, 6))
+        self._lock = threading.Lock()
+    
+    def update(self, ohlcv):
+        """
+        Incorporar las últimas velas base
+        
+        Args:
+            ohlcv: Array (n, 6) con las últimas velas del timeframe base
+        
+        Returns:
+            Array (k, 6) con las velas agregadas
+        """
+        ohlcv = np.asarray(ohlcv, dtype=np.float64).reshape(-1, 6)
+        if len(ohlcv) == 0:
+            return self.bars
+        
+        with self._lock:
+            bars = self.bars
+            if len(bars) and bars[-1, 0] >= ohlcv[0, 0] and ohlcv[-1, 0] >= bars[-1, 0]:
+                # Reagregar desde la última vela guardada
+                since = bars[-1, 0]
+                new = resample_ohlcv(
+                    ohlcv[ohlcv[:, 0] >= since], self.base_timeframe, self.timeframe,
+                    drop_partial=False
+                )
+                bars = np.concatenate([bars[:-1], new])
+            else:
+                # Sin estado o con un hueco: reconstruir con toda la ventana
+                bars = resample_ohlcv(ohlcv, self.base_timeframe, self.timeframe)
+            
+            self.bars = bars[-self.max_bars:]
+            return self.bars
+
+
+def confluence(signals, entry_timeframe, min_confluence=0.5):
+    """
+    Combinar las señales de varios timeframes de un mismo símbolo
+    
+    Se compra solo si la señal del timeframe de entrada es BUY, al menos
+    min_confluence de los timeframes predicen subida y ningún timeframe
+    superior está en tendencia bajista.
+    
+    Args:
+        signals: Diccionario {timeframe: señal de generate_signal}
+        entry_timeframe: Timeframe que marca entrada, stop loss y take profit
+        min_confluence: Fracción mínima de timeframes alcistas
+    
+    Returns:
+        Diccionario con la señal combinada
+    """
+    entry = signals[entry_timeframe]
+    entry_step = timeframe_to_ms(entry_timeframe)
+    
+    valid = {tf: s for tf, s in signals.items() if 'error' not in s}
+    bullish = [tf for tf, s in valid.items() if s['prediction'] == 1]
+    against = [
+        tf for tf, s in valid.items()
+        if timeframe_to_ms(tf) > entry_step and s['trend'] == 'downtrend'
+    ]
+    
+    score = len(bullish) / len(signals) if signals else 0.0
+    is_valid = (
+        'error' not in entry and
+        entry['signal'] == 'BUY' and
+        score >= min_confluence and
+        not against
+    )
+    
+    return {
+        'symbol': entry['symbol'],
+        'timeframe': entry_timeframe,
+        'timestamp': entry.get('timestamp'),
+        'signal': 'BUY' if is_valid else 'HOLD',
+        'confluence': float(score * 100),
+        'bullish_timeframes': bullish,
+        'against_trend': against,
+        'entry_price': entry.get('entry_price') if is_valid else None,
+        'stop_loss': entry.get('stop_loss') if is_valid else None,
+        'take_profit': entry.get('take_profit') if is_valid else None,
+        'signals': signals,
+    }
@@ -4,37 +4,59 @@ Versión simplificada optimizada para móvil
 """
 import json
 import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
 import numpy as np
-import pandas as pd
 
-# Imports condicionales para Android
-try:
-    import ccxt
-    CCXT_AVAILABLE = True
-except:
-    CCXT_AVAILABLE = False
+from candle_store import CandleStore, OHLCV_COLUMNS, timeframe_to_ms
+from exchange_pool import get_pool, create_async_client, CCXT_AVAILABLE
+from model_store import get_model_handle
+from indicator_engine import StreamingIndicators
+from indicators_np import (
+    FEATURE_SCHEMA_VERSION, NumpyIndicators, rolling_mean, rolling_stats, rolling_std
+)
+from lazy_imports import lazy_import
+from metrics import Metrics
+from multi_timeframe import TimeframeAggregator, check_resample, confluence
+from progress import OperationCancelled, checkpoint
+from signal_cache import SignalCache
+from signal_record import Signal, json_default
+from screener import screen_symbols
 
-try:
-    import joblib
-    JOBLIB_AVAILABLE = True
-except:
-    JOBLIB_AVAILABLE = False
+# Solo se cargan al usarse: pandas en la ruta de DataFrames, asyncio en la API asíncrona
+pd = lazy_import('pandas')
+asyncio = lazy_import('asyncio')
 
 
 class CryptoPredictor:
     """Predictor de criptomonedas optimizado para móvil"""
     
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, exchange=None, candle_store=None, exchange_id='binance',
+                 signal_cache=None, async_exchange=None, journal=None):
         """
         Inicializar predictor
         
         Args:
             model_path: Ruta al modelo (opcional, usa modelo incluido por defecto)
+            exchange: Cliente ccxt a usar (opcional, cliente compartido por defecto)
+            candle_store: Almacén de velas (opcional, histórico local por defecto)
+            exchange_id: Exchange del cliente compartido
+            signal_cache: Caché de señales (opcional, LRU en memoria por defecto)
+            async_exchange: Cliente asíncrono para agenerate_signal / ascan
+                (opcional, uno de ccxt.async_support por event loop por defecto)
+            journal: Diario donde registrar las señales nuevas (opcional,
+                p. ej. signal_journal.SignalJournal)
         """
-        self.model = None
-        self.preprocessor = None
-        self.feature_names = None
+        self.exchange = exchange
+        self.exchange_id = exchange_id
+        self.async_exchange = async_exchange
+        self._async_clients = weakref.WeakKeyDictionary()
+        self.candle_store = candle_store if candle_store is not None else CandleStore()
+        self.signal_cache = signal_cache if signal_cache is not None else SignalCache()
+        self.journal = journal
         
         # Cargar modelo si está disponible
         if model_path is None:
@@ -42,47 +64,173 @@ class CryptoPredictor:
             app_dir = os.path.dirname(os.path.abspath(__file__))
             model_path = os.path.join(app_dir, 'model.pkl')
         
-        if os.path.exists(model_path) and JOBLIB_AVAILABLE:
-            try:
-                model_data = joblib.load(model_path)
-                self.model = model_data.get('model')
-                self.feature_names = model_data.get('feature_names', [])
-                
-                preprocessor_path = model_path.replace('model.pkl', 'preprocessor.pkl')
-                if os.path.exists(preprocessor_path):
-                    self.preprocessor = joblib.load(preprocessor_path)
-            except:
-                pass
+        # Handle compartido por el proceso: el modelo se carga en el primer uso
+        self._model_handle = get_model_handle(model_path)
         
         # Configuración
         self.min_confidence = 0.70
         self.min_risk_reward = 2.0
+        self.min_confluence = 0.5
+        
+        # 'streaming' (incremental por vela), 'numpy' o 'pandas' (serie completa)
+        self.indicator_backend = 'streaming'
+        self._engines = {}
+        self._engines_lock = threading.Lock()
+        self._numpy_local = threading.local()
+        
+        # Velas agregadas por (symbol, base_timeframe, timeframe)
+        self._aggregators = {}
+        
+        # Predicciones ML que cayeron a reglas
+        self.ml_fallbacks = 0
+        self.last_ml_error = None
+        self._stats_lock = threading.Lock()
+        
+        # Latencias por etapa y contadores (ver stats())
+        self.metrics = Metrics()
     
-    def download_data(self, symbol, timeframe='1h', limit=500):
+    @property
+    def model(self):
+        return self._model_handle.load().model
+    
+    @property
+    def preprocessor(self):
+        return self._model_handle.load().preprocessor
+    
+    @property
+    def feature_names(self):
+        return self._model_handle.load().feature_names
+    
+    def warm_up(self):
+        """Cargar el modelo por adelantado (p. ej. desde un hilo en segundo plano)"""
+        self._model_handle.load()
+    
+    def fetch_ohlcv(self, symbol, timeframe='1h', limit=500, cancel=None):
         """
-        Descargar datos del exchange
+        Obtener velas crudas del exchange
+        
+        Usa el histórico local y solo pide al exchange las velas nuevas.
         
         Args:
             symbol: Par de trading
             timeframe: Timeframe
             limit: Número de velas
+            cancel: CancelToken (opcional)
             
         Returns:
-            DataFrame con datos OHLCV
+            Array (n, 6) con timestamp en ms y OHLCV
+        """
+        exchange = self._get_exchange()
+        
+        return self.candle_store.fetch(exchange, symbol, timeframe, limit=limit, cancel=cancel)
+    
+    def _timed_fetch(self, symbol, timeframe='1h', limit=500, cancel=None):
+        """fetch_ohlcv con medición de latencia y contador de errores"""
+        try:
+            with self.metrics.span('fetch', symbol, timeframe):
+                return self.fetch_ohlcv(symbol, timeframe, limit=limit, cancel=cancel)
+        except OperationCancelled:
+            raise
+        except Exception:
+            self.metrics.incr('fetch_errors', symbol=symbol)
+            raise
+    
+    def stats(self):
+        """
+        Estadísticas de rendimiento
+        
+        Returns:
+            Diccionario con percentiles por etapa (global y por símbolo),
+            contadores, estado de la caché de señales y del modelo
+            (load_error indica por qué se usan las reglas si el modelo falló)
+        """
+        stats = self.metrics.stats()
+        stats['cache'] = self.signal_cache.stats()
+        handle = self._model_handle
+        stats['model'] = {
+            'source': handle.source,
+            'version': handle.version,
+            'load_error': handle.load_error,
+        }
+        return stats
+    
+    def _cache_key(self, symbol, timeframe, candle_ts):
+        """Clave de la caché: vela, versión del modelo y configuración"""
+        config = (self.min_confidence, self.min_risk_reward, self.indicator_backend)
+        model_version = self._model_handle.load().version
+        return (symbol, timeframe, int(candle_ts), model_version, config)
+    
+    def _current_candle_ts(self, timeframe, exchange=None):
+        """Apertura de la vela en curso según el reloj del exchange (sin red)"""
+        if exchange is None:
+            exchange = self._get_exchange()
+        if hasattr(exchange, 'milliseconds'):
+            now_ms = exchange.milliseconds()
+        else:
+            now_ms = int(time.time() * 1000)
+        step = timeframe_to_ms(timeframe)
+        return now_ms // step * step
+    
+    def cached_signal(self, symbol, timeframe='1h', exchange=None):
         """
-        if not CCXT_AVAILABLE:
-            raise Exception("CCXT no disponible")
+        Señal ya calculada para la vela en curso, sin red ni cálculo
         
-        exchange = ccxt.binance({'enableRateLimit': True})
+        Args:
+            symbol: Par de trading
+            timeframe: Timeframe
+            exchange: Cliente cuyo reloj se usa (por defecto, el síncrono)
         
-        ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+        Returns:
+            Signal (se usa como diccionario), o None si no está en caché
+        """
+        key = self._cache_key(symbol, timeframe, self._current_candle_ts(timeframe, exchange))
+        signal = self.signal_cache.get(key)
+        self.metrics.incr('cache_hits' if signal is not None else 'cache_misses', symbol=symbol)
+        return signal
+    
+    def _cache_signal(self, signal):
+        """
+        Guardar una señal con la vela de sus indicadores como clave
         
-        df = pd.DataFrame(
-            ohlcv,
-            columns=['timestamp', 'open', 'high', 'low', 'close', 'volume']
+        También se registra en el diario (solo se encola: no espera al disco).
+        """
+        if 'error' in signal:
+            return
+        self.signal_cache.put(
+            self._cache_key(signal['symbol'], signal['timeframe'], signal.timestamp_ms), signal
         )
+        if self.journal is not None:
+            self.journal.record(signal)
+    
+    def _get_exchange(self):
+        """Cliente del exchange (por defecto, el del pool compartido por el proceso)"""
+        if self.exchange is not None:
+            return self.exchange
+        
+        return get_pool().get(self.exchange_id)
+    
+    def download_data(self, symbol, timeframe='1h', limit=500):
+        """
+        Descargar datos del exchange
+        
+        Args:
+            symbol: Par de trading
+            timeframe: Timeframe
+            limit: Número de velas
+            
+        Returns:
+            DataFrame con datos OHLCV
+        """
+        ohlcv = self.fetch_ohlcv(symbol, timeframe, limit=limit)
+        
+        return self._ohlcv_to_frame(ohlcv)
+    
+    @staticmethod
+    def _ohlcv_to_frame(ohlcv):
+        """Convertir un array (n, 6) de velas a DataFrame indexado por tiempo"""
+        df = pd.DataFrame(ohlcv, columns=OHLCV_COLUMNS)
         
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        df['timestamp'] = pd.to_datetime(df['timestamp'].astype('int64'), unit='ms')
         df.set_index('timestamp', inplace=True)
         
         for col in ['open', 'high', 'low', 'close', 'volume']:
@@ -101,12 +249,24 @@ class CryptoPredictor:
             DataFrame con indicadores
         """
         df = df.copy()
+        n = len(df)
         
-        # RSI
+        # Medias de 14 velas en una pasada: ganancias, pérdidas (RSI) y true range (ATR)
         delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
+        high_low = df['high'] - df['low']
+        high_close = np.abs(df['high'] - df['close'].shift())
+        low_close = np.abs(df['low'] - df['close'].shift())
+        true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
+        
+        series_14 = np.column_stack([
+            delta.where(delta > 0, 0), -delta.where(delta < 0, 0), true_range
+        ]).astype(np.float64)
+        means_14 = np.empty_like(series_14)
+        rolling_stats(series_14, 14, means=means_14)
+        
+        # RSI
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = means_14[:, 0] / means_14[:, 1]
         df['rsi'] = 100 - (100 / (1 + rs))
         
         # EMAs
@@ -120,22 +280,19 @@ class CryptoPredictor:
         df['macd'] = ema12 - ema26
         df['macd_signal'] = df['macd'].ewm(span=9).mean()
         
-        # Bollinger Bands
-        df['bb_middle'] = df['close'].rolling(20).mean()
-        bb_std = df['close'].rolling(20).std()
+        # Bollinger Bands (media y desviación en la misma pasada)
+        bb_middle, bb_std = np.empty(n), np.empty(n)
+        rolling_stats(df['close'].to_numpy(dtype=np.float64), 20, means=bb_middle, stds=bb_std)
+        df['bb_middle'] = bb_middle
         df['bb_upper'] = df['bb_middle'] + (2 * bb_std)
         df['bb_lower'] = df['bb_middle'] - (2 * bb_std)
         df['bb_width'] = (df['bb_upper'] - df['bb_lower']) / df['bb_middle']
         
         # ATR
-        high_low = df['high'] - df['low']
-        high_close = np.abs(df['high'] - df['close'].shift())
-        low_close = np.abs(df['low'] - df['close'].shift())
-        true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-        df['atr'] = true_range.rolling(14).mean()
+        df['atr'] = means_14[:, 2]
         
         # Volume
-        df['volume_sma'] = df['volume'].rolling(20).mean()
+        df['volume_sma'] = rolling_mean(df['volume'].to_numpy(dtype=np.float64), 20, np.empty(n))
         df['volume_ratio'] = df['volume'] / df['volume_sma']
         
         # Returns
@@ -143,7 +300,7 @@ class CryptoPredictor:
         df['return_5'] = df['close'].pct_change(5)
         
         # Volatility
-        df['volatility_20'] = df['close'].pct_change().rolling(20).std()
+        df['volatility_20'] = rolling_std(df['return_1'].to_numpy(dtype=np.float64), 20, np.empty(n))
         
         return df
     
@@ -166,17 +323,157 @@ class CryptoPredictor:
         
         return df
     
-    def detect_trend(self, df):
+    def streaming_indicators(self, symbol, timeframe, ohlcv):
+        """
+        Actualizar los indicadores incrementales de un símbolo
+        
+        Solo se procesan las velas posteriores a la última vista (la última
+        se reprocesa por si seguía abierta).
+        
+        Args:
+            symbol: Par de trading
+            timeframe: Timeframe
+            ohlcv: Array (n, 6) con las últimas velas
+            
+        Returns:
+            Tupla (DataFrame de una fila con indicadores, velas procesadas)
+        """
+        key = (symbol, timeframe)
+        
+        with self._engines_lock:
+            engine = self._engines.get(key)
+            if engine is None or engine.last_timestamp is None or engine.last_timestamp < ohlcv[0, 0]:
+                # Sin estado previo o con un hueco: calentar con toda la ventana
+                engine = StreamingIndicators()
+                self._engines[key] = engine
+                new = ohlcv
+            else:
+                new = ohlcv[ohlcv[:, 0] >= engine.last_timestamp]
+            
+            row = engine.update_many(new)
+            n_candles = engine.count
+        
+        return self._row_to_frame(row), n_candles
+    
+    @staticmethod
+    def _row_to_frame(row):
+        """DataFrame de una fila a partir de la salida de StreamingIndicators"""
+        row = dict(row)
+        index = pd.DatetimeIndex([pd.to_datetime(row.pop('timestamp'), unit='ms')], name='timestamp')
+        return pd.DataFrame([row], index=index)
+    
+    def signal_from_candle(self, symbol, timeframe, candle):
+        """
+        Generar señal a partir de una vela recibida en tiempo real
+        
+        La vela (cerrada o aún abierta) se aplica al motor incremental sin
+        descargar nada. Solo si no hay estado previo o hay un hueco (p. ej.
+        tras una reconexión) se recalienta una vez por REST.
+        
+        Args:
+            symbol: Par de trading
+            timeframe: Timeframe
+            candle: [timestamp_ms, open, high, low, close, volume]
+            
+        Returns:
+            Signal (se usa como diccionario), o None si la vela es anterior a la última procesada
+        """
+        key = (symbol, timeframe)
+        timestamp = int(candle[0])
+        step = timeframe_to_ms(timeframe)
+        
+        with self.metrics.span('total_stream', symbol, timeframe):
+            for attempt in range(2):
+                with self._engines_lock:
+                    engine = self._engines.get(key)
+                    warm = (
+                        engine is not None and engine.last_timestamp is not None and
+                        timestamp - engine.last_timestamp <= step
+                    )
+                    if warm:
+                        if timestamp < engine.last_timestamp:
+                            return None
+                        new_candle = timestamp > engine.last_timestamp
+                        with self.metrics.span('indicators', symbol, timeframe):
+                            row = engine.update(candle)
+                        n_candles = engine.count
+                        break
+                
+                if attempt:
+                    raise Exception(f"Sin histórico para {symbol} {timeframe}")
+                
+                # Recalentar el motor con las últimas velas
+                self.streaming_indicators(symbol, timeframe, self._timed_fetch(symbol, timeframe))
+            
+            df = self.create_features(self._row_to_frame(row))
+            
+            with self.metrics.span('inference', symbol, timeframe):
+                prediction, confidence = self._predict(df)
+            
+            signal = self._build_signal(symbol, timeframe, df, n_candles, prediction, confidence)
+            if new_candle:
+                self.signal_cache.on_candle(symbol, timeframe, timestamp)
+            self._cache_signal(signal)
+            return signal
+    
+    def store_candles(self, symbol, timeframe, rows):
+        """Guardar en el histórico local velas recibidas por otra vía (p. ej. WebSocket)"""
+        exchange_id = getattr(self._get_exchange(), 'id', 'exchange')
+        self.candle_store.append(exchange_id, symbol, timeframe, rows)
+    
+    def load_history(self, symbol, timeframe='1h', start=None, end=None):
+        """
+        Leer un rango del histórico local sin descargar nada
+        
+        Args:
+            symbol: Par de trading
+            timeframe: Timeframe
+            start: Primer timestamp en ms incluido (opcional)
+            end: Último timestamp en ms excluido (opcional)
+            
+        Returns:
+            DataFrame con datos OHLCV (mismo formato que download_data)
+        """
+        exchange_id = getattr(self._get_exchange(), 'id', 'exchange')
+        return self.candle_store.history(exchange_id, symbol, timeframe).to_frame(start, end)
+    
+    def numpy_indicators(self, ohlcv):
+        """
+        Calcular indicadores y features con el backend NumPy
+        
+        Args:
+            ohlcv: Array (n, 6) con timestamp en ms y OHLCV
+            
+        Returns:
+            DataFrame con las mismas columnas que calculate_indicators + create_features
+        """
+        cols = self._numpy_engine().compute(ohlcv)
+        
+        index = pd.DatetimeIndex(pd.to_datetime(ohlcv[:, 0].astype('int64'), unit='ms'), name='timestamp')
+        return pd.DataFrame({name: col.copy() for name, col in cols.items()}, index=index)
+    
+    def _numpy_engine(self):
+        """Motor NumPy con buffers preasignados, uno por hilo (scan usa varios)"""
+        engine = getattr(self._numpy_local, 'engine', None)
+        if engine is None:
+            engine = self._numpy_local.engine = NumpyIndicators()
+        return engine
+    
+    def detect_trend(self, df, n_candles=None):
         """
         Detectar tendencia simple
         
         Args:
             df: DataFrame con EMAs
+            n_candles: Velas que respaldan los indicadores (por defecto len(df))
             
         Returns:
             String: 'uptrend', 'downtrend', 'sideways'
         """
-        if len(df) < 50:
+        if n_candles is None:
+            n_candles = len(df)
+        
+        if n_candles < 50:
             return 'unknown'
         
         ema_short = df['ema_21'].iloc[-1]
@@ -189,36 +486,466 @@ class CryptoPredictor:
         else:
             return 'sideways'
     
-    def generate_signal(self, symbol, timeframe='1h'):
+    def generate_signal(self, symbol, timeframe='1h', progress=None, cancel=None):
         """
         Generar señal de trading
         
         Args:
             symbol: Par de trading
             timeframe: Timeframe
+            progress: Callback progress(fraction, stage) llamado al empezar
+                cada etapa (fetch, indicators, features, inference) y al
+                terminar ('done', 1.0)
+            cancel: CancelToken comprobado entre etapas; si se cancela se
+                lanza OperationCancelled (una señal ya calculada se guarda
+                igualmente en caché)
             
         Returns:
-            Diccionario con señal
+            Signal (se usa como diccionario)
         """
-        # Descargar datos
-        df = self.download_data(symbol, timeframe)
+        # Misma vela, modelo y configuración que la última vez
+        cached = self.cached_signal(symbol, timeframe)
+        if cached is not None:
+            checkpoint('done', progress, cancel)
+            return cached
         
+        try:
+            with self.metrics.span('total', symbol, timeframe):
+                # Descargar datos
+                checkpoint('fetch', progress, cancel)
+                ohlcv = self._timed_fetch(symbol, timeframe, cancel=cancel)
+                
+                signal = self._signal_from_ohlcv(symbol, timeframe, ohlcv, progress, cancel)
+            
+            # Calculada: se guarda aunque la cancelación llegue ahora
+            self._cache_signal(signal)
+            checkpoint('done', progress, cancel)
+        except OperationCancelled:
+            self.metrics.incr('cancelled', symbol=symbol)
+            raise
+        
+        return signal
+    
+    def _signal_from_ohlcv(self, symbol, timeframe, ohlcv, progress=None, cancel=None):
+        """Indicadores, predicción y señal a partir de las velas ya descargadas"""
         # Calcular indicadores
-        df = self.calculate_indicators(df)
-        df = self.create_features(df)
+        df, n_candles = self._prepare_features(symbol, timeframe, ohlcv, progress, cancel)
+        
+        # Predicción (ML o reglas si no hay modelo)
+        checkpoint('inference', progress, cancel)
+        with self.metrics.span('inference', symbol, timeframe):
+            prediction, confidence = self._predict(df)
+        
+        return self._build_signal(symbol, timeframe, df, n_candles, prediction, confidence)
+    
+    async def _aget_exchange(self):
+        """Cliente asíncrono (uno por event loop: su sesión HTTP va ligada al loop)"""
+        if self.async_exchange is not None:
+            return self.async_exchange
+        
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = create_async_client(self.exchange_id)
+        return client
+    
+    async def aclose(self):
+        """Cerrar los clientes asíncronos creados por el predictor en este loop"""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+    
+    async def afetch_ohlcv(self, symbol, timeframe='1h', limit=500):
+        """
+        fetch_ohlcv sin bloquear el event loop
+        
+        Returns:
+            Array (n, 6) con timestamp en ms y OHLCV
+        """
+        exchange = await self._aget_exchange()
+        
+        try:
+            with self.metrics.span('fetch', symbol, timeframe):
+                return await self.candle_store.afetch(exchange, symbol, timeframe, limit=limit)
+        except Exception:
+            self.metrics.incr('fetch_errors', symbol=symbol)
+            raise
+    
+    async def agenerate_signal(self, symbol, timeframe='1h', executor=None):
+        """
+        Versión asíncrona de generate_signal
+        
+        La descarga usa el cliente asíncrono; los indicadores y la predicción
+        (CPU) se ejecutan en un executor para no bloquear el loop.
+        
+        Args:
+            symbol: Par de trading
+            timeframe: Timeframe
+            executor: Executor para el cálculo (por defecto, el del loop)
+            
+        Returns:
+            Signal (se usa como diccionario)
+        """
+        exchange = await self._aget_exchange()
+        cached = self.cached_signal(symbol, timeframe, exchange)
+        if cached is not None:
+            return cached
+        
+        loop = asyncio.get_running_loop()
+        with self.metrics.span('total', symbol, timeframe):
+            ohlcv = await self.afetch_ohlcv(symbol, timeframe)
+            signal = await loop.run_in_executor(
+                executor, self._signal_from_ohlcv, symbol, timeframe, ohlcv
+            )
+        
+        self._cache_signal(signal)
+        return signal
+    
+    async def ascan(self, symbols, timeframes=('1h',), max_concurrency=100, executor=None):
+        """
+        Versión asíncrona de scan: todas las descargas en un solo loop
+        
+        Las descargas no ocupan un hilo cada una; como máximo hay
+        max_concurrency en vuelo. Las que van terminando se procesan por
+        lotes en el executor.
+        
+        Args:
+            symbols: Lista de pares de trading
+            timeframes: Timeframe o lista de timeframes
+            max_concurrency: Descargas simultáneas
+            executor: Executor para el cálculo (por defecto, el del loop)
+            
+        Yields:
+            Signal según van terminando; si algo falla, un
+            diccionario con solo 'symbol', 'timeframe' y 'error'
+        """
+        if isinstance(timeframes, str):
+            timeframes = [timeframes]
+        
+        exchange = await self._aget_exchange()
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def fetch(symbol, timeframe):
+            async with semaphore:
+                return await self.afetch_ohlcv(symbol, timeframe)
+        
+        pending = {}
+        for symbol in symbols:
+            for timeframe in timeframes:
+                cached = self.cached_signal(symbol, timeframe, exchange)
+                if cached is not None:
+                    yield cached
+                else:
+                    pending[asyncio.ensure_future(fetch(symbol, timeframe))] = (symbol, timeframe)
+        
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                
+                batch = []
+                for future in done:
+                    symbol, timeframe = pending.pop(future)
+                    try:
+                        batch.append((symbol, timeframe, future.result()))
+                    except Exception as e:
+                        yield {'symbol': symbol, 'timeframe': timeframe, 'error': str(e)}
+                
+                signals = await loop.run_in_executor(executor, self._signals_for_batch, batch)
+                for signal in signals:
+                    self._cache_signal(signal)
+                    yield signal
+        finally:
+            for future in pending:
+                future.cancel()
+    
+    def generate_mtf_signal(self, symbol, timeframes=('15m', '1h', '4h', '1d'),
+                            base_timeframe=None, bars=100):
+        """
+        Generar una señal multi-timeframe con una sola descarga
+        
+        Solo se descargan (y guardan) velas del timeframe base; los demás
+        timeframes se agregan localmente y se actualizan de forma incremental.
+        
+        Args:
+            symbol: Par de trading
+            timeframes: Timeframes a analizar
+            base_timeframe: Timeframe a descargar (por defecto, el más fino)
+            bars: Velas mínimas del timeframe más alto
+            
+        Returns:
+            Diccionario con la señal combinada (ver multi_timeframe.confluence)
+            y la señal de cada timeframe en 'signals'
+        """
+        timeframes = sorted(timeframes, key=timeframe_to_ms)
+        if base_timeframe is None:
+            base_timeframe = timeframes[0]
+        ratio = max(check_resample(base_timeframe, tf) for tf in timeframes)
+        
+        with self.metrics.span('total_mtf', symbol, base_timeframe):
+            ohlcv = self._timed_fetch(symbol, base_timeframe, limit=max(500, bars * ratio))
+            
+            batch = []
+            with self.metrics.span('resample', symbol, base_timeframe):
+                for timeframe in timeframes:
+                    if timeframe == base_timeframe:
+                        batch.append((symbol, timeframe, ohlcv))
+                        continue
+                    
+                    key = (symbol, base_timeframe, timeframe)
+                    with self._engines_lock:
+                        aggregator = self._aggregators.get(key)
+                        if aggregator is None:
+                            aggregator = self._aggregators[key] = TimeframeAggregator(
+                                base_timeframe, timeframe
+                            )
+                    batch.append((symbol, timeframe, aggregator.update(ohlcv)))
+            
+            signals = self._signals_for_batch(batch)
+            
+            return confluence(
+                {signal['timeframe']: signal for signal in signals},
+                timeframes[0], self.min_confluence
+            )
+    
+    def scan(self, symbols, timeframes=('1h',), max_workers=8, progress=None, cancel=None):
+        """
+        Generar señales para varios símbolos y timeframes
         
+        Las señales en caché se devuelven primero. El resto se descarga en
+        paralelo (como máximo max_workers a la vez) sobre el cliente
+        compartido y los indicadores y la predicción se calculan por lotes con
+        las descargas que van terminando.
+        
+        Args:
+            symbols: Lista de pares de trading
+            timeframes: Timeframe o lista de timeframes
+            max_workers: Descargas simultáneas
+            progress: Callback progress(fraction, 'scan') tras cada señal
+            cancel: CancelToken; al cancelar no se empiezan más descargas, se
+                descartan las que estén en curso y se lanza OperationCancelled
+            
+        Yields:
+            Signal según van terminando; si algo falla, un
+            diccionario con solo 'symbol', 'timeframe' y 'error'
+        """
+        if isinstance(timeframes, str):
+            timeframes = [timeframes]
+        
+        # Crear el cliente antes de lanzar los hilos
+        self._get_exchange()
+        
+        total = len(symbols) * len(timeframes)
+        completed = 0
+        
+        missing = []
+        for symbol in symbols:
+            for timeframe in timeframes:
+                cached = self.cached_signal(symbol, timeframe)
+                if cached is not None:
+                    completed += 1
+                    checkpoint('scan', progress, cancel, completed / total)
+                    yield cached
+                else:
+                    missing.append((symbol, timeframe))
+        
+        if not missing:
+            return
+        
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        # Al cancelar se descartan las descargas que aún no han empezado
+        remove_callback = None
+        if cancel is not None:
+            remove_callback = cancel.add_callback(
+                lambda: executor.shutdown(wait=False, cancel_futures=True)
+            )
+        try:
+            pending = {}
+            for symbol, timeframe in missing:
+                if cancel is not None and cancel.cancelled:
+                    break
+                try:
+                    future = executor.submit(self._timed_fetch, symbol, timeframe, cancel=cancel)
+                except RuntimeError:
+                    # El callback de cancelación cerró el ejecutor entre medias
+                    if cancel is None or not cancel.cancelled:
+                        raise
+                    break
+                pending[future] = (symbol, timeframe)
+            
+            if cancel is not None and cancel.cancelled:
+                self.metrics.incr('cancelled', len(missing))
+                cancel.check()
+            
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                if cancel is not None and cancel.cancelled:
+                    self.metrics.incr('cancelled', len(pending))
+                    cancel.check()
+                
+                batch = []
+                for future in done:
+                    symbol, timeframe = pending.pop(future)
+                    try:
+                        batch.append((symbol, timeframe, future.result()))
+                    except Exception as e:
+                        completed += 1
+                        checkpoint('scan', progress, cancel, completed / total)
+                        yield {'symbol': symbol, 'timeframe': timeframe, 'error': str(e)}
+                
+                for signal in self._signals_for_batch(batch, cancel):
+                    self._cache_signal(signal)
+                    completed += 1
+                    checkpoint('scan', progress, cancel, completed / total)
+                    yield signal
+        finally:
+            if remove_callback is not None:
+                remove_callback()
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def screen(self, symbols, timeframe='1h', window=500, refresh=True, max_workers=8, **filters):
+        """
+        Screener: puntuar y ordenar muchos símbolos en una sola pasada
+        
+        Args:
+            symbols: Lista de pares de trading
+            timeframe: Timeframe
+            window: Velas usadas para los indicadores
+            refresh: Descargar las velas nuevas (False usa solo el histórico local)
+            max_workers: Descargas simultáneas
+            **filters: Filtros y orden de screener.screen_symbols (rank_by,
+                trend, rsi_range, min_volume_ratio, only_valid)
+            
+        Returns:
+            DataFrame ordenado, una fila por símbolo (ver screen_symbols); los
+            símbolos descartados o con error están en attrs['excluded']
+        """
+        histories = {}
+        errors = {}
+        
+        if refresh:
+            self._get_exchange()
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    symbol: executor.submit(self._timed_fetch, symbol, timeframe, window)
+                    for symbol in symbols
+                }
+                for symbol, future in futures.items():
+                    try:
+                        histories[symbol] = future.result()
+                    except Exception as e:
+                        errors[symbol] = str(e)
+        else:
+            exchange_id = getattr(self._get_exchange(), 'id', 'exchange')
+            for symbol in symbols:
+                histories[symbol] = self.candle_store.load(exchange_id, symbol, timeframe, tail=window)
+        
+        with self.metrics.span('screen'):
+            result = screen_symbols(histories, timeframe, window, predictor=self, **filters)
+        
+        result.attrs['excluded'].update(errors)
+        return result
+    
+    def _signals_for_batch(self, batch, cancel=None):
+        """
+        Calcular indicadores y predicción para un lote de descargas
+        
+        Args:
+            batch: Lista de tuplas (symbol, timeframe, ohlcv)
+            cancel: CancelToken comprobado entre símbolos (opcional)
+            
+        Returns:
+            Lista de señales (o errores) en el mismo orden
+        """
+        signals = [None] * len(batch)
+        
+        # Indicadores de cada descarga
+        prepared = []
+        for i, (symbol, timeframe, ohlcv) in enumerate(batch):
+            if cancel is not None:
+                cancel.check()
+            try:
+                df, n_candles = self._prepare_features(symbol, timeframe, ohlcv)
+                prepared.append((i, symbol, timeframe, df, n_candles))
+            except Exception as e:
+                signals[i] = {'symbol': symbol, 'timeframe': timeframe, 'error': str(e)}
+        
+        # Una sola pasada del modelo para todo el lote
+        with self.metrics.span('inference_batch'):
+            predictions = self._predict_batch([item[3] for item in prepared])
+        
+        for (i, symbol, timeframe, df, n_candles), (prediction, confidence) in zip(prepared, predictions):
+            try:
+                signals[i] = self._build_signal(symbol, timeframe, df, n_candles, prediction, confidence)
+            except Exception as e:
+                signals[i] = {'symbol': symbol, 'timeframe': timeframe, 'error': str(e)}
+        
+        return signals
+    
+    def _prepare_features(self, symbol, timeframe, ohlcv, progress=None, cancel=None):
+        """
+        Calcular indicadores y features a partir de las velas
+        
+        Returns:
+            Tupla (DataFrame con features, velas que respaldan los indicadores)
+        """
+        if len(ohlcv) == 0:
+            raise Exception(f"Sin velas para {symbol} {timeframe}")
+        
+        span = self.metrics.span
+        checkpoint('indicators', progress, cancel)
+        
+        if self.indicator_backend == 'streaming':
+            with span('indicators', symbol, timeframe):
+                df, n_candles = self.streaming_indicators(symbol, timeframe, ohlcv)
+        elif self.indicator_backend == 'numpy':
+            # NumPy ya incluye las features: solo se envuelve la última fila
+            with span('indicators', symbol, timeframe):
+                cols = self._numpy_engine().compute(ohlcv)
+                index = pd.DatetimeIndex([pd.to_datetime(int(ohlcv[-1, 0]), unit='ms')], name='timestamp')
+                df = pd.DataFrame({name: col[-1:] for name, col in cols.items()}, index=index)
+            return df, len(ohlcv)
+        else:
+            with span('dataframe', symbol, timeframe):
+                df = self._ohlcv_to_frame(ohlcv)
+            with span('indicators', symbol, timeframe):
+                df = self.calculate_indicators(df)
+            n_candles = len(df)
+        
+        checkpoint('features', progress, cancel)
+        with span('features', symbol, timeframe):
+            df = self.create_features(df)
+        
+        return df, n_candles
+    
+    def _predict(self, df):
+        """Predicción ML si hay modelo, si no basada en reglas"""
+        return self._predict_batch([df])[0]
+    
+    def _predict_batch(self, frames):
+        """
+        Predicción para varios DataFrames de features
+        
+        Returns:
+            Lista de tuplas (prediction, confidence) en el mismo orden
+        """
+        if self.model is None:
+            return [self._rule_based_prediction(df) for df in frames]
+        return self._ml_prediction_batch(frames)
+    
+    def _build_signal(self, symbol, timeframe, df, n_candles, prediction, confidence):
+        """
+        Construir la señal a partir de la predicción y la última vela
+        
+        Returns:
+            Signal (se usa como diccionario)
+        """
         # Última fila
         current = df.iloc[-1]
         current_price = current['close']
         
         # Detectar tendencia
-        trend = self.detect_trend(df)
-        
-        # Predicción simple basada en reglas si no hay modelo
-        if self.model is None:
-            prediction, confidence = self._rule_based_prediction(df)
-        else:
-            prediction, confidence = self._ml_prediction(df)
+        trend = self.detect_trend(df, n_candles)
         
         # Calcular niveles
         atr = current['atr']
@@ -233,24 +960,22 @@ class CryptoPredictor:
             risk_reward >= self.min_risk_reward
         )
         
-        signal = {
-            'symbol': symbol,
-            'timeframe': timeframe,
-            'timestamp': df.index[-1],
-            'current_price': float(current_price),
-            'prediction': int(prediction),
-            'confidence': float(confidence * 100),
-            'signal': 'BUY' if is_valid else 'HOLD',
-            'entry_price': float(current_price) if is_valid else None,
-            'stop_loss': float(stop_loss) if is_valid else None,
-            'take_profit': float(take_profit) if is_valid else None,
-            'risk_reward_ratio': float(risk_reward) if is_valid else None,
-            'trend': trend,
-            'rsi': float(current['rsi']) if not pd.isna(current['rsi']) else None,
-            'volume_ratio': float(current['volume_ratio']) if not pd.isna(current['volume_ratio']) else None,
-        }
-        
-        return signal
+        return Signal(
+            symbol=symbol,
+            timeframe=timeframe,
+            timestamp_ms=int(df.index[-1].value // 1_000_000),
+            current_price=float(current_price),
+            prediction=int(prediction),
+            confidence=float(confidence * 100),
+            signal='BUY' if is_valid else 'HOLD',
+            entry_price=float(current_price) if is_valid else None,
+            stop_loss=float(stop_loss) if is_valid else None,
+            take_profit=float(take_profit) if is_valid else None,
+            risk_reward_ratio=float(risk_reward) if is_valid else None,
+            trend=trend,
+            rsi=float(current['rsi']) if not pd.isna(current['rsi']) else None,
+            volume_ratio=float(current['volume_ratio']) if not pd.isna(current['volume_ratio']) else None,
+        )
     
     def _rule_based_prediction(self, df):
         """
@@ -304,29 +1029,126 @@ class CryptoPredictor:
         Returns:
             Tupla (prediction, confidence)
         """
+        return self._ml_prediction_batch([df])[0]
+    
+    def _ml_prediction_batch(self, frames):
+        """
+        Predicción ML de la última fila de varios DataFrames
+        
+        Se apilan las filas en una sola matriz y se llama una vez a
+        predict_proba; la etiqueta sale de la probabilidad. Las filas que no
+        se pueden predecir (features con NaN o error del modelo) usan las
+        reglas y se cuentan en ml_fallbacks.
+        
+        Args:
+            frames: Lista de DataFrames con features
+            
+        Returns:
+            Lista de tuplas (prediction, confidence)
+        """
+        results = [None] * len(frames)
+        
+        if frames:
+            try:
+                # Seleccionar features de la última fila de cada símbolo
+                X = np.vstack([
+                    df[self.feature_names].iloc[-1:].to_numpy(dtype=np.float64)
+                    for df in frames
+                ])
+                labels, confidences, valid = self._ml_predict_matrix(X)
+                for i in np.flatnonzero(valid):
+                    results[i] = (int(labels[i]), float(confidences[i]))
+            except Exception as e:
+                self._record_ml_fallback(sum(r is None for r in results), str(e))
+        
+        # Fallback a reglas
+        for i, df in enumerate(frames):
+            if results[i] is None:
+                results[i] = self._rule_based_prediction(df)
+        
+        return results
+    
+    def predict_features(self, features):
+        """
+        Predicción ML por lotes a partir de columnas de features
+        
+        Args:
+            features: Diccionario {feature: array (n,)}, p. ej. la última fila
+                de NumpyIndicators.compute para varios símbolos
+            
+        Returns:
+            Tupla (labels, confidences, valid); las filas con valid=False
+            deben usar las reglas (sin modelo, features con NaN o error del
+            modelo; las dos últimas se cuentan en ml_fallbacks)
+        """
+        n = len(next(iter(features.values()))) if features else 0
+        labels = np.zeros(n, dtype=np.int64)
+        confidences = np.zeros(n)
+        valid = np.zeros(n, dtype=bool)
+        
+        if n == 0 or self.model is None:
+            return labels, confidences, valid
+        
         try:
-            last_row = df.iloc[-1:]
+            X = np.column_stack([
+                np.asarray(features[name], dtype=np.float64) for name in self.feature_names
+            ])
+            return self._ml_predict_matrix(X)
+        except Exception as e:
+            self._record_ml_fallback(n, str(e))
+            return labels, confidences, valid
+    
+    def _ml_predict_matrix(self, X):
+        """
+        Predicción ML de una matriz de features (una fila por símbolo)
+        
+        Args:
+            X: Array (n, n_features) en el orden de feature_names
             
-            # Seleccionar features
-            X = last_row[self.feature_names]
+        Returns:
+            Tupla (labels, confidences, valid); las filas no válidas (con NaN)
+            se cuentan en ml_fallbacks y quedan sin predicción
+        """
+        # Un modelo entrenado con otras features daría predicciones sin sentido
+        schema = self._model_handle.load().feature_schema
+        if schema is not None and schema != FEATURE_SCHEMA_VERSION:
+            raise ValueError(
+                f"Modelo entrenado con features v{schema}; el predictor usa v{FEATURE_SCHEMA_VERSION}"
+            )
+        
+        labels = np.zeros(len(X), dtype=np.int64)
+        confidences = np.zeros(len(X))
+        valid = ~np.isnan(X).any(axis=1)
+        
+        if valid.any():
+            X_valid = pd.DataFrame(X[valid], columns=self.feature_names)
             
             # Normalizar
             if self.preprocessor:
-                X = self.preprocessor.transform(X)
+                X_valid = self.preprocessor.transform(X_valid)
             
             # Predecir
-            prediction = self.model.predict(X)[0]
-            confidence = self.model.predict_proba(X)[0, 1]
-            
-            return prediction, confidence
-            
-        except Exception as e:
-            # Fallback a reglas
-            return self._rule_based_prediction(df)
+            proba = self.model.predict_proba(X_valid)
+            classes = getattr(self.model, 'classes_', np.arange(proba.shape[1]))
+            labels[valid] = classes[np.argmax(proba, axis=1)]
+            confidences[valid] = proba[:, 1]
+        
+        if not valid.all():
+            self._record_ml_fallback(int((~valid).sum()), 'Features con NaN')
+        
+        return labels, confidences, valid
+    
+    def _record_ml_fallback(self, count, reason):
+        """Contar predicciones que cayeron a reglas"""
+        with self._stats_lock:
+            self.ml_fallbacks += count
+            self.last_ml_error = reason
+        
+        self.metrics.incr('ml_fallbacks', count)
 
 
 # Versión simplificada para cuando no hay modelo
 if __name__ == "__main__":
     predictor = CryptoPredictor()
     signal = predictor.generate_signal('BTC/USDT', '1h')
-    print(json.dumps(signal, indent=2, default=str))
+    print(json.dumps(signal, indent=2, default=json_default))
@@ -0,0 +1,96 @@
+"""
+Progreso y cancelación de operaciones largas
+Las etapas del predictor informan de su avance y comprueban el token de
+cancelación entre una y otra
+"""
+import threading
+
+# Fracción completada al empezar cada etapa de generate_signal
+SIGNAL_STAGES = {
+    'fetch': 0.0,
+    'indicators': 0.6,
+    'features': 0.8,
+    'inference': 0.9,
+    'done': 1.0,
+}
+
+
+class OperationCancelled(Exception):
+    """La operación se canceló con su CancelToken"""
+
+
+class CancelToken:
+    """
+    Token de cancelación compartido entre quien lanza la operación y el hilo
+    que la ejecuta
+    
+    cancel() puede llamarse desde cualquier hilo; la operación se detiene en
+    su siguiente comprobación (entre etapas o entre páginas de descarga).
+    """
+    
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+    
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+    
+    def cancel(self):
+        """Pedir la cancelación (idempotente)"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        
+        for callback in callbacks:
+            callback()
+    
+    def check(self):
+        """Lanzar OperationCancelled si se pidió la cancelación"""
+        if self._event.is_set():
+            raise OperationCancelled("Operación cancelada")
+    
+    def add_callback(self, callback):
+        """
+        Registrar una función llamada (sin argumentos) al cancelar
+        
+        Si el token ya está cancelado se llama en el acto.
+        
+        Returns:
+            Función para quitar el callback
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove_callback(callback)
+        
+        callback()
+        return lambda: None
+    
+    def _remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+    
+    def wait(self, timeout=None):
+        """Esperar a la cancelación; True si se canceló"""
+        return self._event.wait(timeout)
+
+
+def checkpoint(stage, progress=None, cancel=None, fraction=None):
+    """
+    Punto de control entre etapas
+    
+    Args:
+        stage: Nombre de la etapa que empieza
+        progress: Callback progress(fraction, stage) (opcional)
+        cancel: CancelToken (opcional)
+        fraction: Fracción completada (por defecto, la de SIGNAL_STAGES)
+    """
+    if cancel is not None:
+        cancel.check()
+    if progress is not None:
+        progress(SIGNAL_STAGES.get(stage, 0.0) if fraction is None else fraction, stage)
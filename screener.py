@@ -0,0 +1,191 @@
+"""
+Screener de varios símbolos a la vez
+Alinea los históricos en matrices (tiempo x símbolo), calcula los
+indicadores por columnas en una sola pasada y ordena los símbolos
+"""
+import numpy as np
+
+from backtest import DEFAULT_PARAMS, signal_arrays
+from candle_store import timeframe_to_ms
+from indicators_np import NumpyIndicators
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+RESULT_COLUMNS = [
+    'symbol', 'current_price', 'score', 'confidence', 'prediction', 'signal', 'trend',
+    'rsi', 'volume_ratio', 'stop_loss', 'take_profit', 'risk_reward_ratio', 'source',
+]
+
+
+def align_histories(histories, timeframe, window=500):
+    """
+    Alinear los históricos en una rejilla temporal común
+    
+    La rejilla termina en la última vela más frecuente entre los símbolos.
+    Los huecos se rellenan con el cierre anterior y volumen 0; se excluyen
+    los símbolos sin esa última vela o con menos de `window` velas.
+    
+    Args:
+        histories: Diccionario {symbol: array (n, 6)}
+        timeframe: Timeframe de los históricos
+        window: Velas de la rejilla
+    
+    Returns:
+        Tupla (timestamps, symbols, matrices, excluded) con matrices
+        {columna: array (window, n_symbols)} y excluded {symbol: motivo}
+    """
+    step = timeframe_to_ms(timeframe)
+    excluded = {}
+    lasts = {}
+    for symbol, ohlcv in histories.items():
+        if len(ohlcv):
+            lasts[symbol] = int(ohlcv[-1][0])
+        else:
+            excluded[symbol] = 'Sin velas'
+    
+    if not lasts:
+        return np.empty(0, dtype=np.int64), [], {}, excluded
+    
+    values, counts = np.unique(list(lasts.values()), return_counts=True)
+    end = int(values[len(counts) - 1 - np.argmax(counts[::-1])])
+    timestamps = end - step * np.arange(window - 1, -1, -1, dtype=np.int64)
+    
+    symbols = []
+    arrays = []
+    for symbol in lasts:
+        ohlcv = np.asarray(histories[symbol], dtype=np.float64)
+        if lasts[symbol] < end:
+            excluded[symbol] = 'Sin la última vela'
+        elif ohlcv[0, 0] > timestamps[0]:
+            excluded[symbol] = 'Histórico insuficiente'
+        else:
+            symbols.append(symbol)
+            arrays.append(ohlcv)
+    
+    matrices = {name: np.empty((window, len(symbols))) for name in PRICE_COLUMNS}
+    for j, ohlcv in enumerate(arrays):
+        ts = ohlcv[:, 0].astype(np.int64)
+        prev = np.searchsorted(ts, timestamps, side='right') - 1
+        found = ts[prev] == timestamps
+        
+        close = ohlcv[prev, 4]
+        matrices['close'][:, j] = close
+        for k, name in ((1, 'open'), (2, 'high'), (3, 'low')):
+            matrices[name][:, j] = np.where(found, ohlcv[prev, k], close)
+        matrices['volume'][:, j] = np.where(found, ohlcv[prev, 5], 0.0)
+    
+    return timestamps, symbols, matrices, excluded
+
+
+def screen_symbols(histories, timeframe='1h', window=500, predictor=None, params=None,
+                   rank_by='confidence', trend=None, rsi_range=None, min_volume_ratio=None,
+                   only_valid=False):
+    """
+    Puntuar y ordenar varios símbolos en una sola pasada vectorizada
+    
+    Args:
+        histories: Diccionario {symbol: array (n, 6)}
+        timeframe: Timeframe de los históricos
+        window: Velas usadas para los indicadores
+        predictor: CryptoPredictor cuyo modelo y umbrales se usan (opcional;
+            sin él, reglas con DEFAULT_PARAMS)
+        params: Parámetros de las reglas a sobrescribir
+        rank_by: Columna por la que ordenar ('confidence' o 'score')
+        trend: Tendencias admitidas, p. ej. ('uptrend',)
+        rsi_range: Tupla (mínimo, máximo) de RSI
+        min_volume_ratio: volume_ratio mínimo
+        only_valid: Solo señales BUY
+    
+    Returns:
+        DataFrame ordenado, una fila por símbolo; en attrs, 'timestamp' de la
+        última vela y 'excluded' con los símbolos descartados y el motivo
+        (falta de datos o 'Filtro <argumento>')
+    """
+    timestamps, symbols, matrices, excluded = align_histories(histories, timeframe, window)
+    
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    if predictor is not None:
+        p['min_confidence'] = predictor.min_confidence
+        p['min_risk_reward'] = predictor.min_risk_reward
+    
+    if not symbols:
+        result = pd.DataFrame(columns=RESULT_COLUMNS)
+        result.attrs['timestamp'] = None
+        result.attrs['excluded'] = excluded
+        return result
+    
+    # Indicadores de todos los símbolos a la vez; solo interesa la última fila
+    cols = NumpyIndicators().compute(matrices)
+    last = {name: col[-1] for name, col in cols.items()}
+    
+    signals = signal_arrays(last, p)
+    prediction = signals['prediction'].astype(np.int64)
+    confidence = signals['confidence']
+    source = np.full(len(symbols), 'rules', dtype=object)
+    
+    if predictor is not None:
+        # Una sola llamada al modelo con la última fila de cada símbolo
+        labels, ml_confidence, valid = predictor.predict_features(last)
+        prediction = np.where(valid, labels, prediction)
+        confidence = np.where(valid, ml_confidence, confidence)
+        source[valid] = 'ml'
+    
+    is_valid = (
+        (prediction == 1) &
+        (confidence >= p['min_confidence']) &
+        (signals['risk_reward'] >= p['min_risk_reward'])
+    )
+    
+    # Tendencia como en detect_trend
+    ema_short, ema_long = last['ema_21'], last['ema_50']
+    trends = np.where(
+        ema_short > ema_long * 1.01, 'uptrend',
+        np.where(ema_short < ema_long * 0.99, 'downtrend', 'sideways')
+    ).astype(object)
+    if window < 50:
+        trends[:] = 'unknown'
+    
+    result = pd.DataFrame({
+        'symbol': symbols,
+        'current_price': last['close'],
+        'score': signals['score'],
+        'confidence': confidence * 100,
+        'prediction': prediction,
+        'signal': np.where(is_valid, 'BUY', 'HOLD'),
+        'trend': trends,
+        'rsi': last['rsi'],
+        'volume_ratio': last['volume_ratio'],
+        'stop_loss': np.where(is_valid, signals['stop_loss'], np.nan),
+        'take_profit': np.where(is_valid, signals['take_profit'], np.nan),
+        'risk_reward_ratio': np.where(is_valid, signals['risk_reward'], np.nan),
+        'source': source,
+    })
+    
+    # Filtros: los símbolos descartados quedan en excluded con el primer filtro que no pasan
+    filters = []
+    if trend is not None:
+        filters.append(('trend', result['trend'].isin([trend] if isinstance(trend, str) else trend)))
+    if rsi_range is not None:
+        filters.append(('rsi_range', (result['rsi'] >= rsi_range[0]) & (result['rsi'] <= rsi_range[1])))
+    if min_volume_ratio is not None:
+        filters.append(('min_volume_ratio', result['volume_ratio'] >= min_volume_ratio))
+    if only_valid:
+        filters.append(('only_valid', is_valid))
+    
+    mask = np.ones(len(result), dtype=bool)
+    for name, passed in filters:
+        passed = np.asarray(passed, dtype=bool)
+        for symbol in result['symbol'].to_numpy()[mask & ~passed]:
+            excluded[symbol] = f'Filtro {name}'
+        mask &= passed
+    
+    result = result[mask].sort_values(
+        [rank_by, 'volume_ratio'], ascending=False, kind='stable'
+    ).reset_index(drop=True)
+    
+    result.attrs['timestamp'] = pd.to_datetime(int(timestamps[-1]), unit='ms')
+    result.attrs['excluded'] = excluded
+    return result
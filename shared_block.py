@@ -0,0 +1,51 @@
+"""
+Bloques de memoria compartida para pools de procesos
+El proceso principal crea un array float64 en memoria compartida y los
+workers lo abren por nombre, sin serializar los datos
+"""
+from multiprocessing import shared_memory
+import numpy as np
+
+
+def create_block(shape):
+    """
+    Crear un bloque float64 de memoria compartida
+    
+    Args:
+        shape: Forma del array
+    
+    Returns:
+        Tupla (shm, array) con el array como vista del bloque
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * 8))
+    return shm, np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+
+
+def attach_block(name, shape):
+    """
+    Abrir desde un worker un bloque creado con create_block
+    
+    Los workers comparten el resource_tracker del proceso principal, que es
+    quien libera el bloque al terminar.
+    
+    Returns:
+        Tupla (shm, array)
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+
+
+def release_block(shm):
+    """
+    Cerrar y borrar el bloque sin ocultar la excepción en curso
+    
+    Las vistas sobre el bloque deben soltarse antes. Con una excepción, su
+    traceback puede mantener alguna viva: close() fallaría con BufferError y
+    taparía el error real. El mapeo se libera entonces al recoger las
+    vistas; el nombre se borra igualmente.
+    """
+    try:
+        shm.close()
+    except BufferError:
+        pass
+    shm.unlink()
@@ -0,0 +1,170 @@
+"""
+Caché de señales por vela
+Una señal se reutiliza mientras no cambie la vela, el modelo ni la
+configuración del predictor
+"""
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+from candle_store import default_data_dir
+
+
+class SignalCache:
+    """
+    Caché LRU de señales con nivel opcional en disco
+    
+    Las claves son tuplas (symbol, timeframe, candle_ts, model_version, config).
+    """
+    
+    def __init__(self, max_entries=256, disk_dir=None):
+        """
+        Args:
+            max_entries: Señales conservadas en memoria
+            disk_dir: Directorio del nivel en disco (None lo desactiva; '' usa
+                el directorio de datos por defecto)
+        """
+        if disk_dir == '':
+            disk_dir = os.path.join(default_data_dir(), 'signals')
+        
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.enabled = True
+        
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._listeners = []
+        self._lock = threading.Lock()
+    
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        symbol, timeframe = key[0], key[1]
+        return os.path.join(self.disk_dir, f"{symbol.replace('/', '-')}_{timeframe}_{digest}.pkl")
+    
+    def get(self, key):
+        """
+        Señal guardada para la clave
+        
+        Returns:
+            Copia de la señal, o None si no está
+        """
+        if not self.enabled:
+            return None
+        
+        with self._lock:
+            signal = self._entries.get(key)
+            if signal is not None:
+                self._entries.move_to_end(key)
+        
+        if signal is None and self.disk_dir:
+            signal = self._load_disk(key)
+            if signal is not None:
+                self._store_memory(key, signal)
+        
+        with self._lock:
+            if signal is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return signal.copy()
+    
+    def put(self, key, signal):
+        """Guardar una señal (se ignoran los errores)"""
+        if not self.enabled or 'error' in signal:
+            return
+        
+        signal = signal.copy()
+        self._store_memory(key, signal)
+        if self.disk_dir:
+            self._save_disk(key, signal)
+    
+    def _store_memory(self, key, signal):
+        with self._lock:
+            self._entries[key] = signal
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def _load_disk(self, key):
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                stored_key, signal = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return None
+        return signal if stored_key == key else None
+    
+    def _save_disk(self, key, signal):
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            path = self._disk_path(key)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((key, signal), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+    
+    def add_listener(self, callback):
+        """Registrar una función llamada con (symbol, timeframe) en cada invalidación"""
+        self._listeners.append(callback)
+    
+    def invalidate(self, symbol=None, timeframe=None, before=None):
+        """
+        Borrar señales
+        
+        Args:
+            symbol: Solo las de este par (por defecto, todas)
+            timeframe: Solo las de este timeframe
+            before: Solo las de velas anteriores a este timestamp en ms
+        
+        Returns:
+            Número de señales borradas de memoria
+        """
+        def matches(key):
+            return (
+                (symbol is None or key[0] == symbol) and
+                (timeframe is None or key[1] == timeframe) and
+                (before is None or key[2] < before)
+            )
+        
+        with self._lock:
+            stale = [key for key in self._entries if matches(key)]
+            for key in stale:
+                del self._entries[key]
+        
+        if self.disk_dir and os.path.isdir(self.disk_dir):
+            prefix = '' if symbol is None else symbol.replace('/', '-') + '_'
+            for name in os.listdir(self.disk_dir):
+                if not name.startswith(prefix) or not name.endswith('.pkl'):
+                    continue
+                path = os.path.join(self.disk_dir, name)
+                try:
+                    with open(path, 'rb') as f:
+                        key, _ = pickle.load(f)
+                    if matches(key):
+                        os.remove(path)
+                except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+                    continue
+        
+        for callback in list(self._listeners):
+            callback(symbol, timeframe)
+        
+        return len(stale)
+    
+    def on_candle(self, symbol, timeframe, timestamp):
+        """Hook para una vela nueva: invalida las señales de velas anteriores"""
+        return self.invalidate(symbol, timeframe, before=int(timestamp))
+    
+    def clear(self):
+        """Vaciar la caché (memoria y disco)"""
+        self.invalidate()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+    
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,360 @@
+"""
+Diario persistente de señales en SQLite
+Las señales se encolan sin bloquear y un hilo las escribe por lotes; se
+consultan por símbolo, timeframe, tipo y rango de fechas y se evalúan
+contra el histórico de velas
+"""
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+import numpy as np
+
+from backtest import first_touch, summarize
+from candle_store import default_data_dir
+from lazy_imports import lazy_import
+from signal_record import SIGNAL_FIELDS, Signal, datetime_to_ms
+
+pd = lazy_import('pandas')
+
+JOURNAL_SCHEMA_VERSION = 1
+
+# Columnas de la tabla, en el orden de Signal (timestamp = vela en ms)
+_COLUMNS = SIGNAL_FIELDS + ('recorded_at',)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS signals (
+    symbol TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    current_price REAL,
+    prediction INTEGER,
+    confidence REAL,
+    signal TEXT NOT NULL,
+    entry_price REAL,
+    stop_loss REAL,
+    take_profit REAL,
+    risk_reward_ratio REAL,
+    trend TEXT,
+    rsi REAL,
+    volume_ratio REAL,
+    recorded_at INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS signals_key ON signals (symbol, timeframe, timestamp);
+CREATE INDEX IF NOT EXISTS signals_type ON signals (signal, timestamp);
+"""
+
+# Una fila por vela: si la misma vela se recalcula (vela parcial, modelo
+# nuevo) se guarda la última señal
+_INSERT = (
+    f"INSERT OR REPLACE INTO signals ({', '.join(_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(_COLUMNS))})"
+)
+
+_DAY_MS = 86_400_000
+
+
+def default_journal_path():
+    """Ruta por defecto del diario (junto al histórico de velas)"""
+    return os.path.join(default_data_dir(), 'signals.db')
+
+
+class SignalJournal:
+    """
+    Diario de señales con escritura por lotes en segundo plano
+    
+    record() solo encola: nunca espera al disco. Si la cola se llena (disco
+    muy lento) o el diario ya se cerró, las señales se descartan y se
+    cuentan en `dropped`.
+    """
+    
+    def __init__(self, path=None, batch_size=500, flush_interval=1.0, max_queue=100_000):
+        """
+        Args:
+            path: Archivo SQLite (por defecto, default_journal_path())
+            batch_size: Señales máximas por transacción
+            flush_interval: Segundos máximos que una señal espera en la cola
+            max_queue: Señales pendientes a partir de las cuales se descarta
+        """
+        self.path = path or default_journal_path()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        
+        self.written = 0
+        self.dropped = 0
+        self.last_error = None
+        self._closed = False
+        
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            conn.execute(f'PRAGMA user_version = {JOURNAL_SCHEMA_VERSION}')
+        
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = object()
+        self._thread = threading.Thread(target=self._writer, name='signal-journal', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+    
+    # Escritura
+    
+    def record(self, signal):
+        """
+        Encolar una señal (no bloquea)
+        
+        Las entradas con 'error' se ignoran.
+        
+        Returns:
+            True si se encoló
+        """
+        if 'error' in signal:
+            return False
+        if self._closed or not self._thread.is_alive():
+            # Sin hilo de escritura la señal se quedaría en la cola
+            self.dropped += 1
+            return False
+        if not isinstance(signal, Signal):
+            signal = Signal.from_dict(signal)
+        
+        try:
+            self._queue.put_nowait(signal._values() + (int(time.time() * 1000),))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+    
+    def record_many(self, signals):
+        """Encolar varias señales; devuelve cuántas se encolaron"""
+        return sum(self.record(signal) for signal in signals)
+    
+    def _writer(self):
+        conn = self._connect()
+        try:
+            stopping = False
+            while not stopping:
+                batch = []
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                
+                # Lote: lo que haya en la cola hasta batch_size
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    if item is self._stop:
+                        stopping = True
+                    elif isinstance(item, threading.Event):
+                        self._write(conn, batch)
+                        batch = []
+                        item.set()
+                    else:
+                        batch.append(item)
+                    if stopping or len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                
+                self._write(conn, batch)
+        finally:
+            conn.close()
+    
+    def _write(self, conn, batch):
+        if not batch:
+            return
+        try:
+            with conn:
+                conn.executemany(_INSERT, batch)
+            self.written += len(batch)
+        except sqlite3.Error as e:
+            self.dropped += len(batch)
+            self.last_error = str(e)
+    
+    def flush(self, timeout=None):
+        """
+        Esperar a que se escriba todo lo encolado hasta ahora
+        
+        Returns:
+            True si se escribió antes del timeout
+        """
+        if not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+    
+    def close(self, timeout=10):
+        """Escribir lo pendiente y parar el hilo de escritura"""
+        self._closed = True
+        if self._thread.is_alive():
+            self._queue.put(self._stop)
+            self._thread.join(timeout)
+    
+    def stats(self):
+        return {
+            'pending': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'last_error': self.last_error,
+        }
+    
+    # Consultas
+    
+    def query(self, symbol=None, timeframe=None, signal=None, start=None, end=None,
+              days=None, limit=None):
+        """
+        Señales guardadas, de la más antigua a la más reciente
+        
+        Ejemplo: todas las compras de SOL/USDT de los últimos 30 días
+        journal.query('SOL/USDT', signal='BUY', days=30)
+        
+        Args:
+            symbol: Par (opcional)
+            timeframe: Timeframe (opcional)
+            signal: 'BUY' / 'HOLD' (opcional)
+            start: Primera vela incluida (ms o datetime, opcional)
+            end: Última vela excluida (ms o datetime, opcional)
+            days: Solo las velas de los últimos `days` días (en lugar de start)
+            limit: Máximo de señales (las más recientes)
+        
+        Returns:
+            Lista de Signal
+        """
+        where, params = self._where(symbol, timeframe, signal, start, end, days)
+        
+        sql = f"SELECT {', '.join(SIGNAL_FIELDS)} FROM signals{where}"
+        if limit is not None:
+            # Las más recientes, devueltas en orden cronológico
+            sql = f'SELECT * FROM ({sql} ORDER BY timestamp DESC LIMIT ?) ORDER BY timestamp'
+            params.append(int(limit))
+        else:
+            sql += ' ORDER BY timestamp'
+        
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [Signal(*row) for row in rows]
+    
+    def count(self, symbol=None, timeframe=None, signal=None, start=None, end=None, days=None):
+        """Número de señales guardadas con los filtros de query (sin crear objetos)"""
+        where, params = self._where(symbol, timeframe, signal, start, end, days)
+        with closing(self._connect()) as conn:
+            return conn.execute(f'SELECT COUNT(*) FROM signals{where}', params).fetchone()[0]
+    
+    @staticmethod
+    def _where(symbol, timeframe, signal, start, end, days):
+        """Cláusula WHERE (con espacio inicial, o vacía) y parámetros de los filtros"""
+        if days is not None:
+            start = int(time.time() * 1000) - int(days * _DAY_MS)
+        
+        where, params = [], []
+        for column, value in (('symbol', symbol), ('timeframe', timeframe), ('signal', signal)):
+            if value is not None:
+                where.append(f'{column} = ?')
+                params.append(value)
+        if start is not None:
+            where.append('timestamp >= ?')
+            params.append(datetime_to_ms(start))
+        if end is not None:
+            where.append('timestamp < ?')
+            params.append(datetime_to_ms(end))
+        
+        return (' WHERE ' + ' AND '.join(where)) if where else '', params
+    
+    def evaluate(self, candle_store, exchange_id='binance', max_hold=48, **filters):
+        """
+        Resultado de las señales BUY guardadas contra el histórico de velas
+        
+        Se entra al cierre de la vela de la señal y se sale en el primer
+        toque de stop loss o take profit (backtest.first_touch), o al cierre
+        tras max_hold velas.
+        
+        Args:
+            candle_store: CandleStore con el histórico
+            exchange_id: Exchange del histórico
+            max_hold: Velas máximas en posición
+            **filters: Filtros de query (symbol, timeframe, start, end, days)
+        
+        Returns:
+            Tupla (DataFrame con una fila por señal, resumen de backtest.summarize
+            de las cerradas). outcome: 1=TP, -1=SL, 0=tiempo; 'open' indica
+            que aún no hay velas suficientes y 'missing' que falta la vela de
+            entrada en el histórico
+        """
+        filters['signal'] = 'BUY'
+        signals = [s for s in self.query(**filters) if s.stop_loss is not None and s.take_profit is not None]
+        
+        rows = []
+        groups = {}
+        for s in signals:
+            groups.setdefault((s.symbol, s.timeframe), []).append(s)
+        
+        for (symbol, timeframe), group in groups.items():
+            cols = candle_store.columns(exchange_id, symbol, timeframe, start=group[0].timestamp_ms)
+            timestamps = np.asarray(cols['timestamp'], dtype=np.int64)
+            n = len(timestamps)
+            
+            wanted = np.array([s.timestamp_ms for s in group], dtype=np.int64)
+            idx = np.searchsorted(timestamps, wanted)
+            found = idx < n
+            found[found] = timestamps[idx[found]] == wanted[found]
+            
+            status = np.where(found, 'closed', 'missing').astype(object)
+            exit_idx = np.full(len(group), -1)
+            exit_price = np.full(len(group), np.nan)
+            outcome = np.zeros(len(group), dtype=np.int8)
+            
+            if found.any():
+                entries = idx[found]
+                e_idx, e_price, e_outcome = first_touch(
+                    np.asarray(cols['high'], dtype=np.float64),
+                    np.asarray(cols['low'], dtype=np.float64),
+                    np.asarray(cols['close'], dtype=np.float64),
+                    entries,
+                    np.array([s.stop_loss for s, ok in zip(group, found) if ok]),
+                    np.array([s.take_profit for s, ok in zip(group, found) if ok]),
+                    max_hold,
+                )
+                exit_idx[found] = e_idx
+                exit_price[found] = e_price
+                outcome[found] = e_outcome
+                
+                # Sin toque y sin max_hold velas detrás: la operación sigue abierta
+                still_open = (e_outcome == 0) & (entries + max_hold > n - 1)
+                status[np.flatnonzero(found)[still_open]] = 'open'
+            
+            for i, s in enumerate(group):
+                closed = status[i] == 'closed'
+                rows.append({
+                    'symbol': symbol,
+                    'timeframe': timeframe,
+                    'timestamp': s.timestamp_ms,
+                    'confidence': s.confidence,
+                    'entry_price': s.entry_price,
+                    'stop_loss': s.stop_loss,
+                    'take_profit': s.take_profit,
+                    'status': status[i],
+                    'outcome': int(outcome[i]) if closed else None,
+                    'exit_timestamp': int(timestamps[exit_idx[i]]) if closed else None,
+                    'exit_price': float(exit_price[i]) if closed else None,
+                    'return': float(exit_price[i] / s.entry_price - 1) if closed else None,
+                })
+        
+        result = pd.DataFrame(rows, columns=[
+            'symbol', 'timeframe', 'timestamp', 'confidence', 'entry_price', 'stop_loss',
+            'take_profit', 'status', 'outcome', 'exit_timestamp', 'exit_price', 'return',
+        ])
+        closed = result[result['status'] == 'closed']
+        summary = summarize(
+            closed['return'].to_numpy(dtype=np.float64), closed['outcome'].to_numpy(dtype=np.int8)
+        )
+        return result, summary
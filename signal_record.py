@@ -0,0 +1,334 @@
+"""
+Registro compacto de señales y serialización en bloque
+Signal guarda los campos de generate_signal en __slots__ (timestamp en ms,
+sin pandas) y se sigue usando como diccionario; los lotes se guardan como
+array estructurado de NumPy (binario) o JSON lines
+"""
+import json
+import struct
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+from functools import lru_cache
+import numpy as np
+
+SIGNAL_SCHEMA_VERSION = 1
+
+# Campos de una señal, en el orden de generate_signal
+SIGNAL_FIELDS = (
+    'symbol', 'timeframe', 'timestamp', 'current_price', 'prediction', 'confidence',
+    'signal', 'entry_price', 'stop_loss', 'take_profit', 'risk_reward_ratio',
+    'trend', 'rsi', 'volume_ratio',
+)
+
+# Campos numéricos que pueden ser None (NaN en binario)
+_OPTIONAL_FLOATS = ('entry_price', 'stop_loss', 'take_profit', 'risk_reward_ratio', 'rsi', 'volume_ratio')
+
+# Valores codificados como índice en el formato binario
+SIGNAL_TYPES = ('HOLD', 'BUY')
+TRENDS = ('unknown', 'uptrend', 'downtrend', 'sideways')
+
+# Un registro binario: 103 bytes por señal
+SIGNAL_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('current_price', '<f8'),
+    ('confidence', '<f8'),
+    ('entry_price', '<f8'),
+    ('stop_loss', '<f8'),
+    ('take_profit', '<f8'),
+    ('risk_reward_ratio', '<f8'),
+    ('rsi', '<f8'),
+    ('volume_ratio', '<f8'),
+    ('prediction', 'i1'),
+    ('signal', 'u1'),
+    ('trend', 'u1'),
+    ('symbol', 'S24'),
+    ('timeframe', 'S4'),
+])
+
+# Cabecera binaria: magic, versión del esquema, bytes por registro, registros
+_HEADER = struct.Struct('<4sHHQ')
+_MAGIC = b'SGNL'
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def ms_to_datetime(timestamp_ms):
+    """Timestamp en ms a datetime UTC sin zona (como los índices de las velas)"""
+    return _EPOCH + timedelta(milliseconds=int(timestamp_ms))
+
+
+@lru_cache(maxsize=4096)
+def format_ms(timestamp_ms):
+    """Timestamp en ms como 'AAAA-MM-DD HH:MM:SS' (las señales de un escaneo comparten vela)"""
+    return str(ms_to_datetime(timestamp_ms))
+
+
+def datetime_to_ms(value):
+    """datetime / pandas Timestamp / cadena ISO / ms a timestamp en ms"""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if getattr(value, 'tzinfo', None) is not None:
+        value = value.replace(tzinfo=None) - value.utcoffset()
+    return (value - _EPOCH) // timedelta(milliseconds=1)
+
+
+class Signal(Mapping):
+    """
+    Señal de generate_signal con campos fijos
+    
+    Se accede como al diccionario de antes (signal['confidence'],
+    signal.get('rsi'), 'error' in signal, dict(signal)); signal['timestamp']
+    devuelve un datetime y timestamp_ms el entero. Las claves añadidas fuera
+    del esquema (p. ej. 'candle_closed') van a `extra` y no se guardan en
+    binario.
+    """
+    
+    __slots__ = (
+        'symbol', 'timeframe', 'timestamp_ms', 'current_price', 'prediction', 'confidence',
+        'signal', 'entry_price', 'stop_loss', 'take_profit', 'risk_reward_ratio',
+        'trend', 'rsi', 'volume_ratio', 'extra',
+    )
+    
+    def __init__(self, symbol, timeframe, timestamp_ms, current_price, prediction, confidence,
+                 signal, entry_price=None, stop_loss=None, take_profit=None,
+                 risk_reward_ratio=None, trend='unknown', rsi=None, volume_ratio=None, extra=None):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.timestamp_ms = timestamp_ms
+        self.current_price = current_price
+        self.prediction = prediction
+        self.confidence = confidence
+        self.signal = signal
+        self.entry_price = entry_price
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.risk_reward_ratio = risk_reward_ratio
+        self.trend = trend
+        self.rsi = rsi
+        self.volume_ratio = volume_ratio
+        self.extra = extra
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Crear una señal desde un diccionario (el de generate_signal o to_dict)"""
+        data = dict(data)
+        timestamp = data.pop('timestamp')
+        fields = {name: data.pop(name) for name in SIGNAL_FIELDS[3:] if name in data}
+        return cls(
+            data.pop('symbol'), data.pop('timeframe'), datetime_to_ms(timestamp),
+            extra=data or None, **fields
+        )
+    
+    @property
+    def timestamp(self):
+        return ms_to_datetime(self.timestamp_ms)
+    
+    # Interfaz de diccionario
+    
+    def __getitem__(self, key):
+        if key == 'timestamp':
+            return self.timestamp
+        if key in SIGNAL_FIELDS:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+    
+    def __setitem__(self, key, value):
+        if key == 'timestamp':
+            self.timestamp_ms = datetime_to_ms(value)
+        elif key in SIGNAL_FIELDS:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+    
+    def __contains__(self, key):
+        return key in SIGNAL_FIELDS or bool(self.extra and key in self.extra)
+    
+    def __iter__(self):
+        yield from SIGNAL_FIELDS
+        if self.extra:
+            yield from self.extra
+    
+    def __len__(self):
+        return len(SIGNAL_FIELDS) + (len(self.extra) if self.extra else 0)
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def copy(self):
+        return Signal(*self._values(), extra=dict(self.extra) if self.extra else None)
+    
+    def _values(self):
+        return (
+            self.symbol, self.timeframe, self.timestamp_ms, self.current_price, self.prediction,
+            self.confidence, self.signal, self.entry_price, self.stop_loss, self.take_profit,
+            self.risk_reward_ratio, self.trend, self.rsi, self.volume_ratio,
+        )
+    
+    def __reduce__(self):
+        # Pickle compacto (caché en disco): solo la tupla de valores
+        return Signal, self._values() + (self.extra,)
+    
+    def __repr__(self):
+        return (
+            f"Signal({self.symbol} {self.timeframe} {self.timestamp} {self.signal} "
+            f"price={self.current_price} confidence={self.confidence:.2f})"
+        )
+    
+    # Serialización
+    
+    def to_dict(self):
+        """Diccionario apto para JSON (timestamp como 'AAAA-MM-DD HH:MM:SS')"""
+        data = dict(zip(SIGNAL_FIELDS, self._values()))
+        data['timestamp'] = format_ms(self.timestamp_ms)
+        if self.extra:
+            data.update(self.extra)
+        return data
+    
+    def to_json(self):
+        return _encoder.encode(self.to_dict())
+
+
+def json_default(obj):
+    """Argumento default de json.dumps para señales y fechas"""
+    if isinstance(obj, Signal):
+        return obj.to_dict()
+    if isinstance(obj, (np.integer, np.floating)):
+        return obj.item()
+    return str(obj)
+
+
+# Un solo encoder para todas las líneas (json.dumps con default crea uno por llamada)
+_encoder = json.JSONEncoder(default=json_default)
+
+
+def signals_to_array(signals):
+    """
+    Lote de señales como array estructurado (SIGNAL_DTYPE)
+    
+    Las entradas con 'error' se omiten.
+    
+    Args:
+        signals: Iterable de Signal o diccionarios de generate_signal
+    
+    Returns:
+        Array estructurado de NumPy
+    """
+    signals = [
+        s if isinstance(s, Signal) else Signal.from_dict(s)
+        for s in signals if 'error' not in s
+    ]
+    array = np.zeros(len(signals), dtype=SIGNAL_DTYPE)
+    if not signals:
+        return array
+    
+    columns = list(zip(*(s._values() for s in signals)))
+    values = dict(zip(SIGNAL_FIELDS, columns))
+    
+    array['timestamp'] = values['timestamp']
+    array['current_price'] = values['current_price']
+    array['confidence'] = values['confidence']
+    for name in _OPTIONAL_FLOATS:
+        array[name] = [np.nan if v is None else v for v in values[name]]
+    array['prediction'] = values['prediction']
+    array['signal'] = [SIGNAL_TYPES.index(v) for v in values['signal']]
+    array['trend'] = [TRENDS.index(v) for v in values['trend']]
+    
+    for name in ('symbol', 'timeframe'):
+        encoded = [v.encode('utf-8') for v in values[name]]
+        limit = SIGNAL_DTYPE[name].itemsize
+        if max(map(len, encoded)) > limit:
+            raise ValueError(f"{name} de más de {limit} bytes: no cabe en el formato binario")
+        array[name] = encoded
+    
+    return array
+
+
+def signals_from_array(array):
+    """Lista de Signal a partir de un array estructurado (SIGNAL_DTYPE)"""
+    columns = {name: array[name].tolist() for name in SIGNAL_DTYPE.names}
+    for name in _OPTIONAL_FLOATS:
+        columns[name] = [None if v != v else v for v in columns[name]]
+    
+    return [
+        Signal(symbol.decode('utf-8'), timeframe.decode('utf-8'), timestamp, price,
+               prediction, confidence, SIGNAL_TYPES[signal], entry, stop, take, rr,
+               TRENDS[trend], rsi, volume_ratio)
+        for (timestamp, price, confidence, entry, stop, take, rr, rsi, volume_ratio,
+             prediction, signal, trend, symbol, timeframe) in zip(
+            *(columns[name] for name in SIGNAL_DTYPE.names)
+        )
+    ]
+
+
+def to_bytes(signals):
+    """Serializar señales en binario: cabecera de 16 bytes + registros SIGNAL_DTYPE"""
+    array = signals if isinstance(signals, np.ndarray) else signals_to_array(signals)
+    header = _HEADER.pack(_MAGIC, SIGNAL_SCHEMA_VERSION, SIGNAL_DTYPE.itemsize, len(array))
+    return header + array.tobytes()
+
+
+def from_bytes(data, as_array=False):
+    """
+    Leer señales serializadas con to_bytes
+    
+    Args:
+        data: bytes / memoryview (también un mmap del archivo)
+        as_array: Devolver el array estructurado sin crear objetos Signal
+    
+    Returns:
+        Lista de Signal, o array estructurado
+    """
+    magic, version, itemsize, count = _HEADER.unpack_from(data)
+    if magic != _MAGIC:
+        raise ValueError("No es un archivo de señales")
+    if version != SIGNAL_SCHEMA_VERSION or itemsize != SIGNAL_DTYPE.itemsize:
+        raise ValueError(f"Versión de esquema de señales no soportada: {version}")
+    
+    array = np.frombuffer(data, dtype=SIGNAL_DTYPE, count=count, offset=_HEADER.size)
+    return array if as_array else signals_from_array(array)
+
+
+def write_jsonl(signals, f):
+    """
+    Escribir señales en JSON lines
+    
+    La primera línea es la cabecera {"schema": "signal", "version": N}; las
+    entradas con 'error' se escriben tal cual.
+    
+    Returns:
+        Número de señales escritas
+    """
+    f.write(json.dumps({'schema': 'signal', 'version': SIGNAL_SCHEMA_VERSION}) + '\n')
+    count = 0
+    for signal in signals:
+        data = signal.to_dict() if isinstance(signal, Signal) else signal
+        f.write(_encoder.encode(data) + '\n')
+        count += 1
+    return count
+
+
+def read_jsonl(f):
+    """
+    Leer señales escritas con write_jsonl
+    
+    Returns:
+        Generador de Signal (o diccionarios para las entradas con 'error')
+    """
+    header = json.loads(f.readline() or '{}')
+    if header.get('schema') != 'signal' or header.get('version') != SIGNAL_SCHEMA_VERSION:
+        raise ValueError(f"Cabecera de señales no soportada: {header}")
+    
+    for line in f:
+        if not line.strip():
+            continue
+        data = json.loads(line)
+        yield data if 'error' in data else Signal.from_dict(data)
@@ -0,0 +1,328 @@
+"""
+Servicio de señales sin interfaz
+Servidor HTTP/JSON asíncrono (solo librería estándar) que mantiene un
+predictor caliente y comparte los cálculos entre peticiones simultáneas
+"""
+import asyncio
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from candle_store import timeframe_to_ms
+from predictor_core import CryptoPredictor
+from signal_record import json_default
+
+_ROUTES = ('/signal', '/scan', '/stream', '/stats', '/health')
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class HttpError(Exception):
+    """Error con código HTTP"""
+    
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class SignalServer:
+    """
+    API local sobre un CryptoPredictor
+    
+    Endpoints (GET):
+        /signal?symbol=BTC/USDT&timeframe=1h
+        /scan?symbols=BTC/USDT,ETH/USDT&timeframe=1h
+        /stream?symbols=BTC/USDT&timeframe=1h&interval=60  (Server-Sent Events)
+        /stats, /health
+    
+    Las peticiones simultáneas con los mismos parámetros esperan al mismo
+    cálculo en lugar de lanzar uno cada una.
+    """
+    
+    def __init__(self, predictor=None, host='127.0.0.1', port=8765, max_workers=8, stream=None):
+        """
+        Args:
+            predictor: CryptoPredictor (por defecto, uno nuevo)
+            host: Dirección de escucha
+            port: Puerto
+            max_workers: Hilos para los cálculos del predictor
+            stream: SignalStream opcional; si está, /stream reenvía sus señales
+                en vez de consultar periódicamente
+        """
+        self.predictor = predictor if predictor is not None else CryptoPredictor()
+        self.host = host
+        self.port = port
+        self.stream = stream
+        
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._inflight = {}
+        self._server = None
+        self._streams = {}
+    
+    async def start(self):
+        """Calentar el predictor y empezar a escuchar"""
+        loop = asyncio.get_running_loop()
+        # Modelo y cliente del exchange cargados antes de la primera petición
+        await loop.run_in_executor(self._executor, self.predictor.warm_up)
+        await loop.run_in_executor(self._executor, self.predictor._get_exchange)
+        
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self._server
+    
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+    
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            # Cerrar los /stream abiertos: sus bucles terminan al ver la desconexión
+            streams = list(self._streams.items())
+            for writer, _ in streams:
+                writer.close()
+            await asyncio.gather(*[task for _, task in streams], return_exceptions=True)
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    async def _coalesce(self, key, func, *args):
+        """
+        Ejecutar func en el pool compartiendo el resultado entre peticiones iguales
+        
+        Args:
+            key: Identificador del cálculo
+            func: Función bloqueante del predictor
+        """
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, func, *args)
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.predictor.metrics.incr('http_coalesced')
+        
+        # shield: si un cliente se desconecta no se cancela el cálculo de los demás
+        return await asyncio.shield(future)
+    
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            while True:
+                header = await reader.readline()
+                if header in (b'\r\n', b'\n', b''):
+                    break
+            
+            parts = request_line.decode('latin-1').split()
+            if len(parts) < 2:
+                return
+            method, target = parts[0], parts[1]
+            url = urlsplit(target)
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            
+            self.predictor.metrics.incr('http_requests')
+            try:
+                if method != 'GET':
+                    raise HttpError(405, 'Solo GET')
+                if url.path == '/stream':
+                    await self._stream(reader, writer, query)
+                    return
+                stage = 'http' + url.path.replace('/', '_') if url.path in _ROUTES else 'http_other'
+                with self.predictor.metrics.span(stage):
+                    body = await self._route(url.path, query)
+                status = 200
+            except HttpError as e:
+                status, body = e.status, {'error': str(e)}
+            except Exception as e:
+                status, body = 500, {'error': str(e)}
+            
+            self._write_response(writer, status, body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    
+    async def _route(self, path, query):
+        predictor = self.predictor
+        
+        if path == '/signal':
+            symbol = self._require(query, 'symbol')
+            timeframe = self._timeframe(query)
+            return await self._coalesce(
+                ('signal', symbol, timeframe), predictor.generate_signal, symbol, timeframe
+            )
+        
+        if path == '/scan':
+            symbols = tuple(self._require(query, 'symbols').split(','))
+            timeframe = self._timeframe(query)
+            return await self._coalesce(
+                ('scan', symbols, timeframe), lambda: list(predictor.scan(symbols, timeframe))
+            )
+        
+        if path == '/stats':
+            return predictor.stats()
+        
+        if path == '/health':
+            return {'status': 'ok', 'model': predictor.model is not None}
+        
+        raise HttpError(404, f'Ruta desconocida: {path}')
+    
+    @staticmethod
+    def _require(query, name):
+        value = query.get(name)
+        if not value:
+            raise HttpError(400, f'Falta el parámetro {name}')
+        return value
+    
+    @staticmethod
+    def _timeframe(query):
+        """Parámetro timeframe ('1h' por defecto) en un formato que entiende el almacén"""
+        timeframe = query.get('timeframe', '1h')
+        try:
+            valid = timeframe_to_ms(timeframe) > 0
+        except (ValueError, IndexError):
+            valid = False
+        if not valid:
+            raise HttpError(400, f'Timeframe no soportado: {timeframe}')
+        return timeframe
+    
+    @staticmethod
+    def _positive_number(query, name, default):
+        """Parámetro numérico > 0 (un intervalo de 0 sería un bucle sin espera)"""
+        value = query.get(name)
+        if value is None:
+            return default
+        try:
+            number = float(value)
+        except ValueError:
+            raise HttpError(400, f'Parámetro {name} no numérico: {value}')
+        if not math.isfinite(number) or number <= 0:
+            raise HttpError(400, f'El parámetro {name} debe ser un número finito mayor que 0')
+        return number
+    
+    @staticmethod
+    def _write_response(writer, status, body):
+        payload = json.dumps(body, default=json_default).encode('utf-8')
+        head = (
+            f'HTTP/1.1 {status} {_REASONS.get(status, "")}\r\n'
+            'Content-Type: application/json; charset=utf-8\r\n'
+            f'Content-Length: {len(payload)}\r\n'
+            'Connection: close\r\n\r\n'
+        )
+        writer.write(head.encode('latin-1') + payload)
+    
+    async def _stream(self, reader, writer, query):
+        """Server-Sent Events: una señal por evento hasta que el cliente se desconecta"""
+        symbols = self._require(query, 'symbols').split(',')
+        timeframe = self._timeframe(query)
+        interval = self._positive_number(query, 'interval', 60.0)
+        
+        writer.write((
+            'HTTP/1.1 200 OK\r\n'
+            'Content-Type: text/event-stream\r\n'
+            'Cache-Control: no-cache\r\n'
+            'Connection: close\r\n\r\n'
+        ).encode('latin-1'))
+        await writer.drain()
+        
+        # El cliente no envía nada más: EOF en la lectura = desconexión
+        disconnected = asyncio.ensure_future(reader.read())
+        self._streams[writer] = asyncio.current_task()
+        try:
+            if self.stream is not None:
+                await self._stream_live(writer, disconnected, set(symbols), timeframe)
+            else:
+                await self._stream_poll(writer, disconnected, symbols, timeframe, interval)
+        finally:
+            self._streams.pop(writer, None)
+            disconnected.cancel()
+    
+    @staticmethod
+    async def _send_event(writer, signal):
+        writer.write(f'data: {json.dumps(signal, default=json_default)}\n\n'.encode('utf-8'))
+        await writer.drain()
+    
+    async def _stream_poll(self, writer, disconnected, symbols, timeframe, interval):
+        # Cada consulta pasa por la caché de señales y se comparte entre clientes
+        while not disconnected.done():
+            for symbol in symbols:
+                try:
+                    signal = await self._coalesce(
+                        ('signal', symbol, timeframe),
+                        self.predictor.generate_signal, symbol, timeframe
+                    )
+                except Exception as e:
+                    signal = {'symbol': symbol, 'timeframe': timeframe, 'error': str(e)}
+                await self._send_event(writer, signal)
+            await asyncio.wait([disconnected], timeout=interval)
+    
+    async def _stream_live(self, writer, disconnected, symbols, timeframe):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=256)
+        
+        def on_signal(signal):
+            if signal.get('symbol') in symbols and signal.get('timeframe') == timeframe:
+                loop.call_soon_threadsafe(self._offer, queue, signal)
+        
+        unsubscribe = self.stream.subscribe(on_signal)
+        try:
+            while not disconnected.done():
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait([getter, disconnected], return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    break
+                await self._send_event(writer, getter.result())
+        finally:
+            unsubscribe()
+    
+    @staticmethod
+    def _offer(queue, signal):
+        # Cliente lento: se descarta la señal más antigua
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(signal)
+
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Servicio de señales Crypto Predictor')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--live', default='', help='Pares a seguir por WebSocket (separados por comas)')
+    parser.add_argument('--timeframe', default='1h', help='Timeframe de --live')
+    args = parser.parse_args()
+    
+    predictor = CryptoPredictor()
+    
+    stream = None
+    if args.live:
+        from live_feed import CcxtProFeed, SignalStream
+        stream = SignalStream(predictor, CcxtProFeed(predictor.exchange_id))
+        stream.watch(args.live.split(','), args.timeframe)
+        stream.start()
+    
+    server = SignalServer(predictor, args.host, args.port, args.workers, stream)
+    
+    async def run():
+        await server.start()
+        print(f"Servicio de señales en http://{server.host}:{server.port}")
+        await server.serve_forever()
+    
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if stream is not None:
+            stream.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Barrido de parámetros de las señales en un pool de procesos
+Los indicadores se calculan una vez y se comparten con los workers por
+memoria compartida en lugar de enviar DataFrames serializados
+"""
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from backtest import DEFAULT_PARAMS, backtest
+from indicators_np import NumpyIndicators
+from shared_block import attach_block, create_block, release_block
+
+# Columnas que necesita el backtest
+SWEEP_COLUMNS = [
+    'high', 'low', 'close', 'rsi', 'ema_21', 'ema_50', 'macd', 'macd_signal',
+    'bb_lower', 'volume_ratio', 'atr',
+]
+
+# Estado de cada worker (vistas sobre la memoria compartida)
+_worker_shm = None
+_worker_cols = None
+
+
+def grid_space(space):
+    """
+    Combinaciones de una rejilla
+    
+    Args:
+        space: Diccionario {parámetro: lista de valores}
+    
+    Returns:
+        Lista de diccionarios de parámetros
+    """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*space.values())]
+
+
+def random_space(space, n_samples, seed=None):
+    """
+    Muestreo aleatorio del espacio de parámetros
+    
+    Args:
+        space: Diccionario {parámetro: (mínimo, máximo) o lista de valores}
+        n_samples: Número de combinaciones
+        seed: Semilla
+    
+    Returns:
+        Lista de diccionarios de parámetros
+    """
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(n_samples):
+        params = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                params[name] = rng.uniform(*values)
+            else:
+                params[name] = rng.choice(list(values))
+        samples.append(params)
+    return samples
+
+
+def _pack(histories):
+    """Calcular indicadores y copiarlos a un bloque de memoria compartida"""
+    engine = NumpyIndicators()
+    layout = {}
+    total = 0
+    for symbol, ohlcv in histories.items():
+        layout[symbol] = (total, len(ohlcv))
+        total += len(ohlcv)
+    
+    shape = (len(SWEEP_COLUMNS), total)
+    shm, block = create_block(shape)
+    
+    try:
+        for symbol, ohlcv in histories.items():
+            start, length = layout[symbol]
+            cols = engine.compute(ohlcv)
+            for row, name in enumerate(SWEEP_COLUMNS):
+                block[row, start:start + length] = cols[name]
+    except BaseException:
+        # Sin esto el bloque quedaría reservado hasta reiniciar
+        block = None
+        release_block(shm)
+        raise
+    
+    return shm, shape, layout
+
+
+def _views(buf, shape, layout):
+    block = np.ndarray(shape, dtype=np.float64, buffer=buf)
+    return {
+        symbol: {name: block[row, start:start + length] for row, name in enumerate(SWEEP_COLUMNS)}
+        for symbol, (start, length) in layout.items()
+    }
+
+
+def _init_worker(shm_name, shape, layout):
+    global _worker_shm, _worker_cols
+    _worker_shm, _ = attach_block(shm_name, shape)
+    _worker_cols = _views(_worker_shm.buf, shape, layout)
+
+
+def _evaluate(cols_by_symbol, params, backtest_kwargs):
+    """Backtest de unos parámetros en todos los símbolos y métricas agregadas"""
+    summaries = [
+        backtest(None, params, cols=cols, **backtest_kwargs)['summary']
+        for cols in cols_by_symbol.values()
+    ]
+    
+    trades = sum(s['trades'] for s in summaries)
+    take_profits = sum(s['take_profits'] for s in summaries)
+    pnl = sum(s['pnl'] for s in summaries)
+    
+    return dict(
+        params,
+        trades=trades,
+        hit_rate=take_profits / trades if trades else 0.0,
+        pnl=pnl,
+        avg_return=pnl / trades if trades else 0.0,
+        total_return=float(np.mean([s['total_return'] for s in summaries])),
+        max_drawdown=max(s['max_drawdown'] for s in summaries),
+    )
+
+
+def _evaluate_chunk(chunk, backtest_kwargs):
+    return [_evaluate(_worker_cols, params, backtest_kwargs) for params in chunk]
+
+
+def run_sweep(histories, param_sets, metric='total_return', workers=None,
+              chunk_size=None, min_trades=1, **backtest_kwargs):
+    """
+    Evaluar muchas combinaciones de parámetros sobre varios símbolos
+    
+    Args:
+        histories: Diccionario {symbol: ohlcv}
+        param_sets: Lista de diccionarios (grid_space / random_space)
+        metric: Columna por la que ordenar (descendente)
+        workers: Procesos (por defecto, todos los núcleos)
+        chunk_size: Combinaciones por tarea (por defecto, reparto equilibrado)
+        min_trades: Descartar combinaciones con menos operaciones
+        **backtest_kwargs: Argumentos de backtest() (max_hold, fee...)
+    
+    Returns:
+        DataFrame ordenado con parámetros y métricas
+    """
+    param_sets = list(param_sets)
+    unknown = {name for params in param_sets for name in params} - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Parámetros desconocidos: {sorted(unknown)}")
+    
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, len(param_sets) // (workers * 4))
+    
+    shm, shape, layout = _pack(histories)
+    cols = None
+    try:
+        if workers == 1:
+            cols = _views(shm.buf, shape, layout)
+            rows = [_evaluate(cols, params, backtest_kwargs) for params in param_sets]
+        else:
+            chunks = [
+                param_sets[i:i + chunk_size]
+                for i in range(0, len(param_sets), chunk_size)
+            ]
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(shm.name, shape, layout),
+            ) as executor:
+                futures = [executor.submit(_evaluate_chunk, chunk, backtest_kwargs) for chunk in chunks]
+                rows = [row for future in futures for row in future.result()]
+    finally:
+        # Las vistas deben desaparecer antes de cerrar el bloque
+        cols = None
+        release_block(shm)
+    
+    results = pd.DataFrame(rows)
+    if len(results):
+        results = results[results['trades'] >= min_trades]
+        results = results.sort_values(metric, ascending=False).reset_index(drop=True)
+    return results
@@ -0,0 +1,18 @@
+"""
+Configuración de pytest
+Los módulos de la app están en la raíz del repositorio (sin paquete)
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """Directorio de datos temporal: ninguna prueba escribe en ~/.crypto_predictor"""
+    path = tmp_path / 'data'
+    monkeypatch.setenv('CRYPTO_PREDICTOR_DATA', str(path))
+    return path
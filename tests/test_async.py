@@ -0,0 +1,97 @@
+"""API asíncrona del predictor con el exchange falso asíncrono"""
+import asyncio
+
+import numpy as np
+
+from candle_store import CandleStore
+from fake_exchange import FakeAsyncExchange, FakeExchange, synthetic_ohlcv
+from predictor_core import CryptoPredictor
+
+SYMBOLS = [f'S{i}/USDT' for i in range(12)]
+
+
+def _rows(n=600):
+    return {(symbol, '1h'): synthetic_ohlcv(n, seed=i).tolist() for i, symbol in enumerate(SYMBOLS)}
+
+
+def _predictor(tmp_path, name, exchange=None, async_exchange=None):
+    return CryptoPredictor(
+        model_path=str(tmp_path / 'model.pkl'), exchange=exchange, async_exchange=async_exchange,
+        candle_store=CandleStore(tmp_path / name),
+    )
+
+
+def test_afetch_matches_fetch(tmp_path):
+    rows = _rows()
+    sync_exchange = FakeExchange(rows)
+    async_exchange = FakeAsyncExchange(rows)
+    
+    expected = CandleStore(tmp_path / 'sync').fetch(sync_exchange, 'S0/USDT', '1h', limit=500)
+    store = CandleStore(tmp_path / 'async')
+    got = asyncio.run(store.afetch(async_exchange, 'S0/USDT', '1h', limit=500))
+    np.testing.assert_array_equal(got, expected)
+    
+    # Segunda descarga incremental, igual que la síncrona
+    last = rows[('S0/USDT', '1h')][-1][0]
+    async_exchange.calls.clear()
+    again = asyncio.run(store.afetch(async_exchange, 'S0/USDT', '1h', limit=500))
+    assert [call[2] for call in async_exchange.calls] == [last]
+    np.testing.assert_array_equal(again, expected)
+
+
+def test_agenerate_signal_matches_generate_signal(tmp_path):
+    rows = _rows()
+    expected = _predictor(tmp_path, 'sync', exchange=FakeExchange(rows)).generate_signal('S3/USDT')
+    
+    predictor = _predictor(tmp_path, 'async', async_exchange=FakeAsyncExchange(rows))
+    got = asyncio.run(predictor.agenerate_signal('S3/USDT'))
+    
+    assert 'error' not in got
+    assert dict(got) == dict(expected)
+
+
+def test_ascan_limits_concurrency_and_returns_every_symbol(tmp_path):
+    rows = _rows()
+    exchange = FakeAsyncExchange(rows, latency=0.01)
+    predictor = _predictor(tmp_path, 'async', async_exchange=exchange)
+    
+    async def collect():
+        return [signal async for signal in predictor.ascan(SYMBOLS, '1h', max_concurrency=4)]
+    
+    signals = asyncio.run(collect())
+    
+    assert sorted(signal['symbol'] for signal in signals) == sorted(SYMBOLS)
+    assert all('error' not in signal for signal in signals)
+    assert 1 < exchange.max_in_flight <= 4
+    
+    expected = _predictor(tmp_path, 'sync', exchange=FakeExchange(rows))
+    for signal in signals:
+        assert dict(signal) == dict(expected.generate_signal(signal['symbol']))
+
+
+def test_ascan_serves_cached_signals_without_fetching(tmp_path):
+    exchange = FakeAsyncExchange(_rows())
+    predictor = _predictor(tmp_path, 'async', async_exchange=exchange)
+    
+    async def collect():
+        return [signal async for signal in predictor.ascan(SYMBOLS[:3], '1h')]
+    
+    first = asyncio.run(collect())
+    calls = len(exchange.calls)
+    second = asyncio.run(collect())
+    
+    assert len(exchange.calls) == calls
+    assert sorted(s['symbol'] for s in second) == sorted(s['symbol'] for s in first)
+
+
+def test_ascan_reports_errors_per_symbol(tmp_path):
+    exchange = FakeAsyncExchange(_rows())
+    predictor = _predictor(tmp_path, 'async', async_exchange=exchange)
+    
+    async def collect():
+        return [signal async for signal in predictor.ascan(['S0/USDT', 'NOPE/USDT'], '1h')]
+    
+    signals = {signal['symbol']: signal for signal in asyncio.run(collect())}
+    
+    assert 'error' not in signals['S0/USDT']
+    assert set(signals['NOPE/USDT']) == {'symbol', 'timeframe', 'error'}
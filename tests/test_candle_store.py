@@ -0,0 +1,144 @@
+"""Descarga incremental de CandleStore contra el exchange falso"""
+import numpy as np
+
+from candle_store import CandleStore, timeframe_to_ms
+from fake_exchange import FakeExchange, synthetic_exchange, synthetic_ohlcv
+
+HOUR = timeframe_to_ms('1h')
+
+
+def _expected(exchange, symbol, limit):
+    return np.asarray(exchange.ohlcv[(symbol, '1h')][-limit:], dtype=np.float64)
+
+
+def test_first_fetch_downloads_window(tmp_path):
+    exchange = synthetic_exchange(['BTC/USDT'], n=800)
+    store = CandleStore(tmp_path)
+    
+    rows = store.fetch(exchange, 'BTC/USDT', '1h', limit=500)
+    
+    assert exchange.calls == [('BTC/USDT', '1h', None, 500)]
+    np.testing.assert_array_equal(rows, _expected(exchange, 'BTC/USDT', 500))
+
+
+def test_second_fetch_only_asks_from_last_candle(tmp_path):
+    exchange = synthetic_exchange(['BTC/USDT'], n=800)
+    store = CandleStore(tmp_path)
+    store.fetch(exchange, 'BTC/USDT', '1h', limit=500)
+    last = exchange.ohlcv[('BTC/USDT', '1h')][-1][0]
+    
+    exchange.calls.clear()
+    rows = store.fetch(exchange, 'BTC/USDT', '1h', limit=500)
+    
+    assert [call[2] for call in exchange.calls] == [last]
+    np.testing.assert_array_equal(rows, _expected(exchange, 'BTC/USDT', 500))
+
+
+def test_new_and_updated_candles_are_merged(tmp_path):
+    exchange = synthetic_exchange(['BTC/USDT'], n=800)
+    store = CandleStore(tmp_path)
+    store.fetch(exchange, 'BTC/USDT', '1h', limit=500)
+    
+    # La última vela (abierta) cambia y aparecen dos nuevas
+    last = list(exchange.ohlcv[('BTC/USDT', '1h')][-1])
+    exchange.add_candle('BTC/USDT', '1h', last[:4] + [last[4] * 1.02, last[5] * 2])
+    for i in (1, 2):
+        exchange.add_candle('BTC/USDT', '1h', [last[0] + i * HOUR, 100.0, 101.0, 99.0, 100.5, 10.0])
+    exchange.now_ms = last[0] + 2 * HOUR
+    
+    rows = store.fetch(exchange, 'BTC/USDT', '1h', limit=500)
+    
+    np.testing.assert_array_equal(rows, _expected(exchange, 'BTC/USDT', 500))
+    assert rows[-3, 4] == last[4] * 1.02
+    # Sin duplicados: un timestamp por vela
+    assert len(np.unique(rows[:, 0])) == len(rows)
+
+
+def test_short_history_is_fetched_incrementally(tmp_path):
+    # Listado reciente: el exchange tiene menos velas que la ventana
+    exchange = FakeExchange({('NEW/USDT', '1h'): synthetic_ohlcv(50).tolist()})
+    store = CandleStore(tmp_path)
+    store.fetch(exchange, 'NEW/USDT', '1h', limit=500)
+    last = exchange.ohlcv[('NEW/USDT', '1h')][-1][0]
+    
+    exchange.calls.clear()
+    rows = store.fetch(exchange, 'NEW/USDT', '1h', limit=500)
+    
+    assert [call[2] for call in exchange.calls] == [last]
+    assert len(rows) == 50
+
+
+def test_larger_limit_backfills_older_candles(tmp_path):
+    exchange = synthetic_exchange(['BTC/USDT'], n=2500)
+    store = CandleStore(tmp_path, page_limit=1000)
+    store.fetch(exchange, 'BTC/USDT', '1h', limit=100)
+    
+    exchange.calls.clear()
+    rows = store.fetch(exchange, 'BTC/USDT', '1h', limit=2000)
+    
+    # Se pide desde el inicio de la nueva ventana, no desde la última vela
+    assert exchange.calls[0][2] == exchange.ohlcv[('BTC/USDT', '1h')][-2000][0]
+    np.testing.assert_array_equal(rows, _expected(exchange, 'BTC/USDT', 2000))
+
+
+def test_fetch_after_websocket_append_backfills_window(tmp_path):
+    exchange = synthetic_exchange(['BTC/USDT'], n=800)
+    store = CandleStore(tmp_path)
+    store.append('fake', 'BTC/USDT', '1h', exchange.ohlcv[('BTC/USDT', '1h')][-1:])
+    
+    rows = store.fetch(exchange, 'BTC/USDT', '1h', limit=500)
+    
+    np.testing.assert_array_equal(rows, _expected(exchange, 'BTC/USDT', 500))
+    
+    # Con la ventana completa la siguiente descarga vuelve a ser incremental
+    exchange.calls.clear()
+    store.fetch(exchange, 'BTC/USDT', '1h', limit=500)
+    assert [call[2] for call in exchange.calls] == [exchange.ohlcv[('BTC/USDT', '1h')][-1][0]]
+
+
+def test_short_listing_after_append_is_remembered(tmp_path):
+    exchange = FakeExchange({('NEW/USDT', '1h'): synthetic_ohlcv(50).tolist()})
+    store = CandleStore(tmp_path)
+    store.append('fake', 'NEW/USDT', '1h', exchange.ohlcv[('NEW/USDT', '1h')][-1:])
+    
+    assert len(store.fetch(exchange, 'NEW/USDT', '1h', limit=500)) == 50
+    
+    # El exchange no tiene velas anteriores: no se vuelve a rellenar
+    exchange.calls.clear()
+    store.fetch(exchange, 'NEW/USDT', '1h', limit=500)
+    assert [call[2] for call in exchange.calls] == [exchange.ohlcv[('NEW/USDT', '1h')][-1][0]]
+
+
+def test_gap_larger_than_window_refetches_window(tmp_path):
+    rows = synthetic_ohlcv(1000)
+    exchange = FakeExchange({('BTC/USDT', '1h'): rows[:200].tolist()})
+    store = CandleStore(tmp_path)
+    store.fetch(exchange, 'BTC/USDT', '1h', limit=100)
+    
+    exchange = FakeExchange({('BTC/USDT', '1h'): rows.tolist()})
+    result = store.fetch(exchange, 'BTC/USDT', '1h', limit=100)
+    
+    assert exchange.calls == [('BTC/USDT', '1h', None, 100)]
+    np.testing.assert_array_equal(result, rows[-100:])
+
+
+def test_window_larger_than_page_is_paged(tmp_path):
+    exchange = synthetic_exchange(['BTC/USDT'], n=2500)
+    store = CandleStore(tmp_path, page_limit=1000)
+    
+    rows = store.fetch(exchange, 'BTC/USDT', '1h', limit=2000)
+    
+    assert len(exchange.calls) == 2
+    assert all(limit == 1000 for _, _, _, limit in exchange.calls)
+    np.testing.assert_array_equal(rows, _expected(exchange, 'BTC/USDT', 2000))
+
+
+def test_history_survives_new_store_instance(tmp_path):
+    exchange = synthetic_exchange(['BTC/USDT'], n=800)
+    CandleStore(tmp_path).fetch(exchange, 'BTC/USDT', '1h', limit=500)
+    
+    exchange.calls.clear()
+    rows = CandleStore(tmp_path).fetch(exchange, 'BTC/USDT', '1h', limit=500)
+    
+    assert exchange.calls[0][2] is not None
+    np.testing.assert_array_equal(rows, _expected(exchange, 'BTC/USDT', 500))
@@ -0,0 +1,83 @@
+"""Motor incremental de indicadores frente a la referencia en pandas"""
+import math
+
+import numpy as np
+import pytest
+
+from fake_exchange import synthetic_ohlcv
+from indicator_engine import (
+    INDICATOR_COLUMNS, StreamingIndicators, _Window, pandas_indicators, parity_report
+)
+from predictor_core import CryptoPredictor
+
+
+@pytest.fixture
+def predictor(tmp_path):
+    return CryptoPredictor(model_path=str(tmp_path / 'model.pkl'))
+
+
+@pytest.mark.parametrize('price', [1.0, 100.0, 60_000.0])
+def test_streaming_matches_pandas(predictor, price):
+    ohlcv = synthetic_ohlcv(3000, seed=3, price=price)
+    assert parity_report(ohlcv, predictor) == {}
+
+
+def test_parity_report_detects_differences(predictor):
+    ohlcv = synthetic_ohlcv(500, seed=1)
+    # Sin tolerancia, las diferencias de redondeo cuentan como error
+    errors = parity_report(ohlcv, predictor, rtol=0, atol=0)
+    assert errors
+    assert all(value < 1e-6 for value in errors.values())
+
+
+def test_repeated_timestamp_replaces_open_candle():
+    ohlcv = synthetic_ohlcv(400, seed=2)
+    clean = StreamingIndicators()
+    replayed = StreamingIndicators()
+    
+    for candle in ohlcv:
+        expected = clean.update(candle)
+        
+        # Dos versiones provisionales de la vela abierta y luego la definitiva
+        partial = candle.copy()
+        partial[4] *= 1.03
+        partial[2] = max(partial[2], partial[4])
+        replayed.update(partial)
+        replayed.update(partial * [1, 1, 1.01, 1, 1, 3])
+        got = replayed.update(candle)
+        
+        assert replayed.count == clean.count
+        for col in INDICATOR_COLUMNS:
+            assert got[col] == expected[col] or (math.isnan(got[col]) and math.isnan(expected[col]))
+
+
+def test_out_of_order_candle_is_rejected():
+    engine = StreamingIndicators()
+    ohlcv = synthetic_ohlcv(3)
+    engine.update(ohlcv[1])
+    with pytest.raises(ValueError):
+        engine.update(ohlcv[0])
+
+
+def test_window_variance_does_not_drift():
+    # Cambios bruscos de nivel con variaciones pequeñas: el peor caso de añadir/quitar
+    rng = np.random.default_rng(1)
+    values = np.concatenate([rng.normal(level, 0.01, 5000) for level in rng.uniform(1e3, 1e6, 40)])
+    
+    window = _Window(20)
+    for value in values:
+        window.update(float(value))
+    
+    expected = np.std(values[-20:], ddof=1)
+    assert window.get_std() == pytest.approx(expected, rel=1e-9)
+    assert window.get_mean() == pytest.approx(values[-20:].mean(), rel=1e-12)
+
+
+def test_long_stream_stays_close_to_pandas():
+    ohlcv = synthetic_ohlcv(50_000, seed=4, price=60_000.0)
+    engine = StreamingIndicators()
+    engine.update_many(ohlcv)
+    
+    expected = pandas_indicators(ohlcv[-200:]).iloc[-1]
+    for col in ('bb_middle', 'bb_upper', 'bb_lower', 'atr', 'volume_sma', 'volatility_20', 'rsi'):
+        assert engine.row[col] == pytest.approx(expected[col], rel=1e-7), col
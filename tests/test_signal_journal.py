@@ -0,0 +1,39 @@
+"""Escritura y consultas del diario de señales"""
+from signal_journal import SignalJournal
+from signal_record import Signal
+
+HOUR = 3_600_000
+
+
+def _signal(i, symbol='BTC/USDT', signal='HOLD'):
+    return Signal(symbol, '1h', 1_600_000_000_000 + i * HOUR, 100.0 + i, 0, 0.6, signal)
+
+
+def test_recorded_signals_are_queried_and_counted(tmp_path):
+    journal = SignalJournal(str(tmp_path / 'signals.db'), flush_interval=0.05)
+    for i in range(10):
+        journal.record(_signal(i, signal='BUY' if i % 2 else 'HOLD'))
+    journal.record(_signal(0, symbol='ETH/USDT'))
+    assert journal.flush(timeout=5)
+    
+    assert journal.count() == 11
+    assert journal.count(symbol='BTC/USDT', signal='BUY') == 5
+    assert [s.timestamp_ms for s in journal.query('BTC/USDT', limit=3)] == [
+        _signal(i).timestamp_ms for i in (7, 8, 9)
+    ]
+    journal.close()
+
+
+def test_record_after_close_is_counted_as_dropped(tmp_path):
+    path = str(tmp_path / 'signals.db')
+    journal = SignalJournal(path, flush_interval=0.05)
+    journal.record(_signal(0))
+    journal.close()
+    
+    assert journal.record(_signal(1)) is False
+    assert journal.stats()['dropped'] == 1
+    assert journal.stats()['pending'] == 0
+    
+    reopened = SignalJournal(path)
+    assert reopened.count() == 1
+    reopened.close()
@@ -0,0 +1,61 @@
+"""Validación de parámetros del servidor HTTP"""
+import asyncio
+import json
+
+import pytest
+
+from candle_store import CandleStore
+from fake_exchange import synthetic_exchange
+from predictor_core import CryptoPredictor
+from signal_server import SignalServer
+
+
+async def _get(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: test\r\n\r\n'.encode())
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    head, body = data.split(b'\r\n\r\n', 1)
+    return int(head.split()[1]), json.loads(body)
+
+
+def _request(tmp_path, path):
+    predictor = CryptoPredictor(
+        model_path=str(tmp_path / 'model.pkl'), exchange=synthetic_exchange(['BTC/USDT'], n=600),
+        candle_store=CandleStore(tmp_path / 'candles'),
+    )
+    
+    async def main():
+        server = SignalServer(predictor, port=0)
+        await server.start()
+        try:
+            return await _get(server.port, path)
+        finally:
+            await server.close()
+    
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize('path', [
+    '/signal?symbol=BTC/USDT&timeframe=1x',
+    '/signal?symbol=BTC/USDT&timeframe=h',
+    '/scan?symbols=BTC/USDT&timeframe=0h',
+    '/stream?symbols=BTC/USDT&timeframe=abc',
+])
+def test_invalid_timeframe_is_rejected(tmp_path, path):
+    status, body = _request(tmp_path, path)
+    assert status == 400
+    assert 'Timeframe' in body['error']
+
+
+def test_valid_timeframe_is_served(tmp_path):
+    status, body = _request(tmp_path, '/signal?symbol=BTC/USDT&timeframe=1h')
+    assert status == 200
+    assert body['timeframe'] == '1h'
+
+
+@pytest.mark.parametrize('interval', ['0', '-1', 'nan', 'abc'])
+def test_invalid_interval_is_rejected(tmp_path, interval):
+    status, _ = _request(tmp_path, f'/stream?symbols=BTC/USDT&interval={interval}')
+    assert status == 400
@@ -0,0 +1,583 @@
+"""
+Entrenamiento del modelo ML a partir del histórico local de velas
+Calcula las features de cada símbolo en un pool de procesos con las mismas
+funciones que la inferencia (calculate_indicators + create_features) y guarda
+model.pkl y preprocessor.pkl en el formato que carga CryptoPredictor
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+from backtest import first_touch
+from candle_store import CandleStore, default_data_dir
+from indicators_np import FEATURE_SCHEMA_VERSION, MODEL_FEATURES
+from model_store import CalibratedModel, compact_dir_for, export_compact
+from predictor_core import CryptoPredictor
+
+try:
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import brier_score_loss, log_loss, roc_auc_score
+    from sklearn.preprocessing import StandardScaler
+    SKLEARN_AVAILABLE = True
+except:
+    SKLEARN_AVAILABLE = False
+
+TRAINING_FORMAT_VERSION = 1
+FEATURE_CACHE_VERSION = 1
+
+DEFAULT_SYMBOLS = ['BTC/USDT', 'ETH/USDT', 'BNB/USDT', 'SOL/USDT', 'ADA/USDT', 'MATIC/USDT']
+
+# Etiqueta: el TP se toca antes que el SL, con los niveles de _build_signal
+STOP_ATR = 2.0
+TARGET_ATR = 4.0
+DEFAULT_MAX_HOLD = 48
+
+# Velas iniciales descartadas mientras se estabilizan los indicadores (EMA 50)
+WARMUP = 50
+
+# Umbral de confianza con el que se evalúa el modelo (min_confidence del predictor)
+SIGNAL_THRESHOLD = 0.70
+
+# Predictor de cada proceso, solo para calcular indicadores y features
+_predictor = None
+
+
+def _feature_predictor():
+    global _predictor
+    if _predictor is None:
+        _predictor = CryptoPredictor(model_path=os.devnull)
+    return _predictor
+
+
+def label_candles(high, low, close, atr, max_hold=DEFAULT_MAX_HOLD):
+    """
+    Etiquetar cada vela como entrada: 1 si el TP (+4 ATR) llega antes que el
+    SL (-2 ATR) en max_hold velas, 0 si no
+    
+    Args:
+        high, low, close, atr: Arrays de la serie
+        max_hold: Velas máximas en posición
+    
+    Returns:
+        Array float con 1.0 / 0.0, NaN donde no hay ATR o faltan velas futuras
+    """
+    n = len(close)
+    labels = np.full(n, np.nan)
+    
+    entries = np.flatnonzero(np.isfinite(atr) & (atr > 0) & (np.arange(n) + max_hold < n))
+    if len(entries):
+        price = close[entries]
+        _, _, outcome = first_touch(
+            high, low, close, entries,
+            price - STOP_ATR * atr[entries], price + TARGET_ATR * atr[entries], max_hold
+        )
+        labels[entries] = outcome == 1
+    
+    return labels
+
+
+def symbol_features(ohlcv, max_hold=DEFAULT_MAX_HOLD):
+    """
+    Features y etiquetas de un símbolo (se ejecuta en los workers)
+    
+    Args:
+        ohlcv: Array (n, 6) de velas
+        max_hold: Velas máximas en posición para la etiqueta
+    
+    Returns:
+        Tupla (timestamps int64, X (m, n_features), y int8) con las filas
+        completas
+    """
+    ohlcv = np.asarray(ohlcv, dtype=np.float64)
+    predictor = _feature_predictor()
+    df = predictor._ohlcv_to_frame(ohlcv)
+    df = predictor.create_features(predictor.calculate_indicators(df))
+    
+    X = df[MODEL_FEATURES].to_numpy(dtype=np.float64)
+    labels = label_candles(
+        ohlcv[:, 2], ohlcv[:, 3], ohlcv[:, 4], df['atr'].to_numpy(dtype=np.float64), max_hold
+    )
+    
+    keep = np.isfinite(X).all(axis=1) & ~np.isnan(labels)
+    keep[:WARMUP] = False
+    
+    return ohlcv[keep, 0].astype(np.int64), X[keep], labels[keep].astype(np.int8)
+
+
+class FeatureCache:
+    """
+    Matrices de features y etiquetas por símbolo guardadas en disco
+    
+    La clave es un hash del contenido de las velas y de la configuración
+    (esquema de features, etiqueta): si algo cambia se recalcula. Cambios en
+    el cálculo de los indicadores deben subir FEATURE_SCHEMA_VERSION.
+    """
+    
+    def __init__(self, directory=None):
+        """
+        Args:
+            directory: Directorio de la caché (por defecto, junto al histórico)
+        """
+        self.directory = directory or os.path.join(default_data_dir(), 'features')
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def key(ohlcv, max_hold=DEFAULT_MAX_HOLD):
+        """Hash de las velas y de todo lo que determina las features"""
+        config = {
+            'cache': FEATURE_CACHE_VERSION,
+            'schema': FEATURE_SCHEMA_VERSION,
+            'features': MODEL_FEATURES,
+            'max_hold': max_hold,
+            'stop_atr': STOP_ATR,
+            'target_atr': TARGET_ATR,
+            'warmup': WARMUP,
+        }
+        digest = hashlib.sha256(json.dumps(config, sort_keys=True).encode())
+        digest.update(np.ascontiguousarray(ohlcv, dtype=np.float64).tobytes())
+        return digest.hexdigest()[:32]
+    
+    def _path(self, name, key):
+        return os.path.join(self.directory, f"{name.replace('/', '-')}_{key}.npz")
+    
+    def get(self, name, key):
+        """
+        Leer una entrada
+        
+        Returns:
+            Tupla (timestamps, X, y) como symbol_features, o None si no está
+        """
+        try:
+            with np.load(self._path(name, key)) as data:
+                parts = data['timestamp'], data['X'], data['y']
+        except (OSError, KeyError, ValueError):
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        return parts
+    
+    def put(self, name, key, parts):
+        """Guardar una entrada y borrar las anteriores del mismo nombre"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(name, key)
+        
+        timestamps, X, y = parts
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, timestamp=timestamps, X=X, y=y)
+        os.replace(tmp_path, path)
+        
+        # El histórico crece y cambia la clave: solo se conserva la última
+        for old in glob.glob(self._path(name, '*')):
+            if old != path and len(os.path.basename(old)) == len(os.path.basename(path)):
+                os.remove(old)
+
+
+def build_dataset(histories, max_hold=DEFAULT_MAX_HOLD, workers=None, cache=None, timeframe=None):
+    """
+    Dataset etiquetado de varios símbolos, calculado en paralelo
+    
+    Args:
+        histories: Diccionario {symbol: ohlcv}
+        max_hold: Velas máximas en posición para la etiqueta
+        workers: Procesos (por defecto, todos los núcleos; 1 = sin pool)
+        cache: FeatureCache (opcional); solo se calculan los símbolos que
+            no estén en ella
+        timeframe: Timeframe de las velas (nombre de las entradas de la caché)
+    
+    Returns:
+        DataFrame con las columnas MODEL_FEATURES, 'target', 'timestamp' y
+        'symbol', ordenado por tiempo
+    """
+    symbols = list(histories)
+    parts = {}
+    keys = {}
+    names = {symbol: f'{symbol}_{timeframe}' if timeframe else symbol for symbol in symbols}
+    
+    if cache is not None:
+        for symbol in symbols:
+            keys[symbol] = cache.key(histories[symbol], max_hold)
+            cached = cache.get(names[symbol], keys[symbol])
+            if cached is not None:
+                parts[symbol] = cached
+    
+    pending = [symbol for symbol in symbols if symbol not in parts]
+    workers = min(workers or os.cpu_count() or 1, max(1, len(pending)))
+    
+    if workers == 1:
+        computed = [symbol_features(histories[symbol], max_hold) for symbol in pending]
+    else:
+        # Solo viajan arrays NumPy entre procesos
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            computed = list(executor.map(
+                symbol_features, [histories[symbol] for symbol in pending], [max_hold] * len(pending)
+            ))
+    
+    for symbol, result in zip(pending, computed):
+        parts[symbol] = result
+        if cache is not None:
+            cache.put(names[symbol], keys[symbol], result)
+    
+    frames = []
+    for symbol in symbols:
+        timestamps, X, y = parts[symbol]
+        frame = pd.DataFrame(X, columns=MODEL_FEATURES)
+        frame['target'] = y
+        frame['timestamp'] = timestamps
+        frame['symbol'] = symbol
+        frames.append(frame)
+    
+    if not frames:
+        return pd.DataFrame(columns=MODEL_FEATURES + ['target', 'timestamp', 'symbol'])
+    
+    dataset = pd.concat(frames, ignore_index=True)
+    return dataset.sort_values(['timestamp', 'symbol'], kind='stable').reset_index(drop=True)
+
+
+def load_histories(symbols, timeframe='1h', exchange_id='binance', candle_store=None,
+                   start=None, end=None, min_candles=500):
+    """
+    Leer del histórico local las velas de varios símbolos
+    
+    Args:
+        symbols: Lista de pares
+        timeframe: Timeframe
+        exchange_id: Exchange del histórico
+        candle_store: Almacén de velas (por defecto, el local)
+        start, end: Rango en ms (opcional)
+        min_candles: Símbolos con menos velas se omiten
+    
+    Returns:
+        Diccionario {symbol: ohlcv}
+    """
+    candle_store = candle_store if candle_store is not None else CandleStore()
+    histories = {}
+    for symbol in symbols:
+        ohlcv = candle_store.load(exchange_id, symbol, timeframe, start, end)
+        if len(ohlcv) < min_candles:
+            print(f"Omitido {symbol} {timeframe}: {len(ohlcv)} velas (mínimo {min_candles})")
+            continue
+        histories[symbol] = ohlcv
+    return histories
+
+
+def time_split(timestamps, holdout=0.2, gap=DEFAULT_MAX_HOLD):
+    """
+    División temporal entrenamiento / validación con purga
+    
+    Se descartan las `gap` marcas de tiempo anteriores al corte: sus
+    etiquetas miran velas que ya están en validación.
+    
+    Args:
+        timestamps: Array de timestamps de las filas
+        holdout: Fracción final (por marcas de tiempo) para validación
+        gap: Marcas de tiempo purgadas antes del corte
+    
+    Returns:
+        Tupla (máscara de entrenamiento, máscara de validación)
+    """
+    times = np.unique(timestamps)
+    cut = min(len(times) - 1, max(1, int(len(times) * (1 - holdout))))
+    train_end = times[max(0, cut - gap)]
+    return timestamps < train_end, timestamps >= times[cut]
+
+
+def _base_model(model_type, seed, n_jobs):
+    if model_type == 'forest':
+        return RandomForestClassifier(
+            n_estimators=200, max_depth=8, min_samples_leaf=50, random_state=seed, n_jobs=n_jobs
+        )
+    if model_type == 'logistic':
+        return LogisticRegression(max_iter=1000)
+    raise ValueError(f"Tipo de modelo desconocido: {model_type}")
+
+
+def fit_sigmoid(p, y):
+    """
+    Calibración de Platt: coeficientes (a, b) de 1 / (1 + exp(-(a * p + b)))
+    
+    Returns:
+        Tupla (a, b), o None si y tiene una sola clase
+    """
+    if len(np.unique(y)) < 2:
+        return None
+    calibrator = LogisticRegression(C=1e6, max_iter=1000)
+    calibrator.fit(np.asarray(p).reshape(-1, 1), y)
+    return float(calibrator.coef_[0, 0]), float(calibrator.intercept_[0])
+
+
+def evaluate_probabilities(y, p, threshold=SIGNAL_THRESHOLD):
+    """
+    Métricas de unas probabilidades de la clase 1
+    
+    Returns:
+        Diccionario con brier, log_loss, auc, tasa base y, por encima del
+        umbral, número de señales, acierto y probabilidad media
+    """
+    y = np.asarray(y)
+    p = np.clip(np.asarray(p, dtype=np.float64), 1e-12, 1 - 1e-12)
+    above = p >= threshold
+    
+    both_classes = len(np.unique(y)) == 2
+    return {
+        'rows': int(len(y)),
+        'base_rate': float(y.mean()) if len(y) else None,
+        'brier': float(brier_score_loss(y, p)) if len(y) else None,
+        'log_loss': float(log_loss(y, p, labels=[0, 1])) if len(y) else None,
+        'auc': float(roc_auc_score(y, p)) if both_classes else None,
+        'threshold': threshold,
+        'signals': int(above.sum()),
+        'signal_hit_rate': float(y[above].mean()) if above.any() else None,
+        'signal_mean_proba': float(p[above].mean()) if above.any() else None,
+    }
+
+
+def fit_model(dataset, model_type='forest', holdout=0.2, max_hold=DEFAULT_MAX_HOLD,
+              seed=0, n_jobs=1):
+    """
+    Entrenar y calibrar el modelo
+    
+    El modelo base se entrena con la parte antigua del dataset. La parte
+    final se divide en dos: la primera ajusta la calibración sigmoide y la
+    segunda solo se usa para las métricas del informe. Cada tramo va
+    separado del anterior por un hueco de max_hold velas para que las
+    etiquetas no se solapen. Una calibración con pendiente <= 0 invertiría
+    el orden del modelo y se descarta.
+    
+    Args:
+        dataset: DataFrame de build_dataset
+        model_type: 'forest' (RandomForest) o 'logistic'
+        holdout: Fracción final usada para calibrar (primera mitad) y validar
+            (segunda mitad)
+        max_hold: Velas del horizonte de la etiqueta (hueco de purga)
+        seed: Semilla
+        n_jobs: Hilos de sklearn
+    
+    Returns:
+        Tupla (model, preprocessor, report)
+    """
+    if not SKLEARN_AVAILABLE:
+        raise RuntimeError("Entrenar requiere scikit-learn y joblib")
+    
+    timestamps = dataset['timestamp'].to_numpy()
+    train, held_out = time_split(timestamps, holdout, max_hold)
+    
+    # Calibrar y medir en tramos distintos: medir donde se calibra da
+    # métricas optimistas
+    calib = np.zeros(len(dataset), dtype=bool)
+    valid = np.zeros(len(dataset), dtype=bool)
+    held_rows = np.flatnonzero(held_out)
+    if len(held_rows):
+        calib_part, valid_part = time_split(timestamps[held_rows], 0.5, max_hold)
+        calib[held_rows[calib_part]] = True
+        valid[held_rows[valid_part]] = True
+    
+    X_train = dataset.loc[train, MODEL_FEATURES]
+    X_calib = dataset.loc[calib, MODEL_FEATURES]
+    X_valid = dataset.loc[valid, MODEL_FEATURES]
+    y_train = dataset.loc[train, 'target'].to_numpy()
+    y_calib = dataset.loc[calib, 'target'].to_numpy()
+    y_valid = dataset.loc[valid, 'target'].to_numpy()
+    
+    if len(np.unique(y_train)) < 2:
+        raise ValueError("El conjunto de entrenamiento tiene una sola clase")
+    
+    # Ajustado sobre un DataFrame, como lo usa _ml_predict_matrix
+    preprocessor = StandardScaler().fit(X_train)
+    
+    base = _base_model(model_type, seed, n_jobs)
+    base.fit(preprocessor.transform(X_train), y_train)
+    
+    def raw_proba(X):
+        return base.predict_proba(preprocessor.transform(X))[:, 1] if len(X) else np.empty(0)
+    
+    coefficients = fit_sigmoid(raw_proba(X_calib), y_calib)
+    skipped = None
+    if coefficients is None:
+        skipped = 'Tramo de calibración vacío o con una sola clase'
+    elif coefficients[0] <= 0:
+        skipped = f'Pendiente {coefficients[0]:.4g} <= 0: invertiría el orden del modelo'
+        coefficients = None
+    model = CalibratedModel(base, *coefficients) if coefficients else base
+    
+    raw = raw_proba(X_valid)
+    calibrated = model.predict_proba(preprocessor.transform(X_valid))[:, 1] if len(X_valid) else raw
+    
+    report = {
+        'model_type': model_type,
+        'train_rows': int(train.sum()),
+        'calibration_rows': int(calib.sum()),
+        'validation_rows': int(valid.sum()),
+        'calibration': coefficients,
+        'calibration_skipped': skipped,
+        'validation_raw': evaluate_probabilities(y_valid, raw),
+        'validation': evaluate_probabilities(y_valid, calibrated),
+    }
+    return model, preprocessor, report
+
+
+def _dump(obj, path):
+    # Escritura atómica: un predictor que cargue a la vez nunca ve medio archivo
+    tmp_path = path + '.tmp'
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_artifacts(model, preprocessor, directory, report=None, compact=None):
+    """
+    Guardar model.pkl y preprocessor.pkl con el formato de CryptoPredictor
+    
+    Args:
+        model: Modelo entrenado
+        preprocessor: Preprocesador entrenado
+        directory: Directorio de destino
+        report: Resumen del entrenamiento guardado junto al modelo (opcional)
+        compact: Exportar también el formato compacto (por defecto, solo si
+            ya existía uno: si no se actualiza, el predictor cargaría el viejo)
+    
+    Returns:
+        Ruta de model.pkl
+    """
+    os.makedirs(directory, exist_ok=True)
+    model_path = os.path.join(directory, 'model.pkl')
+    compact_dir = compact_dir_for(model_path)
+    if compact is None:
+        compact = os.path.exists(os.path.join(compact_dir, 'meta.json'))
+    
+    _dump(preprocessor, os.path.join(directory, 'preprocessor.pkl'))
+    _dump({
+        'model': model,
+        'feature_names': list(MODEL_FEATURES),
+        'feature_schema': FEATURE_SCHEMA_VERSION,
+        'training': report,
+    }, model_path)
+    
+    if compact:
+        export_compact(model, MODEL_FEATURES, compact_dir, preprocessor, FEATURE_SCHEMA_VERSION)
+    
+    return model_path
+
+
+def train(histories, directory, timeframe='1h', model_type='forest', holdout=0.2,
+          max_hold=DEFAULT_MAX_HOLD, workers=None, seed=0, compact=None, cache=None):
+    """
+    Pipeline completo: dataset en paralelo, entrenamiento, calibración y guardado
+    
+    Args:
+        histories: Diccionario {symbol: ohlcv} (ver load_histories)
+        directory: Directorio donde guardar los artefactos
+        timeframe: Timeframe de las velas (solo informativo)
+        model_type, holdout, max_hold, seed: Ver fit_model
+        workers: Procesos para las features
+        compact: Ver save_artifacts
+        cache: FeatureCache (opcional)
+    
+    Returns:
+        Diccionario con el resumen del entrenamiento
+    """
+    start = time.perf_counter()
+    dataset = build_dataset(histories, max_hold, workers, cache, timeframe)
+    features_s = time.perf_counter() - start
+    if dataset.empty:
+        raise ValueError("Sin filas para entrenar")
+    
+    start = time.perf_counter()
+    model, preprocessor, fit_report = fit_model(dataset, model_type, holdout, max_hold, seed)
+    fit_s = time.perf_counter() - start
+    
+    report = {
+        'format_version': TRAINING_FORMAT_VERSION,
+        'feature_schema': FEATURE_SCHEMA_VERSION,
+        'features': list(MODEL_FEATURES),
+        'trained_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'timeframe': timeframe,
+        'symbols': list(histories),
+        'rows': int(len(dataset)),
+        'positive_rate': float(dataset['target'].mean()),
+        'max_hold': max_hold,
+        'features_s': round(features_s, 3),
+        'fit_s': round(fit_s, 3),
+    }
+    report.update(fit_report)
+    report['model_path'] = save_artifacts(model, preprocessor, directory, report, compact)
+    return report
+
+
+def add_data_arguments(parser):
+    """Argumentos de línea de comandos para elegir el histórico (ver histories_from_args)"""
+    parser.add_argument('--symbols', default=','.join(DEFAULT_SYMBOLS), help="Pares separados por comas")
+    parser.add_argument('--timeframe', default='1h')
+    parser.add_argument('--exchange', default='binance', help="Exchange del histórico local")
+    parser.add_argument('--download', type=int, default=0, metavar='N',
+                        help="Descargar antes hasta N velas por símbolo")
+    parser.add_argument('--synthetic', type=int, default=0, metavar='N',
+                        help="Usar N velas sintéticas por símbolo (sin red)")
+    parser.add_argument('--max-hold', type=int, default=DEFAULT_MAX_HOLD)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-cache', action='store_true', help="Recalcular las features aunque estén en caché")
+
+
+def histories_from_args(args):
+    """
+    Velas indicadas por add_data_arguments
+    
+    Returns:
+        Diccionario {symbol: ohlcv}
+    """
+    symbols = [symbol.strip() for symbol in args.symbols.split(',') if symbol.strip()]
+    
+    if args.synthetic:
+        from fake_exchange import synthetic_ohlcv
+        return {
+            symbol: synthetic_ohlcv(args.synthetic, seed=args.seed + i, timeframe=args.timeframe)
+            for i, symbol in enumerate(symbols)
+        }
+    
+    candle_store = CandleStore(max_candles=None)
+    if args.download:
+        predictor = CryptoPredictor(candle_store=candle_store, exchange_id=args.exchange)
+        for symbol in symbols:
+            try:
+                predictor.fetch_ohlcv(symbol, args.timeframe, limit=args.download)
+            except Exception as e:
+                print(f"Error descargando {symbol}: {e}")
+    return load_histories(symbols, args.timeframe, args.exchange, candle_store)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entrenar model.pkl desde el histórico local")
+    add_data_arguments(parser)
+    parser.add_argument('--model', choices=('forest', 'logistic'), default='forest')
+    parser.add_argument('--holdout', type=float, default=0.2, help="Fracción final para calibrar y validar")
+    parser.add_argument('--compact', action='store_true', help="Exportar también el formato compacto")
+    parser.add_argument('--output', default=os.path.dirname(os.path.abspath(__file__)),
+                        help="Directorio de model.pkl y preprocessor.pkl")
+    args = parser.parse_args(argv)
+    
+    histories = histories_from_args(args)
+    if not histories:
+        print("Sin histórico suficiente (usa --download N o --synthetic N)")
+        return 1
+    
+    report = train(
+        histories, args.output, args.timeframe, args.model, args.holdout,
+        args.max_hold, args.workers, args.seed, args.compact or None,
+        None if args.no_cache else FeatureCache()
+    )
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
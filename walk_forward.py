@@ -0,0 +1,376 @@
+"""
+Validación walk-forward y purged K-fold del modelo ML
+Las features se calculan una vez por símbolo y timeframe (caché en disco de
+train_pipeline) y los folds se entrenan en paralelo leyendo el dataset de un
+bloque de memoria compartida
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from indicators_np import MODEL_FEATURES
+from model_store import CalibratedModel
+from shared_block import attach_block, create_block, release_block
+from train_pipeline import (
+    DEFAULT_MAX_HOLD, SIGNAL_THRESHOLD, FeatureCache, add_data_arguments,
+    build_dataset, evaluate_probabilities, fit_model, histories_from_args
+)
+
+SCHEMES = ('walk_forward', 'purged_kfold')
+
+# Columnas del bloque compartido: features, objetivo y timestamp
+_N_FEATURES = len(MODEL_FEATURES)
+
+# Estado de cada worker (vista sobre la memoria compartida)
+_worker_shm = None
+_worker_block = None
+
+
+def walk_forward_splits(timestamps, n_folds=5, gap=DEFAULT_MAX_HOLD, test_fraction=0.5,
+                        train_window=None):
+    """
+    Folds walk-forward: se entrena con el pasado y se prueba en el bloque siguiente
+    
+    La parte final del histórico (test_fraction) se divide en n_folds
+    bloques consecutivos. Entre el entrenamiento y cada bloque se purgan
+    `gap` marcas de tiempo, cuyas etiquetas miran dentro del bloque.
+    
+    Args:
+        timestamps: Array de timestamps de las filas
+        n_folds: Número de bloques de prueba
+        gap: Marcas de tiempo purgadas antes de cada bloque
+        test_fraction: Fracción final del histórico repartida entre los bloques
+        train_window: Marcas de tiempo de entrenamiento (por defecto, todo el
+            pasado: ventana creciente)
+    
+    Returns:
+        Lista de tuplas (máscara de entrenamiento, máscara de prueba)
+    """
+    times = np.unique(timestamps)
+    first_test = int(len(times) * (1 - test_fraction))
+    bounds = np.linspace(first_test, len(times), n_folds + 1).astype(int)
+    
+    splits = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        train_end = start - gap
+        if train_end <= 0 or end <= start:
+            continue
+        train_start = max(0, train_end - train_window) if train_window else 0
+        train = (timestamps >= times[train_start]) & (timestamps < times[train_end])
+        test = (timestamps >= times[start]) & (timestamps <= times[end - 1])
+        splits.append((train, test))
+    return splits
+
+
+def purged_kfold_splits(timestamps, n_folds=5, gap=DEFAULT_MAX_HOLD, embargo=None):
+    """
+    K-fold por bloques de tiempo con purga y embargo
+    
+    Cada bloque se prueba con un modelo entrenado en el resto, quitando las
+    `gap` marcas de tiempo anteriores al bloque (sus etiquetas lo solapan) y
+    las `embargo` posteriores (correlación serie).
+    
+    Args:
+        timestamps: Array de timestamps de las filas
+        n_folds: Número de bloques
+        gap: Marcas de tiempo purgadas antes de cada bloque
+        embargo: Marcas de tiempo excluidas tras cada bloque (por defecto, gap)
+    
+    Returns:
+        Lista de tuplas (máscara de entrenamiento, máscara de prueba)
+    """
+    embargo = gap if embargo is None else embargo
+    times = np.unique(timestamps)
+    bounds = np.linspace(0, len(times), n_folds + 1).astype(int)
+    
+    splits = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        if end <= start:
+            continue
+        test = (timestamps >= times[start]) & (timestamps <= times[end - 1])
+        excluded_from = times[max(0, start - gap)]
+        excluded_to = times[min(len(times) - 1, end - 1 + embargo)]
+        train = (timestamps < excluded_from) | (timestamps > excluded_to)
+        splits.append((train, test))
+    return splits
+
+
+def calibration_table(y, p, bins=10):
+    """
+    Fiabilidad de las probabilidades por tramos
+    
+    Args:
+        y: Etiquetas 0/1
+        p: Probabilidades de la clase 1
+        bins: Tramos de igual anchura en [0, 1]
+    
+    Returns:
+        Tupla (lista de tramos {'low', 'high', 'count', 'mean_proba',
+        'hit_rate'}, error de calibración esperado ECE)
+    """
+    y = np.asarray(y, dtype=np.float64)
+    p = np.asarray(p, dtype=np.float64)
+    edges = np.linspace(0, 1, bins + 1)
+    index = np.clip(np.searchsorted(edges, p, side='right') - 1, 0, bins - 1)
+    
+    table = []
+    ece = 0.0
+    for b in range(bins):
+        in_bin = index == b
+        count = int(in_bin.sum())
+        row = {'low': float(edges[b]), 'high': float(edges[b + 1]), 'count': count,
+               'mean_proba': None, 'hit_rate': None}
+        if count:
+            row['mean_proba'] = float(p[in_bin].mean())
+            row['hit_rate'] = float(y[in_bin].mean())
+            ece += count / len(p) * abs(row['mean_proba'] - row['hit_rate'])
+        table.append(row)
+    
+    return table, float(ece) if len(p) else None
+
+
+def _pack(dataset):
+    """Copiar features, objetivo y timestamps a un bloque de memoria compartida"""
+    shape = (len(dataset), _N_FEATURES + 2)
+    shm, block = create_block(shape)
+    try:
+        block[:, :_N_FEATURES] = dataset[MODEL_FEATURES].to_numpy(dtype=np.float64)
+        block[:, _N_FEATURES] = dataset['target'].to_numpy()
+        # Los timestamps en ms caben sin pérdida en float64 (< 2**53)
+        block[:, _N_FEATURES + 1] = dataset['timestamp'].to_numpy()
+    except BaseException:
+        block = None
+        release_block(shm)
+        raise
+    return shm, shape
+
+
+def _init_worker(shm_name, shape):
+    global _worker_shm, _worker_block
+    _worker_shm, _worker_block = attach_block(shm_name, shape)
+
+
+def _frame(block, mask):
+    rows = block[mask]
+    frame = pd.DataFrame(rows[:, :_N_FEATURES], columns=MODEL_FEATURES)
+    frame['target'] = rows[:, _N_FEATURES].astype(np.int8)
+    frame['timestamp'] = rows[:, _N_FEATURES + 1].astype(np.int64)
+    return frame
+
+
+def _run_fold(block, fold, train, test, model_type, holdout, max_hold, seed):
+    """
+    Entrenar (con calibración) en train y predecir test
+    
+    Returns:
+        Diccionario con el resumen del fold y las probabilidades de prueba
+    """
+    start = time.perf_counter()
+    result = {'fold': fold, 'train_rows': int(train.sum()), 'test_rows': int(test.sum())}
+    
+    try:
+        model, preprocessor, fit_report = fit_model(
+            _frame(block, train), model_type, holdout, max_hold, seed
+        )
+    except ValueError as e:
+        result['error'] = str(e)
+        return result
+    
+    test_frame = _frame(block, test)
+    X_test = preprocessor.transform(test_frame[MODEL_FEATURES])
+    y = test_frame['target'].to_numpy()
+    
+    base = model.model if isinstance(model, CalibratedModel) else model
+    raw = base.predict_proba(X_test)[:, 1]
+    proba = model.predict_proba(X_test)[:, 1]
+    
+    result.update(
+        test_start=int(test_frame['timestamp'].iloc[0]) if len(test_frame) else None,
+        test_end=int(test_frame['timestamp'].iloc[-1]) if len(test_frame) else None,
+        calibration=fit_report['calibration'],
+        metrics=evaluate_probabilities(y, proba),
+        fit_s=round(time.perf_counter() - start, 3),
+        y=y,
+        raw=raw,
+        proba=proba,
+    )
+    return result
+
+
+def _run_fold_worker(fold, train, test, model_type, holdout, max_hold, seed):
+    return _run_fold(_worker_block, fold, train, test, model_type, holdout, max_hold, seed)
+
+
+def validate(histories, timeframe='1h', scheme='walk_forward', n_folds=5, model_type='forest',
+             holdout=0.2, max_hold=DEFAULT_MAX_HOLD, workers=None, seed=0, cache=None,
+             threshold=SIGNAL_THRESHOLD, **split_kwargs):
+    """
+    Validar el pipeline de entrenamiento fuera de muestra
+    
+    Args:
+        histories: Diccionario {symbol: ohlcv}
+        timeframe: Timeframe de las velas
+        scheme: 'walk_forward' o 'purged_kfold'
+        n_folds: Número de folds
+        model_type, holdout, seed: Ver train_pipeline.fit_model
+        max_hold: Horizonte de la etiqueta (también la purga entre folds)
+        workers: Procesos para features y folds (por defecto, todos los núcleos)
+        cache: FeatureCache (opcional; sin ella se recalculan las features)
+        threshold: Confianza mínima de las señales (min_confidence)
+        **split_kwargs: Argumentos del generador de folds (test_fraction,
+            train_window, embargo)
+    
+    Returns:
+        Diccionario con los folds, las métricas fuera de muestra agregadas y
+        la calibración frente al umbral
+    """
+    if scheme not in SCHEMES:
+        raise ValueError(f"Esquema desconocido: {scheme} (usa {', '.join(SCHEMES)})")
+    
+    start = time.perf_counter()
+    hits = cache.hits if cache is not None else 0
+    dataset = build_dataset(histories, max_hold, workers, cache, timeframe)
+    features_s = time.perf_counter() - start
+    if dataset.empty:
+        raise ValueError("Sin filas para validar")
+    
+    timestamps = dataset['timestamp'].to_numpy()
+    if scheme == 'walk_forward':
+        splits = walk_forward_splits(timestamps, n_folds, max_hold, **split_kwargs)
+    else:
+        splits = purged_kfold_splits(timestamps, n_folds, max_hold, **split_kwargs)
+    
+    start = time.perf_counter()
+    args = [(fold, train, test, model_type, holdout, max_hold, seed)
+            for fold, (train, test) in enumerate(splits)]
+    workers = min(workers or os.cpu_count() or 1, max(1, len(args)))
+    
+    shm, shape = _pack(dataset)
+    block = None
+    try:
+        if workers == 1:
+            block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+            folds = [_run_fold(block, *fold_args) for fold_args in args]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(shm.name, shape),
+            ) as executor:
+                futures = [executor.submit(_run_fold_worker, *fold_args) for fold_args in args]
+                folds = [future.result() for future in futures]
+    finally:
+        # Las vistas deben desaparecer antes de cerrar el bloque
+        block = None
+        release_block(shm)
+    folds_s = time.perf_counter() - start
+    
+    # Predicciones fuera de muestra de todos los folds
+    scored = [fold for fold in folds if 'proba' in fold]
+    y = np.concatenate([fold.pop('y') for fold in scored]) if scored else np.empty(0)
+    raw = np.concatenate([fold.pop('raw') for fold in scored]) if scored else np.empty(0)
+    proba = np.concatenate([fold.pop('proba') for fold in scored]) if scored else np.empty(0)
+    
+    table, ece = calibration_table(y, proba)
+    _, raw_ece = calibration_table(y, raw)
+    metrics = evaluate_probabilities(y, proba, threshold) if len(y) else None
+    
+    return {
+        'scheme': scheme,
+        'model_type': model_type,
+        'timeframe': timeframe,
+        'symbols': list(histories),
+        'rows': int(len(dataset)),
+        'max_hold': max_hold,
+        'feature_cache_hits': (cache.hits - hits) if cache is not None else 0,
+        'features_s': round(features_s, 3),
+        'folds_s': round(folds_s, 3),
+        'folds': folds,
+        'out_of_sample': metrics,
+        'out_of_sample_raw': evaluate_probabilities(y, raw, threshold) if len(y) else None,
+        'ece': ece,
+        'ece_raw': raw_ece,
+        'calibration_table': table,
+    }
+
+
+def format_report(report):
+    """Texto legible del informe de validación"""
+    lines = [
+        f"{report['scheme']} {report['model_type']} {report['timeframe']}: "
+        f"{report['rows']} filas, {len(report['symbols'])} símbolos "
+        f"(features {report['features_s']:.1f} s, caché {report['feature_cache_hits']}; "
+        f"folds {report['folds_s']:.1f} s)",
+        f"{'fold':>4} {'train':>8} {'test':>7} {'auc':>6} {'brier':>6} {'señales':>8} {'acierto':>8}",
+    ]
+    for fold in report['folds']:
+        if 'error' in fold:
+            lines.append(f"{fold['fold']:>4} {fold['train_rows']:>8} {fold['test_rows']:>7}  {fold['error']}")
+            continue
+        m = fold['metrics']
+        lines.append(
+            f"{fold['fold']:>4} {fold['train_rows']:>8} {fold['test_rows']:>7} "
+            f"{_fmt(m['auc'])} {_fmt(m['brier'])} {m['signals']:>8} {_fmt(m['signal_hit_rate'], 8)}"
+        )
+    
+    m = report['out_of_sample']
+    if m:
+        lines.append(
+            f"Fuera de muestra: auc {_fmt(m['auc'], 0)}, brier {_fmt(m['brier'], 0)}, "
+            f"ECE {_fmt(report['ece'], 0)} (sin calibrar {_fmt(report['ece_raw'], 0)})"
+        )
+        lines.append(
+            f"Umbral {m['threshold']:.2f}: {m['signals']} señales, acierto "
+            f"{_fmt(m['signal_hit_rate'], 0)} frente a confianza media "
+            f"{_fmt(m['signal_mean_proba'], 0)} (tasa base {_fmt(m['base_rate'], 0)})"
+        )
+    lines.append(f"{'tramo':>9} {'filas':>7} {'prob':>6} {'acierto':>8}")
+    for row in report['calibration_table']:
+        if row['count']:
+            lines.append(
+                f"{row['low']:.1f}-{row['high']:.1f} {row['count']:>7} "
+                f"{row['mean_proba']:6.3f} {row['hit_rate']:8.3f}"
+            )
+    return '\n'.join(lines)
+
+
+def _fmt(value, width=6):
+    return f"{'-':>{width}}" if value is None else f"{value:{width}.3f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validación walk-forward / purged K-fold del modelo")
+    add_data_arguments(parser)
+    parser.add_argument('--scheme', choices=SCHEMES, default='walk_forward')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--model', choices=('forest', 'logistic'), default='forest')
+    parser.add_argument('--holdout', type=float, default=0.2,
+                        help="Fracción final del entrenamiento de cada fold para calibrar")
+    parser.add_argument('--threshold', type=float, default=SIGNAL_THRESHOLD)
+    parser.add_argument('--output', help="Guardar el informe en JSON")
+    args = parser.parse_args(argv)
+    
+    histories = histories_from_args(args)
+    if not histories:
+        print("Sin histórico suficiente (usa --download N o --synthetic N)")
+        return 1
+    
+    report = validate(
+        histories, args.timeframe, args.scheme, args.folds, args.model, args.holdout,
+        args.max_hold, args.workers, args.seed, None if args.no_cache else FeatureCache(),
+        args.threshold
+    )
+    print(format_report(report))
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())